@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# クライアントの起動を軽くするため numpy などは使わない（hand_order も numpy を読み込まない部分だけ使う）
+from hand_order import HAND_INDEX, HAND_LABELS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+SOCKET_PATH = OUT_DIR / "analysis.sock"
+# ディレクトリの変更を見に行く間隔（秒）
+WATCH_INTERVAL = 2.0
+CLIENT_TIMEOUT = 30.0
+
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def pos_to_jp(pos: str) -> str:
+    if pos == "UTG+1":
+        return "+1"
+    if pos == "UTG+2":
+        return "+2"
+    return pos
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def label_for_action(code: str, raise_index: int) -> str:
+    k = code_kind(code)
+    if k == "C":
+        return "コール"
+    if k == "AI":
+        return "ALL IN"
+    if k == "R":
+        if raise_index == 1:
+            return "オープン"
+        # 2回目が3BET、3回目が4BET...
+        return f"{raise_index+1}BET"
+    # OTHER は保険でそのまま
+    return code.upper()
+
+
+@dataclass
+class NodeInfo:
+    position: str
+    # (code, total_frequency, next_street, is_hand_end, position)
+    actions: List[Tuple[str, float, bool, bool, str]]
+    ranges: Dict[str, List[float]]
+
+
+@dataclass
+class TreeState:
+    """
+    デーモンが常駐で持つツリー全体（読み込み後は書き換えない。更新時は丸ごと作り直して差し替える）
+    """
+
+    nodes: Dict[str, NodeInfo]
+    reach: Dict[str, float]
+    flop: List[Tuple[str, float]]  # (situation, prob_unconditional) 確率降順
+    total_flop: float
+    loaded_at: float
+    load_sec: float
+    signature: Tuple[int, ...]
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    def history(self, preflop_actions: str) -> List[Tuple[str, str]]:
+        """
+        (position, code) の履歴（フロップ到達用に末尾に next_street code が付いていてもOK）
+        """
+        out: List[Tuple[str, str]] = []
+        cur = ""
+        for code in preflop_actions.split("-") if preflop_actions else []:
+            info = self.nodes.get(cur)
+            if info is None:
+                break
+            pos = next((a[4] for a in info.actions if a[0] == code), "UNKNOWN")
+            out.append((pos, code))
+            cur = append_action(cur, code)
+        return out
+
+    def jp_label(self, preflop_actions: str) -> str:
+        cached = self.labels.get(preflop_actions)
+        if cached is not None:
+            return cached
+        raise_count = 0
+        tokens: List[str] = []
+        for pos, code in self.history(preflop_actions):
+            k = code_kind(code)
+            if k == "F":
+                continue
+            if k == "R":
+                raise_count += 1
+            tokens.append(f"{pos_to_jp(pos)}の{label_for_action(code, raise_count)}")
+        label = "、".join(tokens)
+        self.labels[preflop_actions] = label
+        return label
+
+
+def dir_signature() -> Tuple[int, ...]:
+    """
+    explored リストと *.json の (件数, 最終更新) で変更を検出する
+    """
+    try:
+        st = EXPLORED_LIST_PATH.stat()
+        explored = (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        explored = (0, 0)
+    count = 0
+    latest = 0
+    with os.scandir(OUT_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".json"):
+                count += 1
+                latest = max(latest, entry.stat().st_mtime_ns)
+    return explored + (count, latest)
+
+
+def load_tree_state() -> TreeState:
+    t0 = time.perf_counter()
+    signature = dir_signature()
+    explored_nodes = load_explored_list(EXPLORED_LIST_PATH)
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    nodes: Dict[str, NodeInfo] = {}
+    reach: Dict[str, float] = {"": 1.0}
+    flop: List[Tuple[str, float]] = []
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+
+        actions: List[Tuple[str, float, bool, bool, str]] = []
+        for sol in spot.get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str) or not act.get("code"):
+                continue
+            try:
+                tf = float(sol.get("total_frequency", 0.0))
+            except (TypeError, ValueError):
+                tf = 0.0
+            pos = act.get("position") if isinstance(act.get("position"), str) else "UNKNOWN"
+            actions.append((act["code"], tf, bool(act.get("next_street", False)), bool(act.get("is_hand_end", False)), pos))
+
+        ranges: Dict[str, List[float]] = {}
+        for info in spot.get("players_info") or []:
+            if isinstance(info, dict) and isinstance(info.get("player"), dict):
+                rng = info.get("range")
+                pos = info["player"].get("position")
+                if isinstance(pos, str) and isinstance(rng, list) and len(rng) == len(HAND_LABELS):
+                    ranges[pos] = rng
+
+        nodes[node] = NodeInfo(actions[0][4] if actions else "UNKNOWN", actions, ranges)
+
+        p_node = reach.get(node, 0.0)
+        for code, tf, next_street, is_hand_end, _ in actions:
+            if tf <= FREQ_EPS or is_hand_end:
+                continue
+            child = append_action(node, code)
+            if next_street:
+                flop.append((child, p_node * tf))
+                continue
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + (p_node * tf)
+            q.append(child)
+
+    flop.sort(key=lambda kv: kv[1], reverse=True)
+    return TreeState(
+        nodes=nodes,
+        reach=reach,
+        flop=flop,
+        total_flop=sum(p for _, p in flop),
+        loaded_at=time.time(),
+        load_sec=time.perf_counter() - t0,
+        signature=signature,
+    )
+
+
+# ---- コマンド（引数は文字列のリスト、戻り値は JSON にできる値） ----
+
+
+def parse_node_arg(value: str) -> str:
+    return "" if value == ROOT_MARKER else value
+
+
+def cmd_ping(state: TreeState, args: List[str]) -> Any:
+    return "pong"
+
+
+def cmd_stats(state: TreeState, args: List[str]) -> Any:
+    return {
+        "nodes": len(state.nodes),
+        "flop_situations": len(state.flop),
+        "total_flop_prob": state.total_flop,
+        "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(state.loaded_at)),
+        "load_sec": round(state.load_sec, 3),
+    }
+
+
+def cmd_reach(state: TreeState, args: List[str]) -> Any:
+    if len(args) != 1:
+        raise ValueError("usage: reach NODE")
+    node = parse_node_arg(args[0])
+    info = state.nodes.get(node)
+    if info is None:
+        raise KeyError(f"node not loaded: '{args[0]}'")
+    return {"node": args[0], "position": info.position, "reach": state.reach.get(node, 0.0)}
+
+
+def cmd_label(state: TreeState, args: List[str]) -> Any:
+    if len(args) != 1:
+        raise ValueError("usage: label NODE")
+    return state.jp_label(parse_node_arg(args[0]))
+
+
+def cmd_children(state: TreeState, args: List[str]) -> Any:
+    if len(args) != 1:
+        raise ValueError("usage: children NODE")
+    node = parse_node_arg(args[0])
+    info = state.nodes.get(node)
+    if info is None:
+        raise KeyError(f"node not loaded: '{args[0]}'")
+    p_node = state.reach.get(node, 0.0)
+    return [
+        {
+            "code": code,
+            "total_frequency": tf,
+            "reach": p_node * tf,
+            "next": "flop" if next_street else ("end" if is_hand_end else ("node" if append_action(node, code) in state.nodes else "unexplored")),
+        }
+        for code, tf, next_street, is_hand_end, _ in info.actions
+    ]
+
+
+def cmd_range(state: TreeState, args: List[str]) -> Any:
+    if len(args) not in (2, 3):
+        raise ValueError("usage: range NODE POSITION [HAND]")
+    node = parse_node_arg(args[0])
+    info = state.nodes.get(node)
+    if info is None:
+        raise KeyError(f"node not loaded: '{args[0]}'")
+    rng = info.ranges.get(args[1])
+    if rng is None:
+        raise KeyError(f"no range for {args[1]} at '{args[0]}' (have {sorted(info.ranges)})")
+    if len(args) == 3:
+        h = HAND_INDEX.get(args[2])
+        if h is None:
+            raise KeyError(f"unknown hand: {args[2]}")
+        return rng[h]
+    return {h: w for h, w in zip(HAND_LABELS, rng) if w > FREQ_EPS}
+
+
+def cmd_flop(state: TreeState, args: List[str]) -> Any:
+    """
+    flop            : 全シチュエーション（確率降順）
+    flop N          : 上位 N 件
+    flop SITUATION  : 1件
+    """
+    total = state.total_flop or 1.0
+    rows = state.flop
+    if args and not args[0].isdigit():
+        rows = [r for r in rows if r[0] == args[0]]
+        if not rows:
+            raise KeyError(f"flop situation not found: '{args[0]}'")
+    elif args:
+        rows = rows[: int(args[0])]
+    return [
+        {"flop_situation": s, "prob_unconditional": p, "prob_given_flop": p / total, "jp_actions": state.jp_label(s)}
+        for s, p in rows
+    ]
+
+
+COMMANDS: Dict[str, Callable[[TreeState, List[str]], Any]] = {
+    "ping": cmd_ping,
+    "stats": cmd_stats,
+    "reach": cmd_reach,
+    "label": cmd_label,
+    "children": cmd_children,
+    "range": cmd_range,
+    "flop": cmd_flop,
+}
+
+
+class AnalysisServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path) -> None:
+        self.state = load_tree_state()
+        self.reloads = 0
+        self.reload_lock = threading.Lock()
+        super().__init__(str(path), AnalysisHandler)
+
+    def reload(self, force: bool = False) -> bool:
+        with self.reload_lock:
+            if not force and dir_signature() == self.state.signature:
+                return False
+            # 読み込み中も古い state で応答を続け、出来上がったら参照を差し替える
+            self.state = load_tree_state()
+            self.reloads += 1
+            return True
+
+
+class AnalysisHandler(socketserver.StreamRequestHandler):
+    """
+    1行1リクエストの JSON: {"cmd": "reach", "args": ["F-F-R2.5"]}
+    応答も1行の JSON: {"ok": true, "result": ...} / {"ok": false, "error": "..."}
+    """
+
+    server: AnalysisServer
+
+    def handle(self) -> None:
+        shutdown = False
+        for raw in self.rfile:
+            line = raw.strip()
+            if not line:
+                continue
+            t0 = time.perf_counter()
+            try:
+                req = json.loads(line)
+                cmd = req.get("cmd")
+                args = [str(a) for a in req.get("args") or []]
+                if cmd == "reload":
+                    result: Any = {"reloaded": self.server.reload(force=True), "reloads": self.server.reloads}
+                elif cmd == "shutdown":
+                    # 応答を書き終えてから止める（先に止めるとプロセスが先に終わって "bye" が届かない）
+                    shutdown = True
+                    result = "bye"
+                elif cmd in COMMANDS:
+                    result = COMMANDS[cmd](self.server.state, args)
+                    if cmd == "stats":
+                        result["reloads"] = self.server.reloads
+                else:
+                    raise ValueError(f"unknown cmd: {cmd} (expected one of {sorted(COMMANDS) + ['reload', 'shutdown']})")
+                resp = {"ok": True, "result": result}
+            except Exception as e:
+                resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            resp["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            self.wfile.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if shutdown:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+def watch_loop(server: AnalysisServer, interval: float, stop: threading.Event) -> None:
+    while not stop.wait(interval):
+        try:
+            if server.reload():
+                st = server.state
+                print(f"[reload] nodes={len(st.nodes)} flop_situations={len(st.flop)} load_sec={st.load_sec:.2f}", flush=True)
+        except Exception as e:
+            # クロール途中の書きかけ json などは次の周期で読み直す
+            print(f"[warn] reload failed: {e}", flush=True)
+
+
+def serve(args: argparse.Namespace) -> None:
+    sock_path = Path(args.socket)
+    if sock_path.exists():
+        # 前回のソケットが残っている場合、生きているデーモンがいなければ消す
+        try:
+            request(sock_path, "ping", [], timeout=1.0)
+            raise RuntimeError(f"daemon already running on {sock_path}")
+        except (ConnectionRefusedError, FileNotFoundError, socket.timeout):
+            sock_path.unlink()
+
+    server = AnalysisServer(sock_path)
+    st = server.state
+    print(f"loaded nodes={len(st.nodes)} flop_situations={len(st.flop)} load_sec={st.load_sec:.2f}", flush=True)
+    print(f"listening on {sock_path.resolve()}", flush=True)
+
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch_loop, args=(server, args.interval, stop), daemon=True)
+    watcher.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        server.server_close()
+        if sock_path.exists():
+            sock_path.unlink()
+    print("done.")
+
+
+def request(sock_path: Path, cmd: str, args: List[str], timeout: float = CLIENT_TIMEOUT) -> Dict[str, Any]:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(str(sock_path))
+        s.sendall((json.dumps({"cmd": cmd, "args": args}, ensure_ascii=False) + "\n").encode("utf-8"))
+        buf = b""
+        while not buf.endswith(b"\n"):
+            chunk = s.recv(65536)
+            if not chunk:
+                break
+            buf += chunk
+    if not buf.endswith(b"\n"):
+        raise ConnectionError(f"daemon on {sock_path} closed the connection without a complete reply")
+    return json.loads(buf)
+
+
+def print_result(result: Any) -> None:
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        keys = list(result[0])
+        print("\t".join(keys))
+        for row in result:
+            print("\t".join(str(row.get(k, "")) for k in keys))
+    elif isinstance(result, dict):
+        for k, v in result.items():
+            print(f"{k}={v}")
+    else:
+        print(result)
+
+
+def client(args: argparse.Namespace) -> None:
+    try:
+        resp = request(Path(args.socket), args.cmd, args.args)
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"[error] daemon is not running on {args.socket} (start it with `analysis_daemon.py serve`)", file=sys.stderr)
+        sys.exit(2)
+    except ConnectionError as e:
+        print(f"[error] {e}", file=sys.stderr)
+        sys.exit(1)
+    if not resp.get("ok"):
+        print(f"[error] {resp.get('error')}", file=sys.stderr)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(resp["result"], ensure_ascii=False, indent=2))
+    else:
+        print_result(resp["result"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ツリーを常駐させて reach / ラベル / レンジ / フロップの問い合わせに答えるデーモン")
+    parser.add_argument("--socket", default=str(SOCKET_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help=f"{OUT_DIR} を読み込んで待ち受ける")
+    p_serve.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="変更検出の間隔（秒）")
+    p_serve.set_defaults(func=serve)
+
+    p_query = sub.add_parser("query", help="例: query reach F-F-R2.5 / query range ROOT UTG AKs / query flop 10")
+    p_query.add_argument("cmd", help=f"{sorted(COMMANDS) + ['reload', 'shutdown']}")
+    p_query.add_argument("args", nargs="*")
+    p_query.add_argument("--json", action="store_true", help="結果を JSON のまま表示")
+    p_query.set_defaults(func=client)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
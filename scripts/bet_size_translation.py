@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+SIZE_INDEX_PATH = OUT_DIR / "bet_size_index.npz"
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def to_float(value: Any, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass
+class SizeIndex:
+    """
+    ノードごとのレイズサイズ（ポット比で昇順）と、全 action の子ノード
+    - raise_*: raise_offsets[n]:raise_offsets[n+1] がノード n のレイズ（frac 昇順）
+    - act_*: act_offsets[n]:act_offsets[n+1] がノード n の全 action（json の並び）
+    - bb のレイズ額 x のポット比は (x - max_bet) / pot_denom
+      pot_denom はノードの betsize_by_pot から逆算した値（レイズが無いノードは pot + max_bet - actor_chips）
+      リンプ後のレイズなどでは json の betsize_by_pot が単純な式とずれるので、ツリー側の定義に合わせる
+    """
+
+    nodes: List[str]
+    pot: np.ndarray  # (N,) float64
+    max_bet: np.ndarray  # (N,) float64
+    actor_chips: np.ndarray  # (N,) float64
+    pot_denom: np.ndarray  # (N,) float64
+    act_offsets: np.ndarray  # (N+1,) int64
+    act_codes: List[str]  # (M,)
+    act_child: np.ndarray  # (M,) int32（-1: ツリー内に子ノードなし）
+    raise_offsets: np.ndarray  # (N+1,) int64
+    raise_frac: np.ndarray  # (K,) float64
+    raise_size: np.ndarray  # (K,) float64 レイズ後の額（bb）
+    raise_act: np.ndarray  # (K,) int32 act_* への index
+
+    def __post_init__(self) -> None:
+        self.node_index = {n: i for i, n in enumerate(self.nodes)}
+
+    def to_frac(self, node_ids: np.ndarray, size_bb: np.ndarray) -> np.ndarray:
+        n = np.asarray(node_ids, dtype=np.int64)
+        return (np.asarray(size_bb, dtype=np.float64) - self.max_bet[n]) / self.pot_denom[n]
+
+    def translate(self, node_ids: np.ndarray, frac: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        ポット比 frac のレイズを、そのノードのツリー上のサイズ A <= x <= B に pseudo-harmonic で割り振る
+        f(A) = (B - x)(1 + A) / ((B - A)(1 + x))、f(B) = 1 - f(A)
+        最小より小さい / 最大より大きいサイズは端のサイズに 1.0 で寄せる
+        各クエリはノード内のサイズ数 k に対して O(log k) の二分探索（全クエリを配列でまとめて進める）
+        戻り値: (lo_act, hi_act, w_lo)  act_* への index（レイズが無いノードは -1）
+        """
+        n = np.asarray(node_ids, dtype=np.int64)
+        x = np.asarray(frac, dtype=np.float64)
+        if len(self.raise_frac) == 0:
+            none = np.full(len(n), -1, dtype=np.int32)
+            return none, none.copy(), np.ones(len(n))
+        start = self.raise_offsets[n]
+        stop = self.raise_offsets[n + 1]
+
+        # start <= p <= stop で raise_frac[p] >= x となる最初の p
+        lo, hi = start.copy(), stop.copy()
+        while True:
+            active = lo < hi
+            if not active.any():
+                break
+            mid = (lo + hi) // 2
+            below = np.zeros_like(active)
+            below[active] = self.raise_frac[mid[active]] < x[active]
+            lo = np.where(active & below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+        p = lo
+
+        # 最小サイズ未満は最小に、最大サイズ超えは最大に寄せる（lower == upper, w_lo = 1）
+        k_max = len(self.raise_frac) - 1
+        upper = np.minimum(np.minimum(p, np.maximum(stop - 1, start)), k_max)
+        lower = np.where(p > start, p - 1, upper)
+        a = self.raise_frac[lower]
+        b = self.raise_frac[upper]
+
+        interior = (p > start) & (p < stop) & (b > a)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            w_lo = np.where(interior, (b - x) * (1.0 + a) / ((b - a) * (1.0 + x)), 1.0)
+        w_lo = np.clip(w_lo, 0.0, 1.0)
+
+        empty = start == stop
+        lo_act = np.where(empty, -1, self.raise_act[lower]).astype(np.int32)
+        hi_act = np.where(empty, -1, self.raise_act[upper]).astype(np.int32)
+        return lo_act, hi_act, w_lo
+
+    def exact_action(self, node_id: int, code: str) -> int:
+        start, stop = int(self.act_offsets[node_id]), int(self.act_offsets[node_id + 1])
+        u = code.upper()
+        for a in range(start, stop):
+            if self.act_codes[a].upper() == u:
+                return a
+        # チェックとコールはツリー側の表記（X / C）に合わせる
+        if u in ("C", "X"):
+            for a in range(start, stop):
+                if self.act_codes[a].upper() in ("C", "X"):
+                    return a
+        return -1
+
+
+def build_size_index(explored_nodes: Set[str]) -> Tuple[SizeIndex, int]:
+    """
+    戻り値: (index, missing_json)
+    """
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    nodes: List[str] = []
+    pot: List[float] = []
+    max_bet: List[float] = []
+    actor_chips: List[float] = []
+    pot_denom: List[float] = []
+    act_offsets: List[int] = [0]
+    act_codes: List[str] = []
+    act_labels: List[str] = []
+    raise_offsets: List[int] = [0]
+    raise_frac: List[float] = []
+    raise_size: List[float] = []
+    raise_act: List[int] = []
+    missing_json = 0
+
+    for node in sorted(explored_nodes, key=lambda n: (n.count("-"), n)):
+        path = get_node_path(node)
+        if not path.exists():
+            missing_json += 1
+            continue
+        spot = load_json(path)
+        game = spot.get("game") if isinstance(spot.get("game"), dict) else {}
+        chips: Dict[str, float] = {}
+        for p in game.get("players") or []:
+            if isinstance(p, dict) and isinstance(p.get("position"), str):
+                chips[p["position"]] = to_float(p.get("chips_on_table"))
+
+        node_raises: List[Tuple[float, float, int]] = []
+        actor = game.get("active_position")
+        for sol in spot.get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str) or not act.get("code"):
+                continue
+            code = act["code"]
+            if actor is None and isinstance(act.get("position"), str):
+                actor = act["position"]
+            if code_kind(code) in ("R", "AI"):
+                node_raises.append((to_float(act.get("betsize_by_pot")), to_float(act.get("betsize")), len(act_codes)))
+            act_codes.append(code)
+            act_labels.append(append_action(node, code))
+
+        nodes.append(node)
+        pot.append(to_float(game.get("pot")))
+        max_bet.append(max(chips.values(), default=0.0))
+        actor_chips.append(chips.get(actor, 0.0) if isinstance(actor, str) else 0.0)
+        # betsize_by_pot = (betsize - max_bet) / denom なので、ツリーのレイズから denom を逆算する
+        denoms = [(size - max_bet[-1]) / frac for frac, size, _ in node_raises if frac > 0.0 and size > max_bet[-1]]
+        pot_denom.append(float(np.median(denoms)) if denoms else pot[-1] + max_bet[-1] - actor_chips[-1])
+        act_offsets.append(len(act_codes))
+        for frac, size, a in sorted(node_raises):
+            raise_frac.append(frac)
+            raise_size.append(size)
+            raise_act.append(a)
+        raise_offsets.append(len(raise_frac))
+
+    node_index = {n: i for i, n in enumerate(nodes)}
+    index = SizeIndex(
+        nodes=nodes,
+        pot=np.asarray(pot, dtype=np.float64),
+        max_bet=np.asarray(max_bet, dtype=np.float64),
+        actor_chips=np.asarray(actor_chips, dtype=np.float64),
+        pot_denom=np.asarray(pot_denom, dtype=np.float64),
+        act_offsets=np.asarray(act_offsets, dtype=np.int64),
+        act_codes=act_codes,
+        act_child=np.asarray([node_index.get(label, -1) for label in act_labels], dtype=np.int32),
+        raise_offsets=np.asarray(raise_offsets, dtype=np.int64),
+        raise_frac=np.asarray(raise_frac, dtype=np.float64),
+        raise_size=np.asarray(raise_size, dtype=np.float64),
+        raise_act=np.asarray(raise_act, dtype=np.int32),
+    )
+    return index, missing_json
+
+
+def save_size_index(path: Path, index: SizeIndex) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        nodes=np.array([ROOT_MARKER if n == "" else n for n in index.nodes], dtype=str),
+        pot=index.pot,
+        max_bet=index.max_bet,
+        actor_chips=index.actor_chips,
+        pot_denom=index.pot_denom,
+        act_offsets=index.act_offsets,
+        act_codes=np.array(index.act_codes, dtype=str),
+        act_child=index.act_child,
+        raise_offsets=index.raise_offsets,
+        raise_frac=index.raise_frac,
+        raise_size=index.raise_size,
+        raise_act=index.raise_act,
+    )
+    tmp.replace(path)
+
+
+def load_size_index(path: Path = SIZE_INDEX_PATH) -> SizeIndex:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `bet_size_translation.py build` first)")
+    with np.load(path) as z:
+        if "pot_denom" not in z.files:
+            raise ValueError(f"outdated index: {path} (rerun `bet_size_translation.py build`)")
+        return SizeIndex(
+            nodes=["" if n == ROOT_MARKER else str(n) for n in z["nodes"]],
+            pot=z["pot"],
+            max_bet=z["max_bet"],
+            actor_chips=z["actor_chips"],
+            pot_denom=z["pot_denom"],
+            act_offsets=z["act_offsets"],
+            act_codes=[str(c) for c in z["act_codes"]],
+            act_child=z["act_child"],
+            raise_offsets=z["raise_offsets"],
+            raise_frac=z["raise_frac"],
+            raise_size=z["raise_size"],
+            raise_act=z["raise_act"],
+        )
+
+
+def parse_size_token(token: str, facing_bet: float) -> Optional[float]:
+    """
+    "R9" / "R9bb" / "9" -> 9.0（レイズ後の額、bb）。"RAI" / "AI" は inf
+    "3x" / "R3x" は直前のベット（facing_bet = そのノードの max_bet）の倍数 -> 3 * facing_bet
+    """
+    u = token.strip().upper()
+    if u in ("RAI", "AI", "ALLIN", "ALL_IN"):
+        return float("inf")
+    if u.startswith("R"):
+        u = u[1:]
+    scale = 1.0
+    if u.endswith("BB"):
+        u = u[:-2]
+    elif u.endswith("X"):
+        u = u[:-1]
+        scale = facing_bet
+    try:
+        return float(u) * scale
+    except ValueError:
+        return None
+
+
+def translate_sequences(
+    index: SizeIndex, sequences: List[List[str]], rng: Optional[np.random.Generator] = None
+) -> List[Tuple[str, float, str]]:
+    """
+    "R3-F-R9" のような（ツリー外サイズを含む）アクション列をまとめてツリー上の preflop_actions に写す
+    深さごとに、まだ生きている全シーケンスのレイズを 1 回の translate でまとめて処理する
+    rng が None なら重みの大きい方、あれば重みに従ってランダムに寄せる
+    戻り値: 各シーケンスの (tree_path, 選ばれた枝の重みの積, 失敗理由)
+    """
+    n_seq = len(sequences)
+    node = np.zeros(n_seq, dtype=np.int64)
+    node[:] = index.node_index[""]
+    prob = np.ones(n_seq, dtype=np.float64)
+    path: List[str] = [""] * n_seq
+    error: List[str] = [""] * n_seq
+    alive = np.ones(n_seq, dtype=bool)
+
+    depth = 0
+    while alive.any():
+        todo = [i for i in np.flatnonzero(alive).tolist() if depth < len(sequences[i])]
+        for i in np.flatnonzero(alive).tolist():
+            if depth >= len(sequences[i]):
+                alive[i] = False
+        if not todo:
+            break
+
+        chosen: Dict[int, int] = {}
+        raise_rows: List[int] = []
+        raise_sizes: List[float] = []
+        for i in todo:
+            token = sequences[i][depth]
+            if node[i] < 0:
+                error[i] = f"left tree before '{token}'"
+                alive[i] = False
+                continue
+            if code_kind(token) in ("R", "AI") or token[:1].isdigit():
+                size = parse_size_token(token, float(index.max_bet[node[i]]))
+                if size is None:
+                    error[i] = f"bad size '{token}'"
+                    alive[i] = False
+                    continue
+                exact = index.exact_action(int(node[i]), token)
+                if exact >= 0:
+                    chosen[i] = exact
+                else:
+                    raise_rows.append(i)
+                    raise_sizes.append(size)
+                continue
+            a = index.exact_action(int(node[i]), token)
+            if a < 0:
+                error[i] = f"no '{token}' at '{path[i] or ROOT_MARKER}'"
+                alive[i] = False
+                continue
+            chosen[i] = a
+
+        if raise_rows:
+            rows = np.asarray(raise_rows, dtype=np.int64)
+            sizes = np.asarray(raise_sizes, dtype=np.float64)
+            frac = np.where(np.isinf(sizes), np.inf, index.to_frac(node[rows], np.where(np.isinf(sizes), 0.0, sizes)))
+            lo_act, hi_act, w_lo = index.translate(node[rows], frac)
+            pick_lo = w_lo >= 0.5 if rng is None else rng.random(len(rows)) < w_lo
+            for j, i in enumerate(raise_rows):
+                if lo_act[j] < 0:
+                    error[i] = f"no raise at '{path[i] or ROOT_MARKER}'"
+                    alive[i] = False
+                    continue
+                chosen[i] = int(lo_act[j] if pick_lo[j] else hi_act[j])
+                prob[i] *= w_lo[j] if pick_lo[j] else 1.0 - w_lo[j]
+
+        for i, a in chosen.items():
+            path[i] = append_action(path[i], index.act_codes[a])
+            node[i] = int(index.act_child[a])
+        depth += 1
+
+    return [(path[i], float(prob[i]), error[i]) for i in range(n_seq)]
+
+
+def parse_node_arg(value: str) -> str:
+    return "" if value == ROOT_MARKER else value
+
+
+def cmd_build(_: argparse.Namespace) -> None:
+    index, missing_json = build_size_index(load_explored_list(EXPLORED_LIST_PATH))
+    save_size_index(SIZE_INDEX_PATH, index)
+    counts = np.diff(index.raise_offsets)
+    print("done.")
+    print(f"nodes={len(index.nodes)} actions={len(index.act_codes)} raises={len(index.raise_frac)} max_raises_per_node={int(counts.max(initial=0))}")
+    if missing_json:
+        print(f"[warn] missing json files for {missing_json} nodes (skipped)")
+    print(f"index={SIZE_INDEX_PATH.resolve()}")
+
+
+def cmd_map(args: argparse.Namespace) -> None:
+    index = load_size_index()
+    node = parse_node_arg(args.node)
+    n = index.node_index.get(node)
+    if n is None:
+        raise KeyError(f"node not in index: '{args.node}'")
+    if args.by_pot:
+        parsed = [float(t) for t in args.sizes]
+    else:
+        parsed = [parse_size_token(t, float(index.max_bet[n])) for t in args.sizes]
+        bad = [t for t, v in zip(args.sizes, parsed) if v is None]
+        if bad:
+            raise SystemExit(f"bad size: {', '.join(bad)}")
+    sizes = np.asarray(parsed, dtype=np.float64)
+    node_ids = np.full(len(sizes), n, dtype=np.int64)
+    if args.by_pot:
+        frac = sizes
+    else:
+        frac = np.where(np.isinf(sizes), np.inf, index.to_frac(node_ids, np.where(np.isinf(sizes), 0.0, sizes)))
+    lo_act, hi_act, w_lo = index.translate(node_ids, frac)
+    for t, f, lo, hi, w in zip(args.sizes, frac, lo_act, hi_act, w_lo):
+        if lo < 0:
+            print(f"{t}\tno raise at this node")
+            continue
+        if lo == hi:
+            print(f"{t}\tfrac={f:.3f}\t{index.act_codes[lo]}=1.000")
+            continue
+        print(f"{t}\tfrac={f:.3f}\t{index.act_codes[lo]}={w:.3f}\t{index.act_codes[hi]}={1.0 - w:.3f}")
+
+
+def cmd_sequences(args: argparse.Namespace) -> None:
+    index = load_size_index()
+    src = open(args.input, "r", encoding="utf-8") if args.input != "-" else sys.stdin
+    with src:
+        lines = [line.strip() for line in src if line.strip()]
+    sequences = [[] if line == ROOT_MARKER else line.split("-") for line in lines]
+    rng = np.random.default_rng(args.seed) if args.seed is not None else None
+    results = translate_sequences(index, sequences, rng)
+
+    w = csv.writer(sys.stdout)
+    w.writerow(["input", "preflop_actions", "weight", "error"])
+    for line, (path, prob, error) in zip(lines, results):
+        w.writerow([line, ROOT_MARKER if path == "" else path, prob, error])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ツリー外のレイズサイズをツリー上のサイズに写す（pseudo-harmonic）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} の全ノードから {SIZE_INDEX_PATH} を作る")
+    p_build.set_defaults(func=cmd_build)
+
+    p_map = sub.add_parser("map", help="例: map ROOT 3 4.5 3x（レイズ後の額 bb、Nx は直前のベットの N 倍）")
+    p_map.add_argument("node", help=f"root は {ROOT_MARKER}")
+    p_map.add_argument("sizes", nargs="+")
+    p_map.add_argument("--by-pot", action="store_true", help="sizes をポット比として扱う")
+    p_map.set_defaults(func=cmd_map)
+
+    p_seq = sub.add_parser("sequences", help="1行1シーケンス（例: R3-F-R9-C）をまとめてツリー上のパスに写し CSV で出す")
+    p_seq.add_argument("input", help="ファイル（- で標準入力）")
+    p_seq.add_argument("--seed", type=int, default=None, help="指定すると重みに従ってランダムに寄せる")
+    p_seq.set_defaults(func=cmd_sequences)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import CARD_CLASS, HAND_COMBOS, HAND_INDEX, HAND_LABELS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+BLOCKERS_PATH = OUT_DIR / "blockers.npz"
+
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+
+def build_class_conflicts() -> np.ndarray:
+    """
+    1326 コンボ同士のカード共有マスクを 169 クラスに畳んだもの
+    C[h, h2] = ハンドクラス h の 1 コンボを持っているとき、クラス h2 のコンボのうち持てなくなる数（h のコンボ平均）
+    """
+    cards: List[Tuple[int, int]] = [(c1, c2) for c1 in range(52) for c2 in range(c1 + 1, 52)]
+    cls = [int(CARD_CLASS[c1, c2]) for c1, c2 in cards]
+    n = len(cards)
+    holds = np.zeros((n, 52), dtype=np.float64)
+    rows = np.arange(n)
+    holds[rows, [c[0] for c in cards]] = 1.0
+    holds[rows, [c[1] for c in cards]] = 1.0
+    conflict = (holds @ holds.T) > 0.0  # (1326, 1326)
+
+    onehot = np.zeros((n, len(HAND_LABELS)), dtype=np.float64)
+    onehot[rows, cls] = 1.0
+    if not np.array_equal(onehot.sum(axis=0), HAND_COMBOS):
+        raise RuntimeError("combo -> hand class mapping does not match HAND_COMBOS")
+    return (onehot.T @ conflict.astype(np.float64) @ onehot) / HAND_COMBOS[:, None]
+
+
+CLASS_CONFLICTS = build_class_conflicts()
+# remaining = W @ REMAINING_MATRIX で「ヒーローが h を持つときに残る相手コンボ数」になる
+REMAINING_MATRIX = HAND_COMBOS[:, None] - CLASS_CONFLICTS.T
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def save_json(out_path: Path, data: Any) -> None:
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp.replace(out_path)
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+@dataclass
+class NodeStrategy:
+    actor: str
+    codes: List[str]
+    strategy: np.ndarray  # (A, 169)
+    children: Dict[str, str]  # code -> 子ノード（next_street / hand_end 以外）
+
+
+def load_node_strategies(explored_nodes: Set[str]) -> Dict[str, NodeStrategy]:
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    out: Dict[str, NodeStrategy] = {}
+    q: deque[str] = deque([""])
+    while q:
+        node = q.popleft()
+        if node in out:
+            continue
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+        actor = (spot.get("game") or {}).get("active_position")
+        sols = spot.get("action_solutions")
+        if not isinstance(actor, str) or not isinstance(sols, list):
+            continue
+
+        codes: List[str] = []
+        rows: List[List[float]] = []
+        children: Dict[str, str] = {}
+        for sol in sols:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            strategy = sol.get("strategy") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+                continue
+            if not isinstance(strategy, list) or len(strategy) != len(HAND_LABELS):
+                continue
+            codes.append(act["code"])
+            rows.append(strategy)
+            if not act.get("next_street", False) and not act.get("is_hand_end", False):
+                child = append_action(node, act["code"])
+                children[act["code"]] = child
+                if child in explored_nodes:
+                    q.append(child)
+        if codes:
+            out[node] = NodeStrategy(actor, codes, np.asarray(rows, dtype=np.float64), children)
+    return out
+
+
+def path_range(nodes: Dict[str, NodeStrategy], node: str, position: str) -> np.ndarray:
+    """
+    node 時点での position のレンジ（経路上の自分のアクションの strategy の積 = players_info[].range）
+    """
+    rng = np.ones(len(HAND_LABELS), dtype=np.float64)
+    codes = node.split("-") if node else []
+    cur = ""
+    for code in codes:
+        ns = nodes.get(cur)
+        if ns is not None and ns.actor == position and code in ns.codes:
+            rng = rng * ns.strategy[ns.codes.index(code)]
+        cur = append_action(cur, code)
+    return rng
+
+
+@dataclass
+class BlockerStats:
+    """
+    group = (ノード, ヒーロー=手番のアクション, 応答ノード)。ヒーローのアクションの後、ヒーローに手番が戻るまでに
+            後ろの相手が判断する全ノード（前の相手がフォールド / コール / レイズした各ライン）が responder_node
+    row   = group 内の相手の応答アクション 1 つ
+    freq[r, h]: ヒーローが h を持つとき、相手が row の応答を選ぶ確率（カードリムーバル込み）
+    base[r]:    カードリムーバル無しの同じ確率
+    blocker_rate[g, h]:   相手の続行（フォールド以外）コンボのうち h が消す割合
+    unblocker_rate[g, h]: 相手のフォールドコンボのうち h が消す割合
+    """
+
+    group_node: List[str]
+    group_action: List[str]
+    group_responder: List[str]
+    group_responder_node: List[str]
+    group_offsets: np.ndarray  # (G + 1,)
+    row_code: List[str]
+    freq: np.ndarray  # (R, 169)
+    base: np.ndarray  # (R,)
+    blocker_rate: np.ndarray  # (G, 169)
+    unblocker_rate: np.ndarray  # (G, 169)
+
+    def groups_of(self, node: str) -> List[int]:
+        return [g for g, n in enumerate(self.group_node) if n == node]
+
+
+def responder_nodes(nodes: Dict[str, NodeStrategy], child: str, hero: str) -> List[str]:
+    """
+    ヒーローのアクション直後の child から、ヒーローに手番が戻るまでに相手が判断するノード（BFS 順）
+    プリフロップでは各相手はその間に 1 回しか判断しないので、これで後ろの相手全員の全ラインになる
+    """
+    out: List[str] = []
+    q: deque[str] = deque([child])
+    while q:
+        node = q.popleft()
+        ns = nodes.get(node)
+        if ns is None or ns.actor == hero:
+            continue
+        out.append(node)
+        q.extend(ns.children.values())
+    return out
+
+
+def build_blocker_stats(nodes: Dict[str, NodeStrategy]) -> BlockerStats:
+    """
+    相手の応答ごとのコンボ重み W（行 = 応答, 列 = 相手ハンド）を全ツリー分積んで、
+    REMAINING_MATRIX との行列積 1 回でヒーローの全 169 ハンドに対する残りコンボ数を出す
+    カードリムーバルはヒーローの 2 枚だけ（間の相手のハンドによる除外は入れない）
+    """
+    group_node: List[str] = []
+    group_action: List[str] = []
+    group_responder: List[str] = []
+    group_responder_node: List[str] = []
+    offsets: List[int] = [0]
+    row_code: List[str] = []
+    weights: List[np.ndarray] = []
+
+    for node, ns in nodes.items():
+        for code in ns.codes:
+            child = ns.children.get(code)
+            if code_kind(code) == "F" or child is None:
+                continue
+            for resp_node in responder_nodes(nodes, child, ns.actor):
+                resp = nodes[resp_node]
+                rng = path_range(nodes, resp_node, resp.actor)
+                group_node.append(node)
+                group_action.append(code)
+                group_responder.append(resp.actor)
+                group_responder_node.append(resp_node)
+                row_code.extend(resp.codes)
+                weights.append(rng[None, :] * resp.strategy)
+                offsets.append(offsets[-1] + len(resp.codes))
+
+    n_groups = len(group_node)
+    n_rows = offsets[-1]
+    if n_rows == 0:
+        empty = np.zeros((0, len(HAND_LABELS)), dtype=np.float64)
+        return BlockerStats([], [], [], [], np.zeros(1, dtype=np.int64), [], empty, np.zeros(0), empty, empty)
+
+    w = np.concatenate(weights, axis=0)  # (R, 169) 相手ハンドごとのコンボ「割合」
+    remaining = w @ REMAINING_MATRIX  # (R, 169) ヒーロー h のときの残りコンボ数
+    total = w @ HAND_COMBOS  # (R,)
+
+    starts = np.asarray(offsets[:-1], dtype=np.int64)
+    group_of_row = np.repeat(np.arange(n_groups), np.diff(offsets))
+    remaining_sum = np.add.reduceat(remaining, starts, axis=0)  # (G, 169)
+    total_sum = np.add.reduceat(total, starts)  # (G,)
+    freq = remaining / np.maximum(remaining_sum[group_of_row], FREQ_EPS)
+    base = total / np.maximum(total_sum[group_of_row], FREQ_EPS)
+
+    is_fold = np.asarray([code_kind(c) == "F" for c in row_code], dtype=bool)
+    cont_total = np.bincount(group_of_row, weights=np.where(is_fold, 0.0, total), minlength=n_groups)
+    fold_total = np.bincount(group_of_row, weights=np.where(is_fold, total, 0.0), minlength=n_groups)
+    cont_left = np.zeros((n_groups, len(HAND_LABELS)), dtype=np.float64)
+    fold_left = np.zeros((n_groups, len(HAND_LABELS)), dtype=np.float64)
+    np.add.at(cont_left, group_of_row[~is_fold], remaining[~is_fold])
+    np.add.at(fold_left, group_of_row[is_fold], remaining[is_fold])
+    blocker_rate = np.where(cont_total[:, None] > FREQ_EPS, 1.0 - cont_left / np.maximum(cont_total, FREQ_EPS)[:, None], 0.0)
+    unblocker_rate = np.where(fold_total[:, None] > FREQ_EPS, 1.0 - fold_left / np.maximum(fold_total, FREQ_EPS)[:, None], 0.0)
+
+    return BlockerStats(
+        group_node=group_node,
+        group_action=group_action,
+        group_responder=group_responder,
+        group_responder_node=group_responder_node,
+        group_offsets=np.asarray(offsets, dtype=np.int64),
+        row_code=row_code,
+        freq=freq,
+        base=base,
+        blocker_rate=blocker_rate,
+        unblocker_rate=unblocker_rate,
+    )
+
+
+def save_blocker_stats(path: Path, stats: BlockerStats) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        group_node=np.array([n or ROOT_MARKER for n in stats.group_node], dtype=str),
+        group_action=np.array(stats.group_action, dtype=str),
+        group_responder=np.array(stats.group_responder, dtype=str),
+        group_responder_node=np.array(stats.group_responder_node, dtype=str),
+        group_offsets=stats.group_offsets,
+        row_code=np.array(stats.row_code, dtype=str),
+        freq=stats.freq.astype(np.float32),
+        base=stats.base,
+        blocker_rate=stats.blocker_rate.astype(np.float32),
+        unblocker_rate=stats.unblocker_rate.astype(np.float32),
+    )
+    tmp.replace(path)
+
+
+def load_blocker_stats(path: Path = BLOCKERS_PATH) -> BlockerStats:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `blocker_stats.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        if "group_responder_node" not in z:
+            raise ValueError(f"{path} has first-responder stats only (rerun `blocker_stats.py build`)")
+        return BlockerStats(
+            group_node=["" if n == ROOT_MARKER else str(n) for n in z["group_node"]],
+            group_action=[str(v) for v in z["group_action"]],
+            group_responder=[str(v) for v in z["group_responder"]],
+            group_responder_node=[str(v) for v in z["group_responder_node"]],
+            group_offsets=z["group_offsets"],
+            row_code=[str(v) for v in z["row_code"]],
+            freq=z["freq"].astype(np.float64),
+            base=z["base"],
+            blocker_rate=z["blocker_rate"].astype(np.float64),
+            unblocker_rate=z["unblocker_rate"].astype(np.float64),
+        )
+
+
+def write_node_fields(stats: BlockerStats) -> int:
+    """
+    各ノードの JSON の blocker_rate / unblocker_rate / blockers_frequencies を埋める
+    （ヒーローのアクション × 応答ノードごとに 1 要素。配列は 169 ハンド順）
+    """
+    by_node: Dict[str, List[int]] = {}
+    for g, node in enumerate(stats.group_node):
+        by_node.setdefault(node, []).append(g)
+
+    written = 0
+    for node, groups in by_node.items():
+        path = get_node_path(node)
+        spot = load_json(path)
+        spot["blocker_rate"] = [
+            {
+                "action": stats.group_action[g],
+                "position": stats.group_responder[g],
+                "node": stats.group_responder_node[g],
+                "rates": np.round(stats.blocker_rate[g], 6).tolist(),
+            }
+            for g in groups
+        ]
+        spot["unblocker_rate"] = [
+            {
+                "action": stats.group_action[g],
+                "position": stats.group_responder[g],
+                "node": stats.group_responder_node[g],
+                "rates": np.round(stats.unblocker_rate[g], 6).tolist(),
+            }
+            for g in groups
+        ]
+        freqs: Dict[str, List[Dict[str, Any]]] = {}
+        for g in groups:
+            lo, hi = int(stats.group_offsets[g]), int(stats.group_offsets[g + 1])
+            freqs.setdefault(stats.group_action[g], []).append(
+                {
+                    "position": stats.group_responder[g],
+                    "node": stats.group_responder_node[g],
+                    "base": {stats.row_code[r]: round(float(stats.base[r]), 8) for r in range(lo, hi)},
+                    "frequencies": {stats.row_code[r]: np.round(stats.freq[r], 6).tolist() for r in range(lo, hi)},
+                }
+            )
+        spot["blockers_frequencies"] = freqs
+        save_json(path, spot)
+        written += 1
+    return written
+
+
+def cmd_build(args: argparse.Namespace) -> None:
+    nodes = load_node_strategies(load_explored_list(EXPLORED_LIST_PATH))
+    stats = build_blocker_stats(nodes)
+    save_blocker_stats(BLOCKERS_PATH, stats)
+    print("done.")
+    print(f"nodes={len(nodes)} groups={len(stats.group_node)} rows={len(stats.row_code)}")
+    print(f"blockers={BLOCKERS_PATH.resolve()}")
+    if args.write_json:
+        print(f"json_updated={write_node_fields(stats)}")
+
+
+def cmd_show(args: argparse.Namespace) -> None:
+    stats = load_blocker_stats()
+    node = parse_actions_line(args.node) or ""
+    groups = stats.groups_of(node)
+    if not groups:
+        raise SystemExit(f"no blocker stats for node: {args.node}")
+    if args.hand is not None and args.hand not in HAND_INDEX:
+        raise SystemExit(f"unknown hand: {args.hand}")
+
+    for g in groups:
+        lo, hi = int(stats.group_offsets[g]), int(stats.group_offsets[g + 1])
+        print(f"[{stats.group_action[g]}] responder={stats.group_responder[g]} at {stats.group_responder_node[g]}")
+        if args.hand is not None:
+            h = HAND_INDEX[args.hand]
+            for r in range(lo, hi):
+                print(f"  {stats.row_code[r]}\tbase={stats.base[r]:.4f}\twith_{args.hand}={stats.freq[r, h]:.4f}")
+            print(f"  blocker_rate={stats.blocker_rate[g, h]:.4f} unblocker_rate={stats.unblocker_rate[g, h]:.4f}")
+            continue
+        # 続行レンジを消して、フォールドレンジを残すハンドほど上
+        score = stats.blocker_rate[g] - stats.unblocker_rate[g]
+        for h in np.argsort(-score, kind="stable")[: args.limit].tolist():
+            print(
+                f"  {HAND_LABELS[h]}\tblocker_rate={stats.blocker_rate[g, h]:.4f}"
+                f"\tunblocker_rate={stats.unblocker_rate[g, h]:.4f}\tnet={score[h]:+.4f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="プリフロップのブロッカー / アンブロッカー統計")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} から {BLOCKERS_PATH} を作る")
+    p_build.add_argument("--write-json", action="store_true", help="各ノードの JSON の blocker 系フィールドも埋める")
+    p_build.set_defaults(func=cmd_build)
+
+    p_show = sub.add_parser("show", help="例: show R2.5 AKo")
+    p_show.add_argument("node", help=f"preflop_actions（ROOT は {ROOT_MARKER}）")
+    p_show.add_argument("hand", nargs="?", help="ヒーローのハンド（省略時はブロッカー効果の大きい順）")
+    p_show.add_argument("--limit", type=int, default=15)
+    p_show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+STORE_DIR = OUT_DIR / "store"
+PACK_PATH = STORE_DIR / "chunks.pack"
+INDEX_PATH = STORE_DIR / "index.json"
+NODES_PATH = STORE_DIR / "nodes.json"
+
+# これより小さい配列/オブジェクトは参照にせず親チャンクにそのまま埋め込む
+MIN_CHUNK_BYTES = 128
+REF_KEY = "$ref"
+ZLIB_LEVEL = 6
+CHUNK_CACHE_SIZE = 4096
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def save_json(out_path: Path, data: Any) -> None:
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp.replace(out_path)
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.append(v)
+    return out
+
+
+def canonical_bytes(value: Any) -> bytes:
+    # キー順は元の json のまま（復元時に同じ並びに戻すため sort_keys しない）
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def chunk_hash(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+class ChunkStore:
+    """
+    json の配列/サブオブジェクトを内容ハッシュで 1 回だけ保存するストア
+    - chunks.pack: zlib 圧縮したチャンクを追記していくだけのファイル
+    - index.json: hash -> [offset, compressed_len, raw_len]
+    - nodes.json: preflop_actions -> ノード全体のチャンク hash
+    """
+
+    def __init__(self, store_dir: Path = STORE_DIR) -> None:
+        self.pack_path = store_dir / PACK_PATH.name
+        self.index_path = store_dir / INDEX_PATH.name
+        self.nodes_path = store_dir / NODES_PATH.name
+        self.index: Dict[str, List[int]] = {}
+        self.nodes: Dict[str, str] = {}
+        if self.index_path.exists():
+            self.index = json.loads(self.index_path.read_text(encoding="utf-8"))
+        if self.nodes_path.exists():
+            self.nodes = json.loads(self.nodes_path.read_text(encoding="utf-8"))
+        self._pending: Dict[str, bytes] = {}
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()
+
+    # ---- 書き込み ----
+
+    def _intern(self, value: Any, force: bool = False) -> Any:
+        if isinstance(value, dict):
+            reduced: Any = {k: self._intern(v) for k, v in value.items()}
+        elif isinstance(value, list):
+            reduced = [self._intern(v) for v in value]
+        else:
+            return value
+
+        raw = canonical_bytes(reduced)
+        if len(raw) < MIN_CHUNK_BYTES and not force:
+            return reduced
+        h = chunk_hash(raw)
+        if h not in self.index and h not in self._pending:
+            self._pending[h] = raw
+        return {REF_KEY: h}
+
+    def put_node(self, preflop_actions: str, spot: Dict[str, Any]) -> str:
+        ref = self._intern(spot, force=True)
+        self.nodes[ROOT_MARKER if preflop_actions == "" else preflop_actions] = ref[REF_KEY]
+        return ref[REF_KEY]
+
+    def flush(self) -> int:
+        """
+        溜まった新規チャンクを pack に追記し、index/nodes を書き出す
+        戻り値: 追記したチャンク数
+        """
+        self.pack_path.parent.mkdir(parents=True, exist_ok=True)
+        written = 0
+        with self.pack_path.open("ab") as f:
+            offset = f.tell()
+            for h, raw in self._pending.items():
+                comp = zlib.compress(raw, ZLIB_LEVEL)
+                f.write(comp)
+                self.index[h] = [offset, len(comp), len(raw)]
+                offset += len(comp)
+                written += 1
+        self._pending.clear()
+
+        for path, data in ((self.index_path, self.index), (self.nodes_path, self.nodes)):
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+            tmp.replace(path)
+        return written
+
+    # ---- 読み出し ----
+
+    def _read_chunk(self, h: str) -> Any:
+        cached = self._cache.get(h)
+        if cached is not None:
+            self._cache.move_to_end(h)
+            return cached
+        entry = self.index.get(h)
+        if entry is None:
+            raise KeyError(f"chunk not found: {h}")
+        offset, length, raw_len = entry
+        with self.pack_path.open("rb") as f:
+            f.seek(offset)
+            raw = zlib.decompress(f.read(length))
+        if len(raw) != raw_len or chunk_hash(raw) != h:
+            raise ValueError(f"corrupted chunk: {h}")
+        value = json.loads(raw)
+        self._cache[h] = value
+        if len(self._cache) > CHUNK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return value
+
+    def _resolve(self, value: Any) -> Any:
+        if isinstance(value, dict):
+            if len(value) == 1 and REF_KEY in value:
+                return self._resolve(self._read_chunk(value[REF_KEY]))
+            return {k: self._resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._resolve(v) for v in value]
+        return value
+
+    def load_node(self, preflop_actions: str) -> Dict[str, Any]:
+        key = ROOT_MARKER if preflop_actions == "" else preflop_actions
+        h = self.nodes.get(key)
+        if h is None:
+            raise FileNotFoundError(f"node not in store: '{preflop_actions}'")
+        return self._resolve({REF_KEY: h})
+
+
+def cmd_pack(args: argparse.Namespace) -> None:
+    nodes = load_explored_list(EXPLORED_LIST_PATH)
+    store = ChunkStore()
+
+    json_bytes = 0  # out2 のファイル（indent=2）
+    compact_bytes = 0  # 空白なしの JSON。dedup の効果はこちらと比べる
+    refs_before = len(store.index)
+    packed = 0
+    missing_json = 0
+    for node in nodes:
+        path = get_node_path(node)
+        if not path.exists():
+            missing_json += 1
+            continue
+        json_bytes += path.stat().st_size
+        spot = load_json(path)
+        compact_bytes += len(canonical_bytes(spot))
+        store.put_node(node, spot)
+        packed += 1
+    written = store.flush()
+
+    if args.verify:
+        for node in nodes:
+            path = get_node_path(node)
+            if path.exists() and store.load_node(node) != load_json(path):
+                raise RuntimeError(f"round-trip mismatch: '{node}'")
+
+    raw_bytes = sum(e[2] for e in store.index.values())
+    pack_bytes = store.pack_path.stat().st_size if store.pack_path.exists() else 0
+    meta_bytes = store.index_path.stat().st_size + store.nodes_path.stat().st_size
+
+    print("done.")
+    print(f"nodes_packed={packed} chunks_total={len(store.index)} chunks_new={written} (was {refs_before})")
+    if missing_json:
+        print(f"[warn] missing json files for {missing_json} nodes (skipped)")
+    stored_bytes = pack_bytes + meta_bytes
+    print(f"json_file_bytes={json_bytes:,} compact_json_bytes={compact_bytes:,}")
+    print(f"unique_chunk_bytes={raw_bytes:,} (dedup ratio vs compact json {compact_bytes / max(raw_bytes, 1):.2f}x)")
+    print(
+        f"pack_bytes={pack_bytes:,} + meta_bytes={meta_bytes:,} "
+        f"(ratio vs compact json {compact_bytes / max(stored_bytes, 1):.2f}x, vs json files {json_bytes / max(stored_bytes, 1):.2f}x)"
+    )
+    if args.verify:
+        print("verify=ok")
+    print(f"store={STORE_DIR.resolve()}")
+
+
+def cmd_unpack(args: argparse.Namespace) -> None:
+    store = ChunkStore()
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    restored = 0
+    for key in store.nodes:
+        node = "" if key == ROOT_MARKER else key
+        save_json(out_dir / (sanitize_filename(node) + ".json"), store.load_node(node))
+        restored += 1
+    print("done.")
+    print(f"restored={restored} -> {out_dir.resolve()}")
+
+
+def cmd_cat(args: argparse.Namespace) -> None:
+    store = ChunkStore()
+    node = "" if args.node == ROOT_MARKER else args.node
+    print(json.dumps(store.load_node(node), ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="スポット json の内容アドレス型重複排除ストア")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_pack = sub.add_parser("pack", help=f"{EXPLORED_LIST_PATH} の全ノードを {STORE_DIR} に追加する")
+    p_pack.add_argument("--verify", action="store_true", help="書き込み後に全ノードを復元して元 json と比較する")
+    p_pack.set_defaults(func=cmd_pack)
+
+    p_unpack = sub.add_parser("unpack", help="ストアから json を書き戻す")
+    p_unpack.add_argument("out_dir")
+    p_unpack.set_defaults(func=cmd_unpack)
+
+    p_cat = sub.add_parser("cat", help=f"1ノード分の json を表示（root は {ROOT_MARKER}）")
+    p_cat.add_argument("node")
+    p_cat.set_defaults(func=cmd_cat)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
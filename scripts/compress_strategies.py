@@ -0,0 +1,453 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from hand_order import HAND_INDEX, HAND_LABELS
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+COMPRESSED_STRATEGIES_PATH = OUT_DIR / "compressed_strategies.npz"
+
+# 復元誤差の上限（strategy は頻度、evs は bb）
+STRATEGY_TOL = 1e-3
+EVS_TOL = 1e-3
+
+# rank の自動選択: factors + basis + 残差（値 + index）の合計バイト数が最小の rank（0 = 残差だけ）
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.append(v)
+    return out
+
+
+def iter_action_arrays(spot: Dict[str, Any]) -> List[Tuple[str, List[float], List[float]]]:
+    """
+    (code, strategy[169], evs[169]) を返す（total_frequency 0 の action も含めて全部）
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, List[float], List[float]]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        act = sol.get("action", {})
+        code = act.get("code") if isinstance(act, dict) else None
+        if not isinstance(code, str) or not code:
+            continue
+        strat = sol.get("strategy")
+        evs = sol.get("evs")
+        if not isinstance(strat, list) or len(strat) != len(HAND_LABELS):
+            continue
+        if not isinstance(evs, list) or len(evs) != len(HAND_LABELS):
+            continue
+        out.append((code, strat, evs))
+    return out
+
+
+@dataclass
+class LowRankMatrix:
+    """
+    X (M, 169) ≈ factors @ basis + residual
+    residual は X - factors @ basis を step（= 2·tol 弱）刻みで丸めた整数
+    0 でない要素が少なければ CSR（0 の要素は持たない）、多ければ (M, 169) の密な配列で持つ（小さい方）
+    丸め誤差は step/2 以下なので、復元誤差は必ず tol 以下
+    """
+
+    factors: np.ndarray  # (M, r) float32（特異値込み）
+    basis: np.ndarray  # (r, 169) float32
+    res_indptr: np.ndarray  # (M+1,) int32（密なときは空）
+    res_col: np.ndarray  # (K,) uint8（密なときは空）
+    res_q: np.ndarray  # 疎: (K,) / 密: (M, 169)。int8 / int16 / int32
+    step: float
+    tol: float
+
+    @property
+    def rank(self) -> int:
+        return int(self.basis.shape[0])
+
+    @property
+    def dense_residual(self) -> bool:
+        return self.res_q.ndim == 2
+
+    @property
+    def factor_bytes(self) -> int:
+        return self.factors.nbytes + self.basis.nbytes
+
+    @property
+    def residual_bytes(self) -> int:
+        return self.res_indptr.nbytes + self.res_col.nbytes + self.res_q.nbytes
+
+    @property
+    def residual_count(self) -> int:
+        return int(np.count_nonzero(self.res_q)) if self.dense_residual else len(self.res_q)
+
+    def low_rank_rel_err(self, x: np.ndarray) -> float:
+        """
+        残差を足さない factors @ basis だけの相対誤差（Frobenius）
+        """
+        norm = float(np.linalg.norm(x))
+        if norm <= 0.0:
+            return 0.0
+        return float(np.linalg.norm(x - self.factors.astype(np.float64) @ self.basis.astype(np.float64))) / norm
+
+    @property
+    def nbytes(self) -> int:
+        return self.factor_bytes + self.residual_bytes
+
+    def rows(self, start: int, stop: int) -> np.ndarray:
+        out = self.factors[start:stop].astype(np.float64) @ self.basis.astype(np.float64)
+        if self.dense_residual:
+            return out + self.res_q[start:stop] * self.step
+        lo, hi = int(self.res_indptr[start]), int(self.res_indptr[stop])
+        rows = np.repeat(np.arange(stop - start), np.diff(self.res_indptr[start : stop + 1]))
+        out[rows, self.res_col[lo:hi]] += self.res_q[lo:hi] * self.step
+        return out
+
+    def column(self, h: int) -> np.ndarray:
+        out = self.factors.astype(np.float64) @ self.basis[:, h].astype(np.float64)
+        if self.dense_residual:
+            return out + self.res_q[:, h] * self.step
+        hit = np.flatnonzero(self.res_col == h)
+        rows = np.searchsorted(self.res_indptr, hit, side="right") - 1
+        out[rows] += self.res_q[hit] * self.step
+        return out
+
+
+def quantized_dtype(q_max: float) -> Any:
+    return next(t for t in (np.int8, np.int16, np.int32) if q_max <= np.iinfo(t).max)
+
+
+def residual_cost(m: int, n: int, nnz: int, q_max: float) -> Tuple[int, bool]:
+    """
+    残差を持つのに要るバイト数と、密な配列の方が小さいか
+    """
+    item = np.dtype(quantized_dtype(q_max)).itemsize
+    sparse = (m + 1) * 4 + nnz * (1 + item)
+    dense = m * n * item
+    return min(sparse, dense), dense < sparse
+
+
+def fit_low_rank(x: np.ndarray, tol: float, rank: Optional[int] = None) -> LowRankMatrix:
+    """
+    SVD を 1 回だけ計算し、rank を指定しなければ全 rank（0 を含む）の合計バイト数を比べて最小のものを選ぶ
+    rank を 1 ずつ上げながら復元値に 1 成分ずつ足していくので、候補ごとに作り直さない
+    残差は float32 に丸めた factors/basis に対して計算するので、保存後の復元でも誤差保証が崩れない
+    """
+    m, n = x.shape
+    u, s, vt = np.linalg.svd(x, full_matrices=False)
+    max_rank = len(s)
+    # 浮動小数の足し算の誤差で tol をはみ出さないよう少しだけ細かく刻む
+    step = 2.0 * tol * (1.0 - 1e-6)
+    factors32 = (u * s).astype(np.float32)
+    basis32 = vt.astype(np.float32)
+
+    if rank is None:
+        best_rank, best_bytes = 0, None
+        recon = np.zeros_like(x)
+        for r in range(max_rank + 1):
+            if r > 0:
+                recon += np.outer(factors32[:, r - 1].astype(np.float64), basis32[r - 1].astype(np.float64))
+            q = np.rint((x - recon) / step)
+            res, _ = residual_cost(m, n, int(np.count_nonzero(q)), float(np.abs(q).max(initial=0.0)))
+            total = r * (m + n) * 4 + res
+            if best_bytes is None or total < best_bytes:
+                best_rank, best_bytes = r, total
+        rank = best_rank
+    rank = min(rank, max_rank)
+
+    factors = np.ascontiguousarray(factors32[:, :rank])
+    basis = np.ascontiguousarray(basis32[:rank])
+    q = np.rint((x - factors.astype(np.float64) @ basis.astype(np.float64)) / step)
+    q_max = float(np.abs(q).max(initial=0.0))
+    q_dtype = quantized_dtype(q_max)
+    _, dense = residual_cost(m, n, int(np.count_nonzero(q)), q_max)
+    if dense:
+        return LowRankMatrix(
+            factors=factors,
+            basis=basis,
+            res_indptr=np.zeros(0, dtype=np.int32),
+            res_col=np.zeros(0, dtype=np.uint8),
+            res_q=q.astype(q_dtype),
+            step=step,
+            tol=tol,
+        )
+    rows, cols = np.nonzero(q)
+    indptr = np.zeros(m + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=m), out=indptr[1:])
+    return LowRankMatrix(
+        factors=factors,
+        basis=basis,
+        res_indptr=indptr,
+        res_col=cols.astype(np.uint8),
+        res_q=q[rows, cols].astype(q_dtype),
+        step=step,
+        tol=tol,
+    )
+
+
+@dataclass
+class CompressedStrategies:
+    """
+    全ノード × action の strategy / evs を低ランク + 量子化した残差（疎か密の小さい方）で持つ
+    行は node_offsets[n]:node_offsets[n+1] がノード n の action（json と同じ並び）
+    """
+
+    nodes: List[str]
+    node_offsets: np.ndarray  # (N+1,) int64
+    codes: List[str]  # (M,)
+    strategy: LowRankMatrix
+    evs: LowRankMatrix
+
+    def __post_init__(self) -> None:
+        self.node_index = {n: i for i, n in enumerate(self.nodes)}
+
+    def node(self, node: str) -> Optional[Tuple[List[str], np.ndarray, np.ndarray]]:
+        """
+        1ノード分を復元: (codes, strategy(A,169), evs(A,169))
+        """
+        n = self.node_index.get(node)
+        if n is None:
+            return None
+        start, stop = int(self.node_offsets[n]), int(self.node_offsets[n + 1])
+        # 真の値は [0, 1] なのでクリップしても誤差は増えない
+        strategy = np.clip(self.strategy.rows(start, stop), 0.0, 1.0)
+        return self.codes[start:stop], strategy, self.evs.rows(start, stop)
+
+    def hand(self, hand: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        1ハンド分を全 action について復元: (strategy(M,), evs(M,))
+        行とノードの対応は node_offsets / codes を使う
+        """
+        h = HAND_INDEX.get(hand)
+        if h is None:
+            raise KeyError(f"unknown hand: {hand}")
+        return np.clip(self.strategy.column(h), 0.0, 1.0), self.evs.column(h)
+
+    def row_nodes(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.nodes)), np.diff(self.node_offsets))
+
+
+def load_tree_matrices(nodes: List[str]) -> Tuple[List[str], np.ndarray, List[str], np.ndarray, np.ndarray, int]:
+    """
+    戻り値: (kept_nodes, node_offsets, codes, strategy(M,169), evs(M,169), missing_json)
+    """
+    kept: List[str] = []
+    offsets: List[int] = [0]
+    codes: List[str] = []
+    strategy_rows: List[List[float]] = []
+    evs_rows: List[List[float]] = []
+    missing_json = 0
+
+    for node in nodes:
+        path = get_node_path(node)
+        if not path.exists():
+            missing_json += 1
+            continue
+        actions = iter_action_arrays(load_json(path))
+        if not actions:
+            continue
+        for code, strat, evs in actions:
+            codes.append(code)
+            strategy_rows.append(strat)
+            evs_rows.append(evs)
+        kept.append(node)
+        offsets.append(len(codes))
+
+    return (
+        kept,
+        np.asarray(offsets, dtype=np.int64),
+        codes,
+        np.asarray(strategy_rows, dtype=np.float64).reshape(-1, len(HAND_LABELS)),
+        np.asarray(evs_rows, dtype=np.float64).reshape(-1, len(HAND_LABELS)),
+        missing_json,
+    )
+
+
+def save_compressed(path: Path, comp: CompressedStrategies) -> None:
+    arrays: Dict[str, np.ndarray] = {
+        "nodes": np.array([ROOT_MARKER if n == "" else n for n in comp.nodes], dtype=str),
+        "node_offsets": comp.node_offsets,
+        "codes": np.array(comp.codes, dtype=str),
+        "hands": np.array(HAND_LABELS, dtype=str),
+    }
+    for name, mat in (("strategy", comp.strategy), ("evs", comp.evs)):
+        arrays[f"{name}_factors"] = mat.factors
+        arrays[f"{name}_basis"] = mat.basis
+        arrays[f"{name}_res_indptr"] = mat.res_indptr
+        arrays[f"{name}_res_col"] = mat.res_col
+        arrays[f"{name}_res_q"] = mat.res_q
+        arrays[f"{name}_step"] = np.array(mat.step)
+        arrays[f"{name}_tol"] = np.array(mat.tol)
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    tmp.replace(path)
+
+
+def load_compressed(path: Path = COMPRESSED_STRATEGIES_PATH) -> CompressedStrategies:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `compress_strategies.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        mats = {
+            name: LowRankMatrix(
+                factors=z[f"{name}_factors"],
+                basis=z[f"{name}_basis"],
+                res_indptr=z[f"{name}_res_indptr"],
+                res_col=z[f"{name}_res_col"],
+                res_q=z[f"{name}_res_q"],
+                step=float(z[f"{name}_step"]),
+                tol=float(z[f"{name}_tol"]),
+            )
+            for name in ("strategy", "evs")
+        }
+        return CompressedStrategies(
+            nodes=["" if n == ROOT_MARKER else str(n) for n in z["nodes"]],
+            node_offsets=z["node_offsets"],
+            codes=[str(c) for c in z["codes"]],
+            strategy=mats["strategy"],
+            evs=mats["evs"],
+        )
+
+
+def parse_node_arg(value: str) -> str:
+    return "" if value == ROOT_MARKER else value
+
+
+def cmd_build(args: argparse.Namespace) -> None:
+    nodes = load_explored_list(EXPLORED_LIST_PATH)
+    kept, offsets, codes, strategy, evs, missing_json = load_tree_matrices(nodes)
+    if not codes:
+        raise RuntimeError("no action_solutions found")
+
+    comp = CompressedStrategies(
+        nodes=kept,
+        node_offsets=offsets,
+        codes=codes,
+        strategy=fit_low_rank(strategy, args.strategy_tol, args.rank),
+        evs=fit_low_rank(evs, args.evs_tol, args.rank),
+    )
+    save_compressed(COMPRESSED_STRATEGIES_PATH, comp)
+
+    # 保存したものを読み直して誤差保証を確認する
+    loaded = load_compressed(COMPRESSED_STRATEGIES_PATH)
+    strat_err = float(np.abs(loaded.strategy.rows(0, len(codes)) - strategy).max())
+    evs_err = float(np.abs(loaded.evs.rows(0, len(codes)) - evs).max())
+    if strat_err > args.strategy_tol or evs_err > args.evs_tol:
+        raise RuntimeError(f"error bound violated: strategy={strat_err} evs={evs_err}")
+
+    dense_bytes = strategy.astype(np.float32).nbytes + evs.astype(np.float32).nbytes
+    packed_bytes = comp.strategy.nbytes + comp.evs.nbytes
+    print("done.")
+    print(f"nodes={len(kept)} rows={len(codes)}")
+    if missing_json:
+        print(f"[warn] missing json files for {missing_json} nodes (skipped)")
+    for name, mat, x, err in (("strategy", comp.strategy, strategy, strat_err), ("evs", comp.evs, evs, evs_err)):
+        print(
+            f"{name}: rank={mat.rank} low_rank_rel_err={mat.low_rank_rel_err(x):.4f} "
+            f"residuals={mat.residual_count}/{x.size} ({'dense' if mat.dense_residual else 'sparse'} {mat.res_q.dtype}) "
+            f"max_abs_err={err:.2e} (tol {mat.tol:g})"
+        )
+        print(
+            f"  bytes={mat.nbytes:,} = factors {mat.factors.nbytes:,} + basis {mat.basis.nbytes:,} "
+            f"+ residual values {mat.res_q.nbytes:,} + residual index {mat.res_indptr.nbytes + mat.res_col.nbytes:,}"
+        )
+    print(f"dense_float32_bytes={dense_bytes:,} compressed_bytes={packed_bytes:,} ({dense_bytes / max(packed_bytes, 1):.2f}x)")
+    print(f"compressed={COMPRESSED_STRATEGIES_PATH.resolve()}")
+
+
+def cmd_node(args: argparse.Namespace) -> None:
+    comp = load_compressed()
+    got = comp.node(parse_node_arg(args.node))
+    if got is None:
+        raise KeyError(f"node not found: '{args.node}'")
+    codes, strategy, evs = got
+    hands = [HAND_INDEX[args.hand]] if args.hand else range(len(HAND_LABELS))
+    for h in hands:
+        cells = "\t".join(f"{c}={strategy[a, h]:.3f}({evs[a, h]:+.3f})" for a, c in enumerate(codes))
+        print(f"{HAND_LABELS[h]}\t{cells}")
+
+
+def cmd_hand(args: argparse.Namespace) -> None:
+    comp = load_compressed()
+    strategy, evs = comp.hand(args.hand)
+    row_nodes = comp.row_nodes()
+    order = np.argsort(-strategy, kind="stable")[: args.k]
+    for i in order:
+        node = comp.nodes[row_nodes[i]]
+        print(f"{ROOT_MARKER if node == '' else node}\t{comp.codes[i]}\t{strategy[i]:.3f}\t{evs[i]:+.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="strategy / evs の低ランク圧縮（誤差上限つき）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} の全ノードから {COMPRESSED_STRATEGIES_PATH} を作る")
+    p_build.add_argument("--rank", type=int, default=None, help="固定 rank（0 = 残差だけ。省略時は合計バイト数が最小の rank）")
+    p_build.add_argument("--strategy-tol", type=float, default=STRATEGY_TOL)
+    p_build.add_argument("--evs-tol", type=float, default=EVS_TOL)
+    p_build.set_defaults(func=cmd_build)
+
+    p_node = sub.add_parser("node", help="1ノード分を復元して表示")
+    p_node.add_argument("node", help=f"root は {ROOT_MARKER}")
+    p_node.add_argument("--hand", default=None, choices=HAND_LABELS, metavar="HAND")
+    p_node.set_defaults(func=cmd_node)
+
+    p_hand = sub.add_parser("hand", help="1ハンド分を全ノードについて復元し、頻度の高い順に表示")
+    p_hand.add_argument("hand", choices=HAND_LABELS, metavar="HAND")
+    p_hand.add_argument("-k", type=int, default=20)
+    p_hand.set_defaults(func=cmd_hand)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
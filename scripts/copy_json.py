@@ -13,6 +13,9 @@ SRC_DIR = Path("../out2/cash6m100bb")
 
 DST_DIR = Path("../solutions/cash6m100bb")
 
+# ノード JSON 以外にアプリが読むファイル（score_question_difficulty.py の出力など）
+EXTRA_FILES = ["question_weights.csv"]
+
 ROOT_MARKER = "ROOT"
 
 
@@ -61,6 +64,14 @@ def main() -> None:
             shutil.copy2(src, dst)
             copied += 1
 
+    for name in EXTRA_FILES:
+        src = SRC_DIR / name
+        if not src.exists():
+            print(f"[WARN] not found (skip): {src}")
+            continue
+        shutil.copy2(src, DST_DIR / name)
+        print(f"copied {name}")
+
     print("done.")
     print(f"unique_actions={len(uniq)}")
     print(f"copied={copied}")
@@ -0,0 +1,609 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_INDEX, HAND_LABELS, check_spot_hand_order
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+ROOT_MARKER = "ROOT"
+EXPLORED_LIST_NAME = "preflop_actions.txt"  # 各クロールディレクトリ内（ROOT含む前提）
+
+DEPTH_ALIGNED_PATH = OUT_DIR / "depth_aligned.npz"
+DEPTH_HOLDOUT_CSV_PATH = OUT_DIR / "depth_holdout.csv"
+
+# レイズの対応付け: pot 比の比がこの範囲なら同じサイズとみなす
+FRAC_RATIO_TOL = 1.5
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def to_float(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def action_token(act: Dict[str, Any]) -> Tuple[str, float]:
+    """
+    深さに依らない形: (種類, pot 比)。オールインは深さで額が変わるので種類 "AI" だけで合わせる
+    """
+    code = act["code"]
+    if code.upper() == "X":
+        return ("X", math.nan)
+    if act.get("allin", False) or code.upper() == "RAI":
+        return ("AI", math.nan)
+    kind = code_kind(code)
+    if kind == "R":
+        frac = to_float(act.get("betsize_by_pot"))
+        return ("R", frac if frac is not None else math.nan)
+    return (kind, math.nan)
+
+
+def token_label(token: Tuple[str, float]) -> str:
+    kind, frac = token
+    return f"R{frac:.2f}p" if kind == "R" and not math.isnan(frac) else kind
+
+
+@dataclass
+class DepthNode:
+    codes: List[str]
+    tokens: List[Tuple[str, float]]
+    tf: np.ndarray  # (A,)
+    strategy: np.ndarray  # (A, 169)
+    range: np.ndarray  # (169,) 手番のレンジ
+    children: Dict[int, str]  # action index -> 子ノード（next_street / hand_end 以外）
+
+
+@dataclass
+class DepthTree:
+    depth: float
+    out_dir: Path
+    nodes: Dict[str, DepthNode]
+
+
+def read_stack_depth(spot: Dict[str, Any]) -> Optional[float]:
+    players = (spot.get("game") or {}).get("players")
+    if not isinstance(players, list):
+        return None
+    stacks = [to_float(p.get("stack")) for p in players if isinstance(p, dict)]
+    stacks = [s for s in stacks if s is not None]
+    return min(stacks) if stacks else None
+
+
+def load_depth_tree(out_dir: Path, depth: Optional[float] = None) -> DepthTree:
+    explored = load_explored_list(out_dir / EXPLORED_LIST_NAME)
+    if "" not in explored:
+        raise RuntimeError(f"ROOT node ('') not found in {out_dir / EXPLORED_LIST_NAME}")
+
+    nodes: Dict[str, DepthNode] = {}
+    q: deque[str] = deque([""])
+    while q:
+        node = q.popleft()
+        if node in nodes:
+            continue
+        path = out_dir / (sanitize_filename(node) + ".json")
+        if not path.exists():
+            continue
+        spot = load_json(path)
+        try:
+            check_spot_hand_order(spot)
+        except ValueError as e:
+            raise ValueError(f"{e}: {path}") from None
+        if depth is None:
+            depth = read_stack_depth(spot)
+        actor = (spot.get("game") or {}).get("active_position")
+        sols = spot.get("action_solutions")
+        if not isinstance(sols, list):
+            continue
+
+        rng = np.ones(len(HAND_LABELS), dtype=np.float64)
+        for info in spot.get("players_info") or []:
+            if isinstance(info, dict) and (info.get("player") or {}).get("position") == actor:
+                if isinstance(info.get("range"), list) and len(info["range"]) == len(HAND_LABELS):
+                    rng = np.asarray(info["range"], dtype=np.float64)
+
+        codes: List[str] = []
+        tokens: List[Tuple[str, float]] = []
+        tfs: List[float] = []
+        rows: List[List[float]] = []
+        children: Dict[int, str] = {}
+        for sol in sols:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            strategy = sol.get("strategy") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+                continue
+            if not isinstance(strategy, list) or len(strategy) != len(HAND_LABELS):
+                continue
+            if not act.get("next_street", False) and not act.get("is_hand_end", False):
+                child = append_action(node, act["code"])
+                children[len(codes)] = child
+                if child in explored:
+                    q.append(child)
+            codes.append(act["code"])
+            tokens.append(action_token(act))
+            tfs.append(to_float(sol.get("total_frequency")) or 0.0)
+            rows.append(strategy)
+        if codes:
+            nodes[node] = DepthNode(codes, tokens, np.asarray(tfs), np.asarray(rows, dtype=np.float64), rng, children)
+
+    if depth is None:
+        raise RuntimeError(f"cannot determine stack depth of {out_dir} (pass DEPTH=DIR)")
+    return DepthTree(float(depth), out_dir, nodes)
+
+
+def match_actions(ref: List[Tuple[str, float]], other: List[Tuple[str, float]]) -> List[int]:
+    """
+    ref の各アクションに other のアクション index を対応付ける（無ければ -1）
+    種類が同じものだけ。レイズは pot 比の比が FRAC_RATIO_TOL 以内で近い順に 1 対 1
+    """
+    out = [-1] * len(ref)
+    used: Set[int] = set()
+    pairs: List[Tuple[float, int, int]] = []
+    for i, (kind, frac) in enumerate(ref):
+        for j, (kind2, frac2) in enumerate(other):
+            if kind != kind2:
+                continue
+            if kind == "R":
+                if math.isnan(frac) or math.isnan(frac2) or frac <= 0.0 or frac2 <= 0.0:
+                    continue
+                dist = abs(math.log(frac / frac2))
+                if dist > math.log(FRAC_RATIO_TOL):
+                    continue
+            else:
+                dist = 0.0
+            pairs.append((dist, i, j))
+    for _, i, j in sorted(pairs):
+        if out[i] < 0 and j not in used:
+            out[i] = j
+            used.add(j)
+    return out
+
+
+@dataclass
+class AlignedTrees:
+    """
+    基準ツリー（先頭の深さ）のノード / アクションに、各深さのノード / アクションを合わせたもの
+    d = 深さ, n = 整列ノード, a = 基準ノードでのアクション
+    """
+
+    depths: np.ndarray  # (D,)
+    keys: List[str]  # (N,) 基準の深さでの preflop_actions
+    tokens: List[List[str]]  # (N, A_n) 深さに依らないアクション表記
+    present: np.ndarray  # (D, N)
+    paths: List[List[str]]  # (D, N) 各深さでの preflop_actions（無ければ ""）
+    codes: np.ndarray  # (D, N, A) 各深さでの action code（無ければ ""）
+    frac: np.ndarray  # (D, N, A) pot 比
+    action_mask: np.ndarray  # (D, N, A)
+    strategy: np.ndarray  # (D, N, A, 169)
+    ranges: np.ndarray  # (D, N, 169)
+    reach: np.ndarray  # (D, N)
+
+    def index_of(self, key: str) -> int:
+        try:
+            return self.keys.index(key)
+        except ValueError:
+            raise KeyError(f"node not in aligned tree: {key or ROOT_MARKER}")
+
+
+def align_trees(trees: List[DepthTree]) -> AlignedTrees:
+    ref = trees[0]
+    n_depths = len(trees)
+    rows: List[Tuple[str, List[Optional[str]], List[List[int]], List[float]]] = []
+    q: deque[Tuple[str, List[Optional[str]], List[float]]] = deque([("", [""] * n_depths, [1.0] * n_depths)])
+    seen: Set[str] = set()
+    while q:
+        key, paths, reach = q.popleft()
+        if key in seen or key not in ref.nodes:
+            continue
+        seen.add(key)
+        ref_node = ref.nodes[key]
+        present_paths: List[Optional[str]] = [p if p is not None and p in t.nodes else None for p, t in zip(paths, trees)]
+        maps = [
+            match_actions(ref_node.tokens, t.nodes[p].tokens) if p is not None else [-1] * len(ref_node.codes)
+            for p, t in zip(present_paths, trees)
+        ]
+        rows.append((key, present_paths, maps, reach))
+
+        for a, child_key in ref_node.children.items():
+            child_paths: List[Optional[str]] = []
+            child_reach: List[float] = []
+            for d, (p, t) in enumerate(zip(present_paths, trees)):
+                j = maps[d][a]
+                if p is None or j < 0 or j not in t.nodes[p].children:
+                    child_paths.append(None)
+                    child_reach.append(0.0)
+                    continue
+                child_paths.append(t.nodes[p].children[j])
+                child_reach.append(reach[d] * float(t.nodes[p].tf[j]))
+            q.append((child_key, child_paths, child_reach))
+
+    n_nodes = len(rows)
+    a_max = max((len(ref.nodes[r[0]].codes) for r in rows), default=0)
+    aligned = AlignedTrees(
+        depths=np.asarray([t.depth for t in trees], dtype=np.float64),
+        keys=[r[0] for r in rows],
+        tokens=[[token_label(tok) for tok in ref.nodes[r[0]].tokens] for r in rows],
+        present=np.zeros((n_depths, n_nodes), dtype=bool),
+        paths=[[""] * n_nodes for _ in trees],
+        codes=np.full((n_depths, n_nodes, a_max), "", dtype=object),
+        frac=np.full((n_depths, n_nodes, a_max), np.nan, dtype=np.float64),
+        action_mask=np.zeros((n_depths, n_nodes, a_max), dtype=bool),
+        strategy=np.zeros((n_depths, n_nodes, a_max, len(HAND_LABELS)), dtype=np.float32),
+        ranges=np.zeros((n_depths, n_nodes, len(HAND_LABELS)), dtype=np.float32),
+        reach=np.zeros((n_depths, n_nodes), dtype=np.float64),
+    )
+    for n, (_, paths, maps, reach) in enumerate(rows):
+        for d, (p, t) in enumerate(zip(paths, trees)):
+            if p is None:
+                continue
+            node = t.nodes[p]
+            aligned.present[d, n] = True
+            aligned.paths[d][n] = p
+            aligned.reach[d, n] = reach[d]
+            aligned.ranges[d, n] = node.range
+            for a, j in enumerate(maps[d]):
+                if j < 0:
+                    continue
+                aligned.codes[d, n, a] = node.codes[j]
+                aligned.frac[d, n, a] = node.tokens[j][1]
+                aligned.action_mask[d, n, a] = True
+                aligned.strategy[d, n, a] = node.strategy[j]
+    return aligned
+
+
+def depth_coord(depths: np.ndarray, space: str) -> np.ndarray:
+    return np.log(depths) if space == "log" else np.asarray(depths, dtype=np.float64)
+
+
+@dataclass
+class Interpolated:
+    depth: float
+    lo: np.ndarray  # (N,) 使った深さの index（下側）
+    hi: np.ndarray  # (N,)
+    t: np.ndarray  # (N,) 0 = lo, 1 = hi
+    valid: np.ndarray  # (N,)
+    extrapolated: np.ndarray  # (N,) 片側にしか無く、近い方の値をそのまま使った
+    strategy: np.ndarray  # (N, A, 169)
+    frac: np.ndarray  # (N, A)
+    ranges: np.ndarray  # (N, 169)
+    reach: np.ndarray  # (N,)
+
+
+def interpolate(aligned: AlignedTrees, depth: float, space: str = "log", present: Optional[np.ndarray] = None) -> Interpolated:
+    """
+    全ノードを一括で補間する。ノードごとに、そのノードがある深さのうち depth を挟む 2 つを使う
+    present を渡すとそのマスクで深さを間引く（held-out 用）
+    """
+    present = aligned.present if present is None else present
+    xs = depth_coord(aligned.depths, space)
+    x = float(depth_coord(np.asarray([depth]), space)[0])
+    cand_lo = present & (xs[:, None] <= x + 1e-12)
+    cand_hi = present & (xs[:, None] >= x - 1e-12)
+    has_lo, has_hi = cand_lo.any(axis=0), cand_hi.any(axis=0)
+    # 深さは昇順とは限らないので、x に一番近いものを選ぶ
+    dist_lo = np.where(cand_lo, x - xs[:, None], np.inf)
+    dist_hi = np.where(cand_hi, xs[:, None] - x, np.inf)
+    lo = np.argmin(dist_lo, axis=0)
+    hi = np.argmin(dist_hi, axis=0)
+    lo = np.where(has_lo, lo, hi)
+    hi = np.where(has_hi, hi, lo)
+    valid = has_lo | has_hi
+    width = xs[hi] - xs[lo]
+    t = np.where(np.abs(width) > 1e-12, (x - xs[lo]) / np.where(np.abs(width) > 1e-12, width, 1.0), 0.0)
+
+    cols = np.arange(len(aligned.keys))
+    w_lo, w_hi = (1.0 - t), t
+    s_lo = aligned.strategy[lo, cols].astype(np.float64)
+    s_hi = aligned.strategy[hi, cols].astype(np.float64)
+    strategy = w_lo[:, None, None] * s_lo + w_hi[:, None, None] * s_hi
+    total = strategy.sum(axis=1, keepdims=True)
+    strategy = np.where(total > FREQ_EPS, strategy / np.maximum(total, FREQ_EPS), 0.0)
+
+    f_lo, f_hi = aligned.frac[lo, cols], aligned.frac[hi, cols]
+    frac = np.where(np.isnan(f_lo), f_hi, np.where(np.isnan(f_hi), f_lo, w_lo[:, None] * f_lo + w_hi[:, None] * f_hi))
+    ranges = w_lo[:, None] * aligned.ranges[lo, cols] + w_hi[:, None] * aligned.ranges[hi, cols]
+    reach = w_lo * aligned.reach[lo, cols] + w_hi * aligned.reach[hi, cols]
+
+    zero = ~valid
+    strategy[zero] = 0.0
+    reach = np.where(valid, reach, 0.0)
+    return Interpolated(
+        depth=depth,
+        lo=lo,
+        hi=hi,
+        t=t,
+        valid=valid,
+        extrapolated=valid & ~(has_lo & has_hi),
+        strategy=strategy,
+        frac=frac,
+        ranges=ranges,
+        reach=reach,
+    )
+
+
+def strategy_error(aligned: AlignedTrees, d: int, pred: Interpolated) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ノードごとの誤差: レンジ重み付きの total variation（½Σ|σ̂ − σ|）と reach の絶対誤差
+    """
+    actual = aligned.strategy[d].astype(np.float64)
+    tv = 0.5 * np.abs(pred.strategy - actual).sum(axis=1)  # (N, 169)
+    w = aligned.ranges[d].astype(np.float64) * HAND_COMBOS[None, :]
+    w = w / np.maximum(w.sum(axis=1, keepdims=True), FREQ_EPS)
+    return (tv * w).sum(axis=1), np.abs(pred.reach - aligned.reach[d])
+
+
+@dataclass
+class HoldoutRow:
+    depth: float
+    space: str
+    neighbors: Tuple[float, float]
+    nodes: int
+    tv_mean: float  # reach 重み付き平均
+    tv_max: float
+    reach_mae: float
+
+
+def holdout_errors(aligned: AlignedTrees) -> List[HoldoutRow]:
+    """
+    内側の各深さを 1 つずつ外し、残りから補間して実際のクロール結果と比べる
+    """
+    order = np.argsort(aligned.depths)
+    rows: List[HoldoutRow] = []
+    for k in order[1:-1].tolist():
+        mask = aligned.present.copy()
+        mask[k] = False
+        for space in ("log", "linear"):
+            pred = interpolate(aligned, float(aligned.depths[k]), space, present=mask)
+            use = aligned.present[k] & pred.valid & ~pred.extrapolated
+            if not use.any():
+                continue
+            tv, reach_err = strategy_error(aligned, k, pred)
+            weight = aligned.reach[k][use]
+            below = aligned.depths[aligned.depths < aligned.depths[k]]
+            above = aligned.depths[aligned.depths > aligned.depths[k]]
+            rows.append(
+                HoldoutRow(
+                    depth=float(aligned.depths[k]),
+                    space=space,
+                    neighbors=(float(below.max()), float(above.min())),
+                    nodes=int(use.sum()),
+                    tv_mean=float((tv[use] * weight).sum() / max(weight.sum(), FREQ_EPS)),
+                    tv_max=float(tv[use].max()),
+                    reach_mae=float(reach_err[use].mean()),
+                )
+            )
+    return rows
+
+
+def estimate_error(holdout: List[HoldoutRow], lo: float, hi: float, space: str) -> Optional[float]:
+    """
+    held-out の誤差を、挟む深さの幅の比でスケールして見積もる（幅 0 = クロール済みの深さなら 0）
+    """
+    if lo == hi:
+        return 0.0
+    rows = [r for r in holdout if r.space == space]
+    if not rows:
+        return None
+
+    def width(a: float, b: float) -> float:
+        x = depth_coord(np.asarray([a, b]), space)
+        return float(x[1] - x[0])
+
+    mid = float(np.mean(depth_coord(np.asarray([lo, hi]), space)))
+    nearest = min(rows, key=lambda r: abs(float(depth_coord(np.asarray([r.depth]), space)[0]) - mid))
+    return nearest.tv_mean * width(lo, hi) / max(width(*nearest.neighbors), FREQ_EPS)
+
+
+def save_aligned(path: Path, aligned: AlignedTrees, holdout: List[HoldoutRow]) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        depths=aligned.depths,
+        keys=np.array([k or ROOT_MARKER for k in aligned.keys], dtype=str),
+        tokens=np.array(["\t".join(t) for t in aligned.tokens], dtype=str),
+        present=aligned.present,
+        paths=np.array([[p or ROOT_MARKER for p in row] for row in aligned.paths], dtype=str),
+        codes=aligned.codes.astype(str),
+        frac=aligned.frac,
+        action_mask=aligned.action_mask,
+        strategy=aligned.strategy,
+        ranges=aligned.ranges,
+        reach=aligned.reach,
+        holdout=np.array(
+            [[r.depth, 0.0 if r.space == "log" else 1.0, r.neighbors[0], r.neighbors[1], r.nodes, r.tv_mean, r.tv_max, r.reach_mae] for r in holdout],
+            dtype=np.float64,
+        ).reshape(len(holdout), 8),
+    )
+    tmp.replace(path)
+
+
+def load_aligned(path: Path = DEPTH_ALIGNED_PATH) -> Tuple[AlignedTrees, List[HoldoutRow]]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `depth_interpolation.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        present = z["present"]
+        aligned = AlignedTrees(
+            depths=z["depths"],
+            keys=["" if k == ROOT_MARKER else str(k) for k in z["keys"]],
+            tokens=[str(t).split("\t") for t in z["tokens"]],
+            present=present,
+            paths=[["" if p == ROOT_MARKER else str(p) for p in row] for row in z["paths"]],
+            codes=z["codes"].astype(object),
+            frac=z["frac"],
+            action_mask=z["action_mask"],
+            strategy=z["strategy"],
+            ranges=z["ranges"],
+            reach=z["reach"],
+        )
+        holdout = [
+            HoldoutRow(float(r[0]), "log" if r[1] == 0.0 else "linear", (float(r[2]), float(r[3])), int(r[4]), float(r[5]), float(r[6]), float(r[7]))
+            for r in z["holdout"]
+        ]
+    return aligned, holdout
+
+
+def write_holdout_csv(path: Path, holdout: List[HoldoutRow]) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["depth", "space", "lower_depth", "upper_depth", "nodes", "tv_mean", "tv_max", "reach_mae"])
+        for r in holdout:
+            w.writerow([r.depth, r.space, r.neighbors[0], r.neighbors[1], r.nodes, f"{r.tv_mean:.6f}", f"{r.tv_max:.6f}", f"{r.reach_mae:.8f}"])
+
+
+def parse_depth_dir(value: str) -> Tuple[Optional[float], Path]:
+    """
+    "DIR" または "DEPTH=DIR"（DEPTH 省略時は JSON の stack から読む）
+    """
+    depth, sep, out_dir = value.partition("=")
+    if not sep:
+        return None, Path(value)
+    d = to_float(depth)
+    if d is None or d <= 0.0:
+        raise argparse.ArgumentTypeError(f"invalid depth in '{value}'")
+    return d, Path(out_dir)
+
+
+def cmd_build(args: argparse.Namespace) -> None:
+    trees = [load_depth_tree(out_dir, depth) for depth, out_dir in args.dirs]
+    depths = [t.depth for t in trees]
+    if len(set(depths)) != len(depths):
+        raise SystemExit(f"duplicate depths: {depths}")
+    aligned = align_trees(trees)
+    holdout = holdout_errors(aligned)
+    save_aligned(DEPTH_ALIGNED_PATH, aligned, holdout)
+    write_holdout_csv(DEPTH_HOLDOUT_CSV_PATH, holdout)
+
+    print("done.")
+    for d, t in enumerate(trees):
+        print(f"depth={t.depth:g} dir={t.out_dir} nodes={len(t.nodes)} aligned={int(aligned.present[d].sum())}/{len(aligned.keys)}")
+    for r in holdout:
+        print(
+            f"[holdout] depth={r.depth:g} from {r.neighbors[0]:g}/{r.neighbors[1]:g} space={r.space} "
+            f"nodes={r.nodes} tv_mean={r.tv_mean:.4f} tv_max={r.tv_max:.4f} reach_mae={r.reach_mae:.6f}"
+        )
+    if not holdout:
+        print("[warn] need 3+ depths for held-out error estimates")
+    print(f"aligned={DEPTH_ALIGNED_PATH.resolve()}")
+    print(f"csv={DEPTH_HOLDOUT_CSV_PATH.resolve()}")
+
+
+def cmd_at(args: argparse.Namespace) -> None:
+    aligned, holdout = load_aligned()
+    n = aligned.index_of(parse_actions_line(args.node) or "")
+    pred = interpolate(aligned, args.depth, args.space)
+    if not pred.valid[n]:
+        raise SystemExit(f"node not crawled at any depth: {args.node}")
+    if args.hand is not None and args.hand not in HAND_INDEX:
+        raise SystemExit(f"unknown hand: {args.hand}")
+
+    lo, hi = float(aligned.depths[pred.lo[n]]), float(aligned.depths[pred.hi[n]])
+    err = estimate_error(holdout, lo, hi, args.space)
+    print(
+        f"node={args.node} depth={args.depth:g} from {lo:g}/{hi:g} t={pred.t[n]:.3f} space={args.space}"
+        + (" (extrapolated: nearest crawled depth)" if pred.extrapolated[n] else "")
+    )
+    print(f"reach={pred.reach[n]:.6f} est_tv_error={'n/a' if err is None else f'{err:.4f}'}")
+
+    w = pred.ranges[n] * HAND_COMBOS
+    w = w / max(w.sum(), FREQ_EPS)
+    lo_codes, hi_codes = aligned.codes[pred.lo[n], n], aligned.codes[pred.hi[n], n]
+    for a, token in enumerate(aligned.tokens[n]):
+        freq = float((pred.strategy[n, a] * w).sum())
+        size = "" if np.isnan(pred.frac[n, a]) else f" pot_frac={pred.frac[n, a]:.3f}"
+        hand = "" if args.hand is None else f" {args.hand}={pred.strategy[n, a, HAND_INDEX[args.hand]]:.4f}"
+        print(f"  {token}\t[{lo_codes[a] or '-'} / {hi_codes[a] or '-'}]\tfreq={freq:.4f}{size}{hand}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="複数のスタック深さのクロールを揃えて、間の深さを補間する")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"ツリーを揃えて {DEPTH_ALIGNED_PATH} に保存（先頭が基準の深さ）")
+    p_build.add_argument("dirs", nargs="+", type=parse_depth_dir, help="DIR または DEPTH=DIR（例: 100=out2 60=out_60bb）")
+    p_build.set_defaults(func=cmd_build)
+
+    p_at = sub.add_parser("at", help="例: at 80 R2.5 AKo")
+    p_at.add_argument("depth", type=float)
+    p_at.add_argument("node", help=f"基準の深さでの preflop_actions（ROOT は {ROOT_MARKER}）")
+    p_at.add_argument("hand", nargs="?")
+    p_at.add_argument("--space", choices=["log", "linear"], default="log", help="深さ方向の補間軸")
+    p_at.set_defaults(func=cmd_at)
+
+    args = parser.parse_args()
+    if args.command == "build" and len(args.dirs) < 2:
+        parser.error("build needs at least two crawled depths")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
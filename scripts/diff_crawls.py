@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_LABELS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_NAME = "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+DIFF_NODES_CSV_PATH = OUT_DIR / "crawl_diff.csv"
+DIFF_HANDS_CSV_PATH = OUT_DIR / "crawl_diff_hands.csv"
+
+DEFAULT_TOP_HANDS = 200
+# これ未満の差は丸め誤差として無視する
+DELTA_EPS = 1e-6
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str, base_dir: Path = OUT_DIR) -> Path:
+    return base_dir / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+@dataclass
+class NodeArrays:
+    position: str
+    codes: List[str]
+    tf: np.ndarray  # (A,)
+    strategy: np.ndarray  # (A, 169)
+    evs: np.ndarray  # (A, 169)
+    range: Optional[np.ndarray]  # (169,) 手番のレンジ
+
+
+def load_node_arrays(path: Path) -> NodeArrays:
+    spot = load_json(path)
+    codes: List[str] = []
+    tfs: List[float] = []
+    strategy: List[List[float]] = []
+    evs: List[List[float]] = []
+    position = "UNKNOWN"
+    for sol in spot.get("action_solutions") or []:
+        act = sol.get("action") if isinstance(sol, dict) else None
+        if not isinstance(act, dict) or not isinstance(act.get("code"), str) or not act.get("code"):
+            continue
+        strat, ev = sol.get("strategy"), sol.get("evs")
+        if not isinstance(strat, list) or len(strat) != len(HAND_LABELS):
+            continue
+        if not isinstance(ev, list) or len(ev) != len(HAND_LABELS):
+            continue
+        if isinstance(act.get("position"), str):
+            position = act["position"]
+        try:
+            tfs.append(float(sol.get("total_frequency", 0.0)))
+        except (TypeError, ValueError):
+            tfs.append(0.0)
+        codes.append(act["code"])
+        strategy.append(strat)
+        evs.append(ev)
+
+    rng: Optional[np.ndarray] = None
+    for info in spot.get("players_info") or []:
+        if isinstance(info, dict) and isinstance(info.get("player"), dict) and info["player"].get("position") == position:
+            r = info.get("range")
+            if isinstance(r, list) and len(r) == len(HAND_LABELS):
+                rng = np.asarray(r, dtype=np.float64)
+            break
+
+    return NodeArrays(
+        position=position,
+        codes=codes,
+        tf=np.asarray(tfs, dtype=np.float64),
+        strategy=np.asarray(strategy, dtype=np.float64).reshape(-1, len(HAND_LABELS)),
+        evs=np.asarray(evs, dtype=np.float64).reshape(-1, len(HAND_LABELS)),
+        range=rng,
+    )
+
+
+def compute_reach(base_dir: Path, explored_nodes: Set[str]) -> Dict[str, float]:
+    """
+    total_frequency を掛けて root から reach を伝播する（next_street / hand_end は除く）
+    """
+    reach: Dict[str, float] = {"": 1.0}
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+        path = get_node_path(node, base_dir)
+        if not path.exists():
+            continue
+        p_node = reach.get(node, 0.0)
+        for sol in load_json(path).get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+                continue
+            if bool(act.get("next_street", False)) or bool(act.get("is_hand_end", False)):
+                continue
+            try:
+                tf = float(sol.get("total_frequency", 0.0))
+            except (TypeError, ValueError):
+                continue
+            if tf <= FREQ_EPS:
+                continue
+            child = append_action(node, act["code"])
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + p_node * tf
+            q.append(child)
+    return reach
+
+
+@dataclass
+class ChangedBatch:
+    """
+    中身が変わったノードを、action の和集合で揃えた (C, A, 169) の配列にまとめたもの
+    片側にしか無い action は 0 で埋め、present_old / present_new で区別する
+    """
+
+    nodes: List[str]
+    positions: List[str]
+    codes: List[List[str]]
+    tf_old: np.ndarray  # (C, A)
+    tf_new: np.ndarray
+    strat_old: np.ndarray  # (C, A, 169)
+    strat_new: np.ndarray
+    evs_old: np.ndarray
+    evs_new: np.ndarray
+    present_old: np.ndarray  # (C, A) bool
+    present_new: np.ndarray
+    hand_weight: np.ndarray  # (C, 169) 手番レンジ·combos を正規化したもの
+
+
+def build_changed_batch(pairs: List[Tuple[str, NodeArrays, NodeArrays]]) -> ChangedBatch:
+    union: List[List[str]] = []
+    for _, old, new in pairs:
+        codes = list(old.codes)
+        codes += [c for c in new.codes if c not in codes]
+        union.append(codes)
+    n = len(pairs)
+    a_max = max((len(c) for c in union), default=0)
+    shape2 = (n, a_max)
+    shape3 = (n, a_max, len(HAND_LABELS))
+    batch = ChangedBatch(
+        nodes=[p[0] for p in pairs],
+        positions=[p[2].position for p in pairs],
+        codes=union,
+        tf_old=np.zeros(shape2),
+        tf_new=np.zeros(shape2),
+        strat_old=np.zeros(shape3),
+        strat_new=np.zeros(shape3),
+        evs_old=np.zeros(shape3),
+        evs_new=np.zeros(shape3),
+        present_old=np.zeros(shape2, dtype=bool),
+        present_new=np.zeros(shape2, dtype=bool),
+        hand_weight=np.zeros((n, len(HAND_LABELS))),
+    )
+    for i, ((_, old, new), codes) in enumerate(zip(pairs, union)):
+        slot = {c: a for a, c in enumerate(codes)}
+        for side, arrays in (("old", old), ("new", new)):
+            idx = np.asarray([slot[c] for c in arrays.codes], dtype=np.int64)
+            if len(idx) == 0:
+                continue
+            getattr(batch, f"tf_{side}")[i, idx] = arrays.tf
+            getattr(batch, f"strat_{side}")[i, idx] = arrays.strategy
+            getattr(batch, f"evs_{side}")[i, idx] = arrays.evs
+            getattr(batch, f"present_{side}")[i, idx] = True
+        rng = new.range if new.range is not None else old.range
+        w = (rng if rng is not None else np.ones(len(HAND_LABELS))) * HAND_COMBOS
+        batch.hand_weight[i] = w / max(float(w.sum()), FREQ_EPS)
+    return batch
+
+
+def node_deltas(batch: ChangedBatch) -> Dict[str, np.ndarray]:
+    """
+    すべて配列演算でまとめて計算する
+    - tf_shift: 0.5 Σ_a |Δtf|（action 頻度の総変動距離）
+    - strategy_shift: Σ_h w_h · 0.5 Σ_a |Δstrategy|（レンジのうち別アクションへ移った割合）
+    - ev_shift: Σ_h w_h · max_a |Δevs|（両側にある action のみ、bb）
+    - max_strategy_delta / max_ev_delta: 全 (action, hand) での最大変化
+    """
+    both = batch.present_old & batch.present_new
+    d_strat = batch.strat_new - batch.strat_old
+    d_evs = np.where(both[:, :, None], batch.evs_new - batch.evs_old, 0.0)
+    tv = 0.5 * np.abs(d_strat).sum(axis=1)  # (C, 169)
+    return {
+        "tf_shift": 0.5 * np.abs(batch.tf_new - batch.tf_old).sum(axis=1),
+        "strategy_shift": (batch.hand_weight * tv).sum(axis=1),
+        "ev_shift": (batch.hand_weight * np.abs(d_evs).max(axis=1, initial=0.0)).sum(axis=1),
+        "max_strategy_delta": np.abs(d_strat).max(axis=(1, 2), initial=0.0),
+        "max_ev_delta": np.abs(d_evs).max(axis=(1, 2), initial=0.0),
+        "actions_added": (batch.present_new & ~batch.present_old).sum(axis=1),
+        "actions_removed": (batch.present_old & ~batch.present_new).sum(axis=1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="2つのクロール結果（out2 形式のディレクトリ）の差分")
+    parser.add_argument("old_dir")
+    parser.add_argument("new_dir")
+    parser.add_argument("--top-hands", type=int, default=DEFAULT_TOP_HANDS, help="ハンド単位の差分を何件出すか")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    old_dir, new_dir = Path(args.old_dir), Path(args.new_dir)
+    old_nodes = load_explored_list(old_dir / EXPLORED_LIST_NAME)
+    new_nodes = load_explored_list(new_dir / EXPLORED_LIST_NAME)
+    reach_old = compute_reach(old_dir, old_nodes)
+    reach_new = compute_reach(new_dir, new_nodes)
+
+    def reach_of(node: str) -> float:
+        return max(reach_old.get(node, 0.0), reach_new.get(node, 0.0))
+
+    identical = 0
+    pairs: List[Tuple[str, NodeArrays, NodeArrays]] = []
+    added: List[str] = []
+    removed: List[str] = []
+    for node in sorted(old_nodes | new_nodes, key=lambda n: (n.count("-"), n)):
+        p_old, p_new = get_node_path(node, old_dir), get_node_path(node, new_dir)
+        has_old = node in old_nodes and p_old.exists()
+        has_new = node in new_nodes and p_new.exists()
+        if has_old and has_new:
+            # サイズが同じならハッシュで中身を比べて、同一なら読まない
+            if p_old.stat().st_size == p_new.stat().st_size and file_digest(p_old) == file_digest(p_new):
+                identical += 1
+                continue
+            pairs.append((node, load_node_arrays(p_old), load_node_arrays(p_new)))
+        elif has_new:
+            added.append(node)
+        elif has_old:
+            removed.append(node)
+
+    batch = build_changed_batch(pairs)
+    deltas = node_deltas(batch)
+    reach = np.asarray([reach_of(n) for n in batch.nodes], dtype=np.float64)
+    weighted = reach * deltas["strategy_shift"]
+    order = np.argsort(-(weighted + reach * deltas["tf_shift"]), kind="stable")
+
+    with DIFF_NODES_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(
+            [
+                "status",
+                "position",
+                "preflop_actions",
+                "reach",
+                "weighted_strategy_shift",
+                "strategy_shift",
+                "tf_shift",
+                "ev_shift",
+                "max_strategy_delta",
+                "max_ev_delta",
+                "actions_added",
+                "actions_removed",
+            ]
+        )
+        for i in order.tolist():
+            w.writerow(
+                [
+                    "changed",
+                    batch.positions[i],
+                    ROOT_MARKER if batch.nodes[i] == "" else batch.nodes[i],
+                    reach[i],
+                    weighted[i],
+                    deltas["strategy_shift"][i],
+                    deltas["tf_shift"][i],
+                    deltas["ev_shift"][i],
+                    deltas["max_strategy_delta"][i],
+                    deltas["max_ev_delta"][i],
+                    int(deltas["actions_added"][i]),
+                    int(deltas["actions_removed"][i]),
+                ]
+            )
+        for status, nodes in (("added", added), ("removed", removed)):
+            for node in sorted(nodes, key=reach_of, reverse=True):
+                w.writerow([status, "", ROOT_MARKER if node == "" else node, reach_of(node)] + [""] * 8)
+
+    # ハンド単位: reach × レンジ重み × |Δstrategy| の大きい順
+    if pairs:
+        d_strat = batch.strat_new - batch.strat_old  # (C, A, 169)
+        score = reach[:, None, None] * batch.hand_weight[:, None, :] * np.abs(d_strat)
+        flat = score.ravel()
+        cand = np.flatnonzero(np.abs(d_strat).ravel() > DELTA_EPS)
+        k = min(args.top_hands, len(cand))
+        top = cand[np.argsort(-flat[cand], kind="stable")[:k]] if k else cand[:0]
+    else:
+        top = np.zeros(0, dtype=np.int64)
+    with DIFF_HANDS_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["preflop_actions", "action", "hand", "strategy_old", "strategy_new", "evs_old", "evs_new", "weighted_delta"])
+        if len(top):
+            c_idx, a_idx, h_idx = np.unravel_index(top, score.shape)
+            for c, a, h in zip(c_idx.tolist(), a_idx.tolist(), h_idx.tolist()):
+                node = batch.nodes[c]
+                w.writerow(
+                    [
+                        ROOT_MARKER if node == "" else node,
+                        batch.codes[c][a],
+                        HAND_LABELS[h],
+                        batch.strat_old[c, a, h] if batch.present_old[c, a] else "",
+                        batch.strat_new[c, a, h] if batch.present_new[c, a] else "",
+                        batch.evs_old[c, a, h] if batch.present_old[c, a] else "",
+                        batch.evs_new[c, a, h] if batch.present_new[c, a] else "",
+                        score[c, a, h],
+                    ]
+                )
+
+    elapsed = time.perf_counter() - t0
+    print("done.")
+    print(f"nodes_old={len(old_nodes)} nodes_new={len(new_nodes)} identical={identical} changed={len(pairs)} added={len(added)} removed={len(removed)} elapsed={elapsed:.2f}s")
+    if pairs:
+        print(f"reach_weighted_strategy_shift={float(weighted.sum()):.6f} max_strategy_delta={float(deltas['max_strategy_delta'].max()):.6f} max_ev_delta={float(deltas['max_ev_delta'].max()):.6f}")
+    print(f"nodes_csv={DIFF_NODES_CSV_PATH.resolve()}")
+    print(f"hands_csv={DIFF_HANDS_CSV_PATH.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
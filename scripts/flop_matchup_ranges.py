@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from flop_ranges import flop_situation_ranges
+from hand_order import HAND_COMBOS, HAND_LABELS
+from pot_types import pot_type
+
+OUT_DIR = Path("out2")
+FLOP_FREQUENCIES_CSV_PATH = OUT_DIR / "flop_situations_frequencies.csv"
+
+MATCHUP_RANGES_PATH = OUT_DIR / "flop_matchup_ranges.npz"
+MATCHUP_SUMMARY_CSV_PATH = OUT_DIR / "flop_matchup_ranges.csv"
+
+# マッチアップ表記の並び順
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+
+def load_flop_frequencies(path: Path) -> List[Tuple[str, float]]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run summarize_flop_situations.py first)")
+    out: List[Tuple[str, float]] = []
+    with path.open("r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or "flop_situation" not in reader.fieldnames:
+            raise RuntimeError("CSV must have 'flop_situation' column")
+        for row in reader:
+            s = (row.get("flop_situation") or "").strip()
+            if not s:
+                continue
+            out.append((s, float(row.get("prob_unconditional") or 0.0)))
+    return out
+
+
+def matchup_label(positions: List[str]) -> str:
+    order = {p: i for i, p in enumerate(POSITIONS)}
+    return " vs ".join(sorted(positions, key=lambda p: order.get(p, len(order))))
+
+
+def aggregate(
+    rows: List[Tuple[str, float, Dict[str, np.ndarray]]],
+) -> Tuple[List[Tuple[str, str, str]], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (pot_type, matchup, position) ごとに prob_unconditional 重みで range を平均する
+    シチュエーション × 169 の行列に対して、バケット × シチュエーションの重み行列を 1 回掛けるだけ
+    戻り値: (keys, ranges[B,169], prob[B], n_situations[B])
+    """
+    keys: List[Tuple[str, str, str]] = []
+    key_index: Dict[Tuple[str, str, str], int] = {}
+    entry_bucket: List[int] = []
+    entry_prob: List[float] = []
+    entry_range: List[np.ndarray] = []
+
+    for s, prob, players in rows:
+        pt = pot_type(s)
+        mu = matchup_label(list(players))
+        for pos, rng in players.items():
+            key = (pt, mu, pos)
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            entry_bucket.append(key_index[key])
+            entry_prob.append(prob)
+            entry_range.append(rng)
+
+    n_entries = len(entry_bucket)
+    weights = np.zeros((len(keys), n_entries), dtype=np.float64)
+    weights[entry_bucket, np.arange(n_entries)] = entry_prob
+    stacked = np.vstack(entry_range) if entry_range else np.zeros((0, len(HAND_LABELS)))
+
+    prob = weights.sum(axis=1)
+    ranges = (weights @ stacked) / np.maximum(prob, 1e-300)[:, None]
+    n_situations = (weights > 0).sum(axis=1)
+    return keys, ranges, prob, n_situations
+
+
+def save_matchup_ranges(path: Path, keys: List[Tuple[str, str, str]], ranges: np.ndarray, prob: np.ndarray) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        pot_types=np.array([k[0] for k in keys], dtype=str),
+        matchups=np.array([k[1] for k in keys], dtype=str),
+        positions=np.array([k[2] for k in keys], dtype=str),
+        ranges=ranges.astype(np.float32),
+        prob=prob,
+    )
+    tmp.replace(path)
+
+
+def lookup_range(pot: str, matchup: str, position: str, path: Path = MATCHUP_RANGES_PATH) -> Optional[np.ndarray]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `flop_matchup_ranges.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path} (rerun `flop_matchup_ranges.py build`)")
+        hit = np.flatnonzero((z["pot_types"] == pot) & (z["matchups"] == matchup) & (z["positions"] == position))
+        if hit.size == 0:
+            return None
+        return z["ranges"][hit[0]].astype(np.float64)
+
+
+def cmd_build(_: argparse.Namespace) -> None:
+    freqs = load_flop_frequencies(FLOP_FREQUENCIES_CSV_PATH)
+    cache: Dict[str, Dict[str, Any]] = {}
+
+    rows: List[Tuple[str, float, Dict[str, np.ndarray]]] = []
+    skipped = 0
+    for s, prob in freqs:
+        players = flop_situation_ranges(s, cache)
+        if not players:
+            skipped += 1
+            continue
+        rows.append((s, prob, players))
+
+    keys, ranges, prob, n_situations = aggregate(rows)
+    save_matchup_ranges(MATCHUP_RANGES_PATH, keys, ranges, prob)
+
+    total_flop = sum(p for _, p, _ in rows)
+    order = sorted(range(len(keys)), key=lambda i: (-prob[i], keys[i]))
+    with MATCHUP_SUMMARY_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["pot_type", "matchup", "position", "prob_unconditional", "prob_given_flop", "situations", "combos"])
+        for i in order:
+            pt, mu, pos = keys[i]
+            w.writerow([pt, mu, pos, prob[i], prob[i] / total_flop if total_flop else 0.0, int(n_situations[i]), float(ranges[i] @ HAND_COMBOS)])
+
+    print("done.")
+    print(f"flop_situations={len(freqs)} used={len(rows)} skipped={skipped} buckets={len(keys)}")
+    print(f"ranges={MATCHUP_RANGES_PATH.resolve()}")
+    print(f"csv={MATCHUP_SUMMARY_CSV_PATH.resolve()}")
+
+
+def cmd_show(args: argparse.Namespace) -> None:
+    rng = lookup_range(args.pot_type, args.matchup, args.position)
+    if rng is None:
+        raise KeyError(f"no bucket: pot_type={args.pot_type} matchup='{args.matchup}' position={args.position}")
+    print(f"combos={rng @ HAND_COMBOS:.1f}")
+    for h in np.argsort(-rng, kind="stable"):
+        if rng[h] <= 0.0:
+            break
+        print(f"{HAND_LABELS[h]}\t{rng[h]:.3f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ポットタイプ × マッチアップごとのフロップ到達レンジ")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{FLOP_FREQUENCIES_CSV_PATH} から {MATCHUP_RANGES_PATH} を作る")
+    p_build.set_defaults(func=cmd_build)
+
+    p_show = sub.add_parser("show", help="例: show SRP 'BTN vs BB' BB")
+    p_show.add_argument("pot_type")
+    p_show.add_argument("matchup")
+    p_show.add_argument("position")
+    p_show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+フロップシチュエーション（例: R2.5-F-F-F-F-C）に到達した時点の各プレイヤーのレンジ
+preflop_equity.py / flop_matchup_ranges.py から使う
+"""
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from hand_order import N_HANDS
+
+OUT_DIR = Path("out2")
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def flop_situation_ranges(situation: str, cache: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    フロップに進んだ時点で残っている各プレイヤーの range（169）を {position: range} で返す（行動順）
+    経路上の各ノードで、手番の range（players_info）に選んだアクションの strategy を掛けていく
+    F したプレイヤーは除く。経路上のノードが無ければ None
+    cache は node -> spot JSON（呼び出し側で使い回す）
+    """
+    ranges: Dict[str, np.ndarray] = {}
+    folded = set()
+    node = ""
+    for code in situation.split("-"):
+        spot = cache.get(node)
+        if spot is None:
+            path = get_node_path(node)
+            if not path.exists():
+                return None
+            spot = cache[node] = load_json(path)
+
+        actor: Optional[str] = None
+        strategy: Optional[np.ndarray] = None
+        for sol in spot.get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if isinstance(act, dict) and act.get("code") == code:
+                actor = act.get("position")
+                strat = sol.get("strategy")
+                if isinstance(strat, list) and len(strat) == N_HANDS:
+                    strategy = np.asarray(strat, dtype=np.float64)
+                break
+        if actor is None or strategy is None:
+            return None
+
+        rng: Optional[np.ndarray] = None
+        for info in spot.get("players_info") or []:
+            if isinstance(info, dict) and isinstance(info.get("player"), dict) and info["player"].get("position") == actor:
+                r = info.get("range")
+                if isinstance(r, list) and len(r) == N_HANDS:
+                    rng = np.asarray(r, dtype=np.float64)
+                break
+        if rng is None:
+            return None
+
+        ranges[actor] = rng * strategy
+        if code.upper().startswith("F"):
+            folded.add(actor)
+        node = append_action(node, code)
+
+    return {pos: r for pos, r in ranges.items() if pos not in folded}
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む
+FLOP_SITUATIONS_PATH = OUT_DIR / "flop_situations.txt"
+ROOT_MARKER = "ROOT"
+
+SENSITIVITY_CSV_PATH = OUT_DIR / "flop_situation_sensitivity.csv"
+
+DEFAULT_TOP_K = 10
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def load_flop_situations(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            s = line.strip()
+            if not s:
+                continue
+            out.append(s)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def iter_actions(spot: Dict[str, Any]) -> List[Tuple[str, float, bool, bool]]:
+    """
+    (code, total_frequency, next_street, is_hand_end) を返す
+    total_frequency > eps のみ
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, float, bool, bool]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        try:
+            tf = float(sol.get("total_frequency", 0.0))
+        except Exception:
+            tf = 0.0
+        if tf <= FREQ_EPS:
+            continue
+        act = sol.get("action", {})
+        if not isinstance(act, dict):
+            continue
+        code = act.get("code")
+        if not isinstance(code, str) or not code:
+            continue
+        out.append(
+            (code, tf, bool(act.get("next_street", False)), bool(act.get("is_hand_end", False)))
+        )
+    return out
+
+
+@dataclass
+class EdgeGraph:
+    """
+    edge e = parent[e] --code--> child[e]（ノード）または flop[e]（フロップシチュエーション）
+    edges は parent の BFS 順に並んでいる
+    """
+
+    nodes: List[str]
+    edge_label: List[str]  # append_action(parent, code)
+    parent: np.ndarray  # (E,) int32
+    child: np.ndarray  # (E,) int32（-1: ノードに繋がらない）
+    flop: np.ndarray  # (E,) int32（-1: フロップシチュエーションではない）
+    tf: np.ndarray  # (E,) float64
+    flop_situations: List[str]
+    flop_edge: np.ndarray  # (F,) int32 各シチュエーションの最後の枝
+    in_edge: np.ndarray  # (N,) int32 各ノードへ入る枝（root は -1）
+
+
+def load_edge_graph(explored_nodes: Set[str], flop_situations: List[str]) -> EdgeGraph:
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    situation_index = {s: i for i, s in enumerate(flop_situations)}
+    nodes: List[str] = []
+    node_index: Dict[str, int] = {}
+    raw_edges: List[Tuple[int, str, float, Optional[str], int]] = []
+
+    q: deque[str] = deque([""])
+    while q:
+        node = q.popleft()
+        if node in node_index:
+            continue
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        node_index[node] = len(nodes)
+        nodes.append(node)
+
+        for code, tf, next_street, is_hand_end in iter_actions(load_json(path)):
+            label = append_action(node, code)
+            if is_hand_end:
+                raw_edges.append((node_index[node], label, tf, None, -1))
+            elif next_street:
+                raw_edges.append((node_index[node], label, tf, None, situation_index.get(label, -1)))
+            elif label in explored_nodes:
+                raw_edges.append((node_index[node], label, tf, label, -1))
+                q.append(label)
+            else:
+                raw_edges.append((node_index[node], label, tf, None, -1))
+
+    flop_edge = np.full(len(flop_situations), -1, dtype=np.int32)
+    for e, (_, _, _, _, f) in enumerate(raw_edges):
+        if f >= 0:
+            flop_edge[f] = e
+
+    child = np.asarray([node_index.get(r[3], -1) if r[3] is not None else -1 for r in raw_edges], dtype=np.int32)
+    in_edge = np.full(len(nodes), -1, dtype=np.int32)
+    has_child = child >= 0
+    in_edge[child[has_child]] = np.flatnonzero(has_child)
+
+    return EdgeGraph(
+        nodes=nodes,
+        edge_label=[r[1] for r in raw_edges],
+        parent=np.asarray([r[0] for r in raw_edges], dtype=np.int32),
+        child=child,
+        flop=np.asarray([r[4] for r in raw_edges], dtype=np.int32),
+        tf=np.asarray([r[2] for r in raw_edges], dtype=np.float64),
+        flop_situations=flop_situations,
+        flop_edge=flop_edge,
+        in_edge=in_edge,
+    )
+
+
+@dataclass
+class Sensitivity:
+    reach: np.ndarray  # (N,) 前向き: ノード到達確率
+    adjoint: np.ndarray  # (N,) 後ろ向き: d(総フロップ確率) / d reach(node)
+    edge_mass: np.ndarray  # (E,) その枝の下にあるフロップ確率の合計
+    prob: np.ndarray  # (F,) 無条件確率
+    total: float
+
+
+def compute_sensitivity(g: EdgeGraph) -> Sensitivity:
+    """
+    前向き1回 + 後ろ向き1回（reverse accumulation）
+    reach(child) = reach(parent) * tf
+    adjoint(node) = Σ_e tf_e * (adjoint(child_e) or 1 if flop edge)
+    edge_mass_e = reach(parent_e) * tf_e * (adjoint(child_e) or 1)
+    """
+    n_nodes = len(g.nodes)
+    reach = np.zeros(n_nodes, dtype=np.float64)
+    if n_nodes:
+        reach[0] = 1.0
+    for e in range(len(g.tf)):
+        c = g.child[e]
+        if c >= 0:
+            reach[c] += reach[g.parent[e]] * g.tf[e]
+
+    adjoint = np.zeros(n_nodes, dtype=np.float64)
+    leaf_value = (g.flop >= 0).astype(np.float64)
+    for e in range(len(g.tf) - 1, -1, -1):
+        c = g.child[e]
+        below = adjoint[c] if c >= 0 else leaf_value[e]
+        adjoint[g.parent[e]] += g.tf[e] * below
+
+    below = np.where(g.child >= 0, adjoint[np.maximum(g.child, 0)], leaf_value)
+    edge_mass = reach[g.parent] * g.tf * below
+
+    valid = g.flop_edge >= 0
+    prob = np.zeros(len(g.flop_situations), dtype=np.float64)
+    prob[valid] = edge_mass[g.flop_edge[valid]]
+    total = float(adjoint[0]) if n_nodes else 0.0
+    return Sensitivity(reach=reach, adjoint=adjoint, edge_mass=edge_mass, prob=prob, total=total)
+
+
+def path_edges(g: EdgeGraph, flop_idx: int) -> np.ndarray:
+    """
+    root からそのシチュエーションまでの枝番号（根→葉の順）
+    """
+    e = int(g.flop_edge[flop_idx])
+    out: List[int] = []
+    while e >= 0:
+        out.append(e)
+        e = int(g.in_edge[g.parent[e]])
+    return np.asarray(out[::-1], dtype=np.int64)
+
+
+def top_contributors(
+    g: EdgeGraph, sens: Sensitivity, flop_idx: int, k: int, global_order: np.ndarray
+) -> List[Tuple[int, bool, float, float]]:
+    """
+    prob_given_flop(s) = prob(s) / total の、各枝 tf に対する
+    - elasticity = d ln q_s / d ln tf_e = [e が s の経路上] - edge_mass_e / total
+    - gradient   = d q_s / d tf_e = q_s * elasticity / tf_e
+    を |elasticity| 上位 k 件返す: (edge, on_path, elasticity, gradient)
+    経路外の枝は全シチュエーション共通で -edge_mass/total なので global_order から取る
+    """
+    q_s = sens.prob[flop_idx] / sens.total
+    on_path = path_edges(g, flop_idx)
+    on_set = set(on_path.tolist())
+
+    cands: List[Tuple[int, bool, float]] = []
+    for e in on_path.tolist():
+        cands.append((e, True, 1.0 - sens.edge_mass[e] / sens.total))
+    taken = 0
+    for e in global_order.tolist():
+        if taken >= k:
+            break
+        if e in on_set:
+            continue
+        cands.append((e, False, -sens.edge_mass[e] / sens.total))
+        taken += 1
+
+    cands.sort(key=lambda c: abs(c[2]), reverse=True)
+    return [(e, on, el, q_s * el / g.tf[e]) for e, on, el in cands[:k]]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="フロップシチュエーション確率の各枝頻度に対する感度")
+    parser.add_argument("-k", type=int, default=DEFAULT_TOP_K, help="シチュエーションごとの上位件数")
+    args = parser.parse_args()
+
+    explored_nodes = load_explored_list(EXPLORED_LIST_PATH)
+    flop_situations = load_flop_situations(FLOP_SITUATIONS_PATH)
+
+    g = load_edge_graph(explored_nodes, flop_situations)
+    sens = compute_sensitivity(g)
+    if sens.total <= 0.0:
+        raise RuntimeError("total_flop_prob is 0. Nothing to normalize.")
+
+    global_order = np.argsort(-sens.edge_mass, kind="stable")
+    reachable = np.flatnonzero(sens.prob > FREQ_EPS)
+    reachable = reachable[np.argsort(-sens.prob[reachable], kind="stable")]
+
+    with SENSITIVITY_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["flop_situation", "prob_given_flop", "rank", "edge", "total_frequency", "on_path", "elasticity", "gradient"])
+        for fi in reachable.tolist():
+            q_s = sens.prob[fi] / sens.total
+            for rank, (e, on, el, grad) in enumerate(top_contributors(g, sens, fi, args.k, global_order), start=1):
+                w.writerow([g.flop_situations[fi], q_s, rank, g.edge_label[e], g.tf[e], int(on), el, grad])
+
+    print("done.")
+    print(f"nodes={len(g.nodes)} edges={len(g.tf)} flop_situations={len(reachable)}/{len(flop_situations)}")
+    print(f"total_flop_prob_unconditional={sens.total}")
+    print(f"csv={SENSITIVITY_CSV_PATH.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
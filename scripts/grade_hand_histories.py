@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_INDEX, N_HANDS, RANKS, hand_label
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+PLAYERS_CSV_PATH = OUT_DIR / "hand_history_players.csv"
+LEAKS_CSV_PATH = OUT_DIR / "hand_history_leaks.csv"
+
+# 6-max のみ採点（席順は BTN の次から SB, BB, UTG, HJ, CO, BTN）
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+SEAT_ORDER_FROM_SB = ["SB", "BB", "UTG", "HJ", "CO", "BTN"]
+
+DEFAULT_BATCH_HANDS = 5000
+DEFAULT_TOP_LEAKS = 10
+# solver がほぼ取らないアクション（この頻度未満）をミスとして数える
+LOW_FREQ = 0.05
+# この割合以上サイズがずれたレイズは「ツリー外サイズを近いサイズに寄せた」として数える
+SIZE_TRANSLATION_TOL = 0.05
+
+HAND_START_RE = re.compile(r"^\S.*\bHand #\d+")
+BUTTON_RE = re.compile(r"Seat #(\d+) is the button")
+SEAT_RE = re.compile(r"^Seat (\d+): (.+?) \(\D*([\d.,]+) in chips")
+BIG_BLIND_RE = re.compile(r"^(.+?): posts big blind \D*([\d.,]+)")
+DEALT_RE = re.compile(r"^Dealt to (.+?) \[(\w\w) (\w\w)\]")
+SHOWS_RE = re.compile(r"^(.+?): shows \[(\w\w) (\w\w)")
+ACTION_RE = re.compile(r"^(.+?): (folds|checks|calls|raises)(?: \D*([\d.,]+))?(?: to \D*([\d.,]+))?(.*)$")
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def card_class(c1: str, c2: str) -> Optional[int]:
+    """
+    "Ah", "Kd" -> 169 配列の index（HAND_LABELS 順）
+    """
+    r1, r2 = RANKS.find(c1[0].upper()), RANKS.find(c2[0].upper())
+    if r1 < 0 or r2 < 0:
+        return None
+    return HAND_INDEX[hand_label(r1, r2, c1[1].lower() == c2[1].lower())]
+
+
+def parse_amount(s: str) -> float:
+    return float(s.replace(",", ""))
+
+
+@dataclass
+class PreflopTree:
+    """
+    ハンド履歴を辿るための、全ノードを前読みしたツリー
+    action 行は action_offsets[n]:action_offsets[n+1] がノード n の分
+    """
+
+    nodes: List[str]
+    actor: List[str]  # (N,)
+    action_offsets: np.ndarray  # (N+1,) int64
+    codes: List[str]  # (M,)
+    kinds: List[str]  # (M,) code_kind + "X"
+    betsize: np.ndarray  # (M,) float64 レイズ後の額（bb）
+    allin: np.ndarray  # (M,) bool
+    child: np.ndarray  # (M,) int32（-1: ツリー内に子ノードなし）
+    strategy: np.ndarray  # (M, 169) float32
+    evs: np.ndarray  # (M, 169) float32
+
+
+def load_preflop_tree(explored_nodes: Set[str]) -> PreflopTree:
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    nodes: List[str] = []
+    actor: List[str] = []
+    offsets: List[int] = [0]
+    labels: List[str] = []
+    codes: List[str] = []
+    kinds: List[str] = []
+    betsize: List[float] = []
+    allin: List[bool] = []
+    strategy: List[List[float]] = []
+    evs: List[List[float]] = []
+
+    for node in sorted(explored_nodes, key=lambda n: (n.count("-"), n)):
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+        rows = 0
+        position = "UNKNOWN"
+        for sol in spot.get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+                continue
+            strat, ev = sol.get("strategy"), sol.get("evs")
+            if not isinstance(strat, list) or len(strat) != N_HANDS or not isinstance(ev, list) or len(ev) != N_HANDS:
+                continue
+            code = act["code"]
+            if isinstance(act.get("position"), str):
+                position = act["position"]
+            try:
+                size = float(act.get("betsize") or 0.0)
+            except (TypeError, ValueError):
+                size = 0.0
+            codes.append(code)
+            kinds.append("X" if code.upper() == "X" else code_kind(code))
+            betsize.append(size)
+            allin.append(bool(act.get("allin", False)) or code.upper() == "RAI")
+            strategy.append(strat)
+            evs.append(ev)
+            labels.append(append_action(node, code))
+            rows += 1
+        if rows == 0:
+            continue
+        nodes.append(node)
+        actor.append(position)
+        offsets.append(offsets[-1] + rows)
+
+    node_index = {n: i for i, n in enumerate(nodes)}
+    return PreflopTree(
+        nodes=nodes,
+        actor=actor,
+        action_offsets=np.asarray(offsets, dtype=np.int64),
+        codes=codes,
+        kinds=kinds,
+        betsize=np.asarray(betsize, dtype=np.float64),
+        allin=np.asarray(allin, dtype=bool),
+        child=np.asarray([node_index.get(label, -1) for label in labels], dtype=np.int32),
+        strategy=np.asarray(strategy, dtype=np.float32).reshape(-1, N_HANDS),
+        evs=np.asarray(evs, dtype=np.float32).reshape(-1, N_HANDS),
+    )
+
+
+def translate_action(tree: PreflopTree, n: int, kind: str, to_bb: float, is_allin: bool) -> Tuple[Optional[int], bool]:
+    """
+    履歴のアクションをノード n の action 行に対応させる
+    戻り値: (row, サイズを寄せたか)
+    """
+    start, stop = int(tree.action_offsets[n]), int(tree.action_offsets[n + 1])
+    rows = range(start, stop)
+    if kind == "F":
+        return next((r for r in rows if tree.kinds[r] == "F"), None), False
+    if kind in ("C", "X"):
+        # BB のリンプ後チェックは X、それ以外のチェック/コールは C
+        exact = next((r for r in rows if tree.kinds[r] == kind), None)
+        if exact is not None:
+            return exact, False
+        return next((r for r in rows if tree.kinds[r] in ("C", "X")), None), False
+
+    raises = [r for r in rows if tree.kinds[r] in ("R", "AI")]
+    if not raises:
+        return None, False
+    if is_allin:
+        shove = next((r for r in raises if tree.allin[r]), None)
+        if shove is not None:
+            return shove, False
+    best = min(raises, key=lambda r: abs(tree.betsize[r] - to_bb))
+    size = tree.betsize[best]
+    return best, size <= 0.0 or abs(size - to_bb) > SIZE_TRANSLATION_TOL * size
+
+
+@dataclass
+class ParsedHand:
+    hand_id: str
+    positions: Dict[str, str]  # player -> position
+    cards: Dict[str, int]  # player -> 169 index（見えているものだけ）
+    actions: List[Tuple[str, str, float, bool]]  # (player, kind, to_bb, allin)
+
+
+def parse_hand(text: str) -> Tuple[Optional[ParsedHand], str]:
+    """
+    PokerStars 形式のテキスト 1 ハンド分を読む
+    戻り値: (hand, スキップ理由)
+    """
+    lines = text.splitlines()
+    m = re.search(r"Hand #(\d+)", lines[0]) if lines else None
+    if m is None:
+        return None, "no_header"
+    hand_id = m.group(1)
+
+    button: Optional[int] = None
+    seats: List[Tuple[int, str]] = []
+    bb: Optional[float] = None
+    cards: Dict[str, int] = {}
+    actions: List[Tuple[str, str, float, bool]] = []
+    street = "setup"
+
+    for raw in lines[1:]:
+        line = raw.strip()
+        if line.startswith("***"):
+            if "HOLE CARDS" in line:
+                street = "preflop"
+            elif "SUMMARY" in line:
+                break
+            else:
+                street = "postflop"
+            continue
+
+        if street == "setup":
+            if button is None:
+                bm = BUTTON_RE.search(line)
+                if bm:
+                    button = int(bm.group(1))
+                    continue
+            sm = SEAT_RE.match(line)
+            if sm and "sitting out" not in line and "out of hand" not in line:
+                seats.append((int(sm.group(1)), sm.group(2)))
+                continue
+            bbm = BIG_BLIND_RE.match(line)
+            if bbm:
+                bb = parse_amount(bbm.group(2))
+                continue
+            if "posts straddle" in line or "posts the ante" in line:
+                return None, "straddle_or_ante"
+            continue
+
+        sh = SHOWS_RE.match(line)
+        if sh:
+            idx = card_class(sh.group(2), sh.group(3))
+            if idx is not None:
+                cards[sh.group(1)] = idx
+            continue
+        if street != "preflop":
+            continue
+        dm = DEALT_RE.match(line)
+        if dm:
+            idx = card_class(dm.group(2), dm.group(3))
+            if idx is not None:
+                cards[dm.group(1)] = idx
+            continue
+        am = ACTION_RE.match(line)
+        if am is None or bb is None:
+            continue
+        player, verb, amount, to_amount, rest = am.groups()
+        is_allin = "all-in" in (rest or "")
+        if verb == "folds":
+            actions.append((player, "F", 0.0, False))
+        elif verb == "checks":
+            actions.append((player, "X", 0.0, False))
+        elif verb == "calls":
+            actions.append((player, "C", 0.0, is_allin))
+        elif to_amount is not None:
+            actions.append((player, "R", parse_amount(to_amount) / bb, is_allin))
+        elif amount is not None:
+            actions.append((player, "R", parse_amount(amount) / bb, is_allin))
+
+    if button is None or bb is None:
+        return None, "no_button_or_blind"
+    if len(seats) != len(POSITIONS):
+        return None, "not_6max"
+
+    seats.sort()
+    after_button = [s for s in seats if s[0] > button] + [s for s in seats if s[0] <= button]
+    positions = {name: pos for (_, name), pos in zip(after_button, SEAT_ORDER_FROM_SB)}
+    return ParsedHand(hand_id, positions, cards, actions), ""
+
+
+@dataclass
+class GradeResult:
+    hands: int = 0
+    skipped: Dict[str, int] = field(default_factory=dict)
+    off_tree: int = 0
+    translated: int = 0
+    # player -> [hands, decisions, freq_sum, low_freq, ev_loss]
+    players: Dict[str, List[float]] = field(default_factory=dict)
+    # (player, position, node, code) -> [decisions, freq_sum, ev_loss]
+    leaks: Dict[Tuple[str, str, str, str], List[float]] = field(default_factory=dict)
+
+    def merge(self, other: "GradeResult") -> None:
+        self.hands += other.hands
+        self.off_tree += other.off_tree
+        self.translated += other.translated
+        for k, v in other.skipped.items():
+            self.skipped[k] = self.skipped.get(k, 0) + v
+        for table_self, table_other in ((self.players, other.players), (self.leaks, other.leaks)):
+            for k, v in table_other.items():
+                cur = table_self.get(k)
+                if cur is None:
+                    table_self[k] = list(v)
+                else:
+                    for i, x in enumerate(v):
+                        cur[i] += x
+
+
+def grade_hand(tree: PreflopTree, node_index: Dict[str, int], hand: ParsedHand, out: GradeResult) -> None:
+    graded_players: Set[str] = set()
+    n = node_index[""]
+    for player, kind, to_bb, is_allin in hand.actions:
+        pos = hand.positions.get(player)
+        if pos is None or pos != tree.actor[n]:
+            # 席順とツリーの手番が合わない（途中参加のデッドブラインド等）
+            out.skipped["actor_mismatch"] = out.skipped.get("actor_mismatch", 0) + 1
+            return
+        row, translated = translate_action(tree, n, kind, to_bb, is_allin)
+        if row is None:
+            out.off_tree += 1
+            return
+        if translated:
+            out.translated += 1
+
+        h = hand.cards.get(player)
+        if h is not None:
+            start, stop = int(tree.action_offsets[n]), int(tree.action_offsets[n + 1])
+            freq = float(tree.strategy[row, h])
+            ev_loss = float(tree.evs[start:stop, h].max() - tree.evs[row, h])
+            stats = out.players.setdefault(player, [0.0, 0.0, 0.0, 0.0, 0.0])
+            if player not in graded_players:
+                stats[0] += 1
+                graded_players.add(player)
+            stats[1] += 1
+            stats[2] += freq
+            stats[3] += freq < LOW_FREQ
+            stats[4] += ev_loss
+            leak = out.leaks.setdefault((player, pos, tree.nodes[n], tree.codes[row]), [0.0, 0.0, 0.0])
+            leak[0] += 1
+            leak[1] += freq
+            leak[2] += ev_loss
+
+        n = int(tree.child[row])
+        if n < 0:
+            # ハンド終了 / フロップへ / 未探索ノード
+            return
+
+
+_TREE: Optional[PreflopTree] = None
+_NODE_INDEX: Dict[str, int] = {}
+
+
+def _init_worker(tree: PreflopTree) -> None:
+    global _TREE, _NODE_INDEX
+    _TREE = tree
+    _NODE_INDEX = {n: i for i, n in enumerate(tree.nodes)}
+
+
+def grade_batch(texts: List[str]) -> GradeResult:
+    assert _TREE is not None
+    out = GradeResult()
+    for text in texts:
+        hand, reason = parse_hand(text)
+        if hand is None:
+            out.skipped[reason] = out.skipped.get(reason, 0) + 1
+            continue
+        out.hands += 1
+        grade_hand(_TREE, _NODE_INDEX, hand, out)
+    return out
+
+
+def iter_hand_texts(paths: List[Path]) -> Iterator[str]:
+    """
+    ファイルを 1 行ずつ読み、"... Hand #123" の行で区切って 1 ハンドずつ返す
+    """
+    for path in paths:
+        buf: List[str] = []
+        with path.open("r", encoding="utf-8-sig", errors="replace") as f:
+            for line in f:
+                if HAND_START_RE.match(line) and buf:
+                    yield "".join(buf)
+                    buf = []
+                if buf or HAND_START_RE.match(line):
+                    buf.append(line)
+        if buf:
+            yield "".join(buf)
+
+
+def iter_batches(texts: Iterator[str], size: int) -> Iterator[List[str]]:
+    batch: List[str] = []
+    for text in texts:
+        batch.append(text)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run_grading(tree: PreflopTree, paths: List[Path], batch: int, workers: Optional[int]) -> GradeResult:
+    total = GradeResult()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tree,)) as pool:
+        # 全ファイルを一度にメモリへ載せないよう、投げておく batch 数を制限する
+        max_pending = 2 * (workers or os.cpu_count() or 1)
+        pending: Set[Future[GradeResult]] = set()
+        for texts in iter_batches(iter_hand_texts(paths), batch):
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    total.merge(fut.result())
+            pending.add(pool.submit(grade_batch, texts))
+        for fut in pending:
+            total.merge(fut.result())
+    return total
+
+
+def collect_paths(inputs: List[str]) -> List[Path]:
+    paths: List[Path] = []
+    for s in inputs:
+        p = Path(s)
+        if p.is_dir():
+            paths.extend(sorted(q for q in p.rglob("*.txt") if q.is_file()))
+        elif p.exists():
+            paths.append(p)
+        else:
+            raise FileNotFoundError(f"not found: {p}")
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ハンド履歴のプリフロップ判断を解いたツリーで採点する")
+    parser.add_argument("inputs", nargs="+", help="ハンド履歴ファイル or ディレクトリ（*.txt を再帰的に読む）")
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH_HANDS, help="1タスクあたりのハンド数")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU 数）")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_LEAKS, help="プレイヤーごとに出すリーク件数")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    tree = load_preflop_tree(load_explored_list(EXPLORED_LIST_PATH))
+    paths = collect_paths(args.inputs)
+    result = run_grading(tree, paths, args.batch, args.workers)
+    elapsed = time.perf_counter() - t0
+
+    players = sorted(result.players.items(), key=lambda kv: -kv[1][4])
+    with PLAYERS_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["player", "hands", "decisions", "mean_freq", "low_freq_decisions", "ev_loss_bb", "ev_loss_bb_per_decision"])
+        for player, (hands, decisions, freq_sum, low, ev_loss) in players:
+            w.writerow([player, int(hands), int(decisions), freq_sum / decisions, int(low), ev_loss, ev_loss / decisions])
+
+    by_player: Dict[str, List[Tuple[Tuple[str, str, str, str], List[float]]]] = {}
+    for key, value in result.leaks.items():
+        by_player.setdefault(key[0], []).append((key, value))
+    with LEAKS_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["player", "position", "preflop_actions", "action", "decisions", "mean_freq", "ev_loss_bb"])
+        for player, _ in players:
+            rows = sorted(by_player.get(player, []), key=lambda kv: -kv[1][2])[: args.top]
+            for (_, pos, node, code), (decisions, freq_sum, ev_loss) in rows:
+                w.writerow([player, pos, ROOT_MARKER if node == "" else node, code, int(decisions), freq_sum / decisions, ev_loss])
+
+    decisions = sum(int(v[1]) for v in result.players.values())
+    print("done.")
+    print(f"files={len(paths)} hands={result.hands} decisions={decisions} players={len(result.players)} elapsed={elapsed:.2f}s")
+    print(f"off_tree={result.off_tree} size_translated={result.translated}")
+    for reason, count in sorted(result.skipped.items()):
+        print(f"  skipped_{reason}={count}")
+    print(f"players_csv={PLAYERS_CSV_PATH.resolve()}")
+    print(f"leaks_csv={LEAKS_CSV_PATH.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_INDEX, HAND_LABELS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+HAND_INDEX_PATH = OUT_DIR / "hand_index.npz"
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def get_active_position(spot: Dict[str, Any]) -> str:
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list) or not sols:
+        return "UNKNOWN"
+    first = sols[0]
+    if not isinstance(first, dict):
+        return "UNKNOWN"
+    act = first.get("action")
+    if not isinstance(act, dict):
+        return "UNKNOWN"
+    pos = act.get("position")
+    return pos if isinstance(pos, str) else "UNKNOWN"
+
+
+def get_player_range(spot: Dict[str, Any], position: str) -> Optional[List[float]]:
+    infos = spot.get("players_info")
+    if not isinstance(infos, list):
+        return None
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        player = info.get("player")
+        if not isinstance(player, dict) or player.get("position") != position:
+            continue
+        rng = info.get("range")
+        if isinstance(rng, list) and len(rng) == len(HAND_LABELS):
+            return rng
+    return None
+
+
+def iter_action_strategies(spot: Dict[str, Any]) -> List[Tuple[str, float, bool, bool, List[float]]]:
+    """
+    (code, total_frequency, next_street, is_hand_end, strategy[169]) を返す
+    頻度 0 のアクションも含める（ハンド単位では意味があるため）
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, float, bool, bool, List[float]]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        try:
+            tf = float(sol.get("total_frequency", 0.0))
+        except Exception:
+            tf = 0.0
+        act = sol.get("action", {})
+        if not isinstance(act, dict):
+            continue
+        code = act.get("code")
+        if not isinstance(code, str) or not code:
+            continue
+        strategy = sol.get("strategy")
+        if not isinstance(strategy, list) or len(strategy) != len(HAND_LABELS):
+            continue
+        out.append(
+            (
+                code,
+                tf,
+                bool(act.get("next_street", False)),
+                bool(act.get("is_hand_end", False)),
+                strategy,
+            )
+        )
+    return out
+
+
+@dataclass
+class NodeRecord:
+    node: str
+    position: str
+    reach: float
+    codes: List[str]
+    strategy: np.ndarray  # (A, 169)
+    range: np.ndarray  # (169,)
+
+
+def load_reached_nodes(explored_nodes: Set[str]) -> List[NodeRecord]:
+    """
+    root から reach を伝播しつつ、到達した各ノードの手番レンジと strategy を集める
+    （json は各ノード 1 回だけ読む）
+    """
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    reach: Dict[str, float] = {"": 1.0}
+    records: List[NodeRecord] = []
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+
+        p_node = reach.get(node)
+        if p_node is None:
+            continue
+
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+
+        actions = iter_action_strategies(spot)
+        pos = get_active_position(spot)
+        rng = get_player_range(spot, pos)
+        if actions and rng is not None:
+            records.append(
+                NodeRecord(
+                    node=node,
+                    position=pos,
+                    reach=p_node,
+                    codes=[a[0] for a in actions],
+                    strategy=np.asarray([a[4] for a in actions], dtype=np.float64),
+                    range=np.asarray(rng, dtype=np.float64),
+                )
+            )
+
+        for code, tf, next_street, is_hand_end, _ in actions:
+            if tf <= FREQ_EPS or next_street or is_hand_end:
+                continue
+            child = append_action(node, code)
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + (p_node * tf)
+            q.append(child)
+
+    return records
+
+
+@dataclass
+class HandIndex:
+    """
+    ハンドクラス -> [(node, position, weight, mixed, {code: freq})] の転置インデックス
+    CSR 形式: hand h のエントリは entries[offsets[h]:offsets[h+1]]（weight 降順）
+    weight = reach(node) × 手番レンジの range[h]
+    """
+
+    nodes: List[str]
+    node_positions: List[str]
+    node_codes: np.ndarray  # (N, A_max) str（空文字はパディング）
+    offsets: np.ndarray  # (170,) int64
+    entry_node: np.ndarray  # (E,) int32
+    entry_weight: np.ndarray  # (E,) float32
+    entry_mixed: np.ndarray  # (E,) bool
+    entry_freqs: np.ndarray  # (E, A_max) float32（NaN はパディング）
+
+    def entries(
+        self, hand: str, mixed_only: bool = False
+    ) -> List[Tuple[str, str, float, bool, Dict[str, float]]]:
+        h = HAND_INDEX.get(hand)
+        if h is None:
+            raise KeyError(f"unknown hand: {hand}")
+        lo, hi = int(self.offsets[h]), int(self.offsets[h + 1])
+        out: List[Tuple[str, str, float, bool, Dict[str, float]]] = []
+        for e in range(lo, hi):
+            if mixed_only and not self.entry_mixed[e]:
+                continue
+            n = int(self.entry_node[e])
+            freqs = {
+                str(code): float(freq)
+                for code, freq in zip(self.node_codes[n], self.entry_freqs[e])
+                if code
+            }
+            out.append(
+                (self.nodes[n], self.node_positions[n], float(self.entry_weight[e]), bool(self.entry_mixed[e]), freqs)
+            )
+        return out
+
+
+def build_hand_index(records: List[NodeRecord], mixed_eps: float = 1e-3) -> HandIndex:
+    n_nodes = len(records)
+    a_max = max((len(r.codes) for r in records), default=0)
+
+    node_codes = np.full((n_nodes, a_max), "", dtype=object)
+    strategy = np.full((n_nodes, a_max, len(HAND_LABELS)), np.nan, dtype=np.float64)
+    ranges = np.zeros((n_nodes, len(HAND_LABELS)), dtype=np.float64)
+    reach = np.zeros(n_nodes, dtype=np.float64)
+    for n, r in enumerate(records):
+        node_codes[n, : len(r.codes)] = r.codes
+        strategy[n, : len(r.codes)] = r.strategy
+        ranges[n] = r.range
+        reach[n] = r.reach
+
+    # (N, 169) をまとめて計算してから hand 主キーに並べ替える
+    weight = reach[:, None] * ranges
+    top = np.nanmax(strategy, axis=1) if a_max else np.zeros_like(weight)
+    mixed = top < 1.0 - mixed_eps
+    keep = weight > FREQ_EPS
+
+    hand_of_entry, node_of_entry = np.nonzero(keep.T)  # hand 昇順
+    w = weight[node_of_entry, hand_of_entry]
+    order = np.lexsort((-w, hand_of_entry))
+    hand_of_entry = hand_of_entry[order]
+    node_of_entry = node_of_entry[order]
+
+    counts = np.bincount(hand_of_entry, minlength=len(HAND_LABELS))
+    offsets = np.zeros(len(HAND_LABELS) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    return HandIndex(
+        nodes=[r.node for r in records],
+        node_positions=[r.position for r in records],
+        node_codes=node_codes.astype(str),
+        offsets=offsets,
+        entry_node=node_of_entry.astype(np.int32),
+        entry_weight=weight[node_of_entry, hand_of_entry].astype(np.float32),
+        entry_mixed=mixed[node_of_entry, hand_of_entry],
+        entry_freqs=strategy[node_of_entry, :, hand_of_entry].astype(np.float32),
+    )
+
+
+def save_hand_index(path: Path, index: HandIndex) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        nodes=np.array([ROOT_MARKER if n == "" else n for n in index.nodes], dtype=str),
+        node_positions=np.array(index.node_positions, dtype=str),
+        node_codes=index.node_codes,
+        offsets=index.offsets,
+        entry_node=index.entry_node,
+        entry_weight=index.entry_weight,
+        entry_mixed=index.entry_mixed,
+        entry_freqs=index.entry_freqs,
+    )
+    tmp.replace(path)
+
+
+def load_hand_index(path: Path = HAND_INDEX_PATH) -> HandIndex:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `hand_index.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        return HandIndex(
+            nodes=["" if n == ROOT_MARKER else str(n) for n in z["nodes"]],
+            node_positions=[str(p) for p in z["node_positions"]],
+            node_codes=z["node_codes"],
+            offsets=z["offsets"],
+            entry_node=z["entry_node"],
+            entry_weight=z["entry_weight"],
+            entry_mixed=z["entry_mixed"],
+            entry_freqs=z["entry_freqs"],
+        )
+
+
+def cmd_build(_: argparse.Namespace) -> None:
+    explored_nodes = load_explored_list(EXPLORED_LIST_PATH)
+    records = load_reached_nodes(explored_nodes)
+    index = build_hand_index(records)
+    save_hand_index(HAND_INDEX_PATH, index)
+
+    print("done.")
+    print(f"nodes={len(index.nodes)} entries={len(index.entry_node)} mixed={int(index.entry_mixed.sum())}")
+    print(f"index={HAND_INDEX_PATH.resolve()}")
+
+
+def cmd_show(args: argparse.Namespace) -> None:
+    index = load_hand_index()
+    rows = index.entries(args.hand, mixed_only=args.mixed)
+    for node, pos, weight, mixed, freqs in rows[: args.k]:
+        freq_cell = " ".join(f"{code}={freq:.3f}" for code, freq in freqs.items())
+        flag = "mixed" if mixed else "pure"
+        print(f"{ROOT_MARKER if node == '' else node}\t{pos}\t{weight:.6f}\t{flag}\t{freq_cell}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ハンドクラスから判断ノードを引く転置インデックス")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} から {HAND_INDEX_PATH} を作る")
+    p_build.set_defaults(func=cmd_build)
+
+    p_show = sub.add_parser("show", help="例: show KJo --mixed")
+    p_show.add_argument("hand")
+    p_show.add_argument("--mixed", action="store_true", help="混合戦略のノードだけ")
+    p_show.add_argument("-k", type=int, default=50)
+    p_show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
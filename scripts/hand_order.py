@@ -0,0 +1,92 @@
+"""
+solutions の 169 配列（strategy / evs / range など）のハンドの並び
+
+JSON の配列は simple_hand_counters のキーと同じ「ラベルの辞書順」（22, 32o, 32s, 33, 42o, ..., 98s, 99,
+A2o, ..., AA, ..., TT）。ランク順ではないので、index を計算式で作らず必ずここを通すこと
+
+numpy の表（HAND_COMBOS / CARD_CLASS）は初回参照時に作る（analysis_daemon のクライアントは numpy を読み込まない）
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+
+
+def hand_label(rank_a: int, rank_b: int, suited: bool) -> str:
+    """
+    ランク index（0 = 2, ..., 12 = A）2 つからハンドクラス名（例: AKs, 72o, TT）
+    """
+    hi, lo = max(rank_a, rank_b), min(rank_a, rank_b)
+    if hi == lo:
+        return RANKS[hi] * 2
+    return RANKS[hi] + RANKS[lo] + ("s" if suited else "o")
+
+
+def build_hand_labels() -> List[str]:
+    labels = {hand_label(hi, lo, suited) for hi in range(len(RANKS)) for lo in range(hi + 1) for suited in (False, True)}
+    return sorted(labels)
+
+
+HAND_LABELS = build_hand_labels()
+HAND_INDEX = {h: i for i, h in enumerate(HAND_LABELS)}
+N_HANDS = len(HAND_LABELS)
+
+
+def build_hand_combos() -> Any:
+    """
+    各ハンドクラスのコンボ数（ペア6 / オフスート12 / スーテッド4）の (169,) 配列
+    """
+    import numpy as np
+
+    return np.array(
+        [6.0 if len(h) == 2 else (4.0 if h.endswith("s") else 12.0) for h in HAND_LABELS],
+        dtype=np.float64,
+    )
+
+
+def build_card_class() -> Any:
+    """
+    カード index（rank * 4 + suit）2 枚 -> ハンドクラス index の (52, 52) 表（同じカード同士は -1）
+    """
+    import numpy as np
+
+    table = np.full((52, 52), -1, dtype=np.int64)
+    for c1 in range(52):
+        for c2 in range(52):
+            if c1 != c2:
+                r1, s1 = divmod(c1, 4)
+                r2, s2 = divmod(c2, 4)
+                table[c1, c2] = HAND_INDEX[hand_label(r1, r2, s1 == s2)]
+    return table
+
+
+_LAZY_TABLES = {"HAND_COMBOS": build_hand_combos, "CARD_CLASS": build_card_class}
+
+
+def __getattr__(name: str) -> Any:
+    build = _LAZY_TABLES.get(name)
+    if build is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = build()
+    return value
+
+
+def card_index(card: str) -> int:
+    """
+    "Ah" -> rank * 4 + suit
+    """
+    return RANKS.index(card[0].upper()) * 4 + SUITS.index(card[1].lower())
+
+
+def check_spot_hand_order(spot: Dict[str, Any]) -> None:
+    """
+    simple_hand_counters のキー順が HAND_LABELS と一致するか（違えば ValueError）
+    """
+    for info in spot.get("players_info") or []:
+        counters = info.get("simple_hand_counters") if isinstance(info, dict) else None
+        if isinstance(counters, dict) and counters:
+            if list(counters.keys()) != HAND_LABELS:
+                raise ValueError("simple_hand_counters keys are not in HAND_LABELS order")
+            return
@@ -0,0 +1,32 @@
+"""
+プリフロップのアクション列（例: R2.5-F-R7.5-F-F-C）からポット種別
+simulate_hands.py / flop_matchup_ranges.py / rollup_cube.py のレポートで同じスポットが同じラベルになるよう、ここだけで決める
+
+レイズ（R... / オールイン）の回数で数える: 0 = UNOPENED（誰も参加していない。ウォークも含む）/ LIMP（コールだけ）,
+1 = SRP, 2 = 3BP, 3 = 4BP, 4 以上 = 5BP+
+"""
+from __future__ import annotations
+
+from typing import List
+
+POT_TYPES = ["UNOPENED", "LIMP", "SRP", "3BP", "4BP", "5BP+"]
+
+
+def is_raise_code(code: str) -> bool:
+    u = code.upper()
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return True
+    return u.startswith("R")
+
+
+def pot_type(preflop_actions: str) -> str:
+    codes: List[str] = preflop_actions.split("-") if preflop_actions else []
+    raises = sum(1 for code in codes if is_raise_code(code))
+    if raises == 0:
+        return "LIMP" if any(code.upper().startswith("C") for code in codes) else "UNOPENED"
+    return POT_TYPES[min(raises + 1, len(POT_TYPES) - 1)]
+
+
+def pot_type_order(label: str) -> int:
+    return POT_TYPES.index(label) if label in POT_TYPES else len(POT_TYPES)
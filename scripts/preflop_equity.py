@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from flop_ranges import flop_situation_ranges
+from hand_order import CARD_CLASS, HAND_INDEX, HAND_LABELS, N_HANDS
+
+OUT_DIR = Path("out2")
+FLOP_SITUATIONS_PATH = OUT_DIR / "flop_situations.txt"
+
+EQUITY_CACHE_PATH = OUT_DIR / "preflop_equity.npz"
+FLOP_EQUITY_CSV_PATH = OUT_DIR / "flop_situation_equity.csv"
+
+# スート同型クラス 1 つあたりのボードサンプル数（標準誤差 ≒ 0.5 / sqrt(n)）
+DEFAULT_SAMPLES = 2000
+# 1 回の評価でまとめて扱う (クラス × サンプル) の上限
+EVAL_CHUNK = 200_000
+
+N_COMBOS = 1326
+
+
+def load_flop_situations(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            s = line.strip()
+            if not s:
+                continue
+            out.append(s)
+    return out
+
+
+# ---- コンボ（card = rank * 4 + suit、rank 0 が 2 / 12 が A） ----
+
+COMBOS = np.array(list(itertools.combinations(range(52), 2)), dtype=np.int16)  # (1326, 2)
+
+# 各コンボの 169 クラス番号（HAND_LABELS 順）
+COMBO_CLASS = CARD_CLASS[COMBOS[:, 0], COMBOS[:, 1]]
+
+# 2 コンボがカードを共有していないか（1326 × 1326）
+_COMBO_MASKS = (np.uint64(1) << COMBOS[:, 0].astype(np.uint64)) | (np.uint64(1) << COMBOS[:, 1].astype(np.uint64))
+DISJOINT = (_COMBO_MASKS[:, None] & _COMBO_MASKS[None, :]) == 0
+
+
+# ---- テーブル駆動の 7 枚評価 ----
+
+def _build_bit_tables() -> Tuple[np.ndarray, np.ndarray, List[np.ndarray]]:
+    """
+    13bit のランク集合に対する表
+    - HIGHEST[m]: 最上位ビットのランク（m=0 は -1）
+    - STRAIGHT[m]: ストレートの最高ランク + 1（無ければ 0、A-5 は 5-high）
+    - TOPK[k][m]: 上位 k ランクを 16 進 k 桁にした値
+    """
+    size = 1 << 13
+    highest = np.full(size, -1, dtype=np.int64)
+    straight = np.zeros(size, dtype=np.int64)
+    topk = [np.zeros(size, dtype=np.int64) for _ in range(6)]
+    windows = [(0b11111 << lo, lo + 4) for lo in range(9)]
+    wheel = (1 << 12) | 0b1111
+    for m in range(size):
+        bits = [r for r in range(12, -1, -1) if m >> r & 1]
+        if bits:
+            highest[m] = bits[0]
+        for k in range(1, 6):
+            v = 0
+            for r in bits[:k]:
+                v = v * 16 + r
+            topk[k][m] = v
+        best = 0
+        for w, high in windows:
+            if m & w == w:
+                best = high + 1
+        if best == 0 and m & wheel == wheel:
+            best = 3 + 1
+        straight[m] = best
+    return highest, straight, topk
+
+
+HIGHEST, STRAIGHT, TOPK = _build_bit_tables()
+
+CAT_SHIFT = 16 ** 5
+CAT_HIGH, CAT_PAIR, CAT_TWO_PAIR, CAT_TRIPS, CAT_STRAIGHT, CAT_FLUSH, CAT_FULL_HOUSE, CAT_QUADS, CAT_STRAIGHT_FLUSH = range(9)
+
+
+def evaluate7(cards: np.ndarray) -> np.ndarray:
+    """
+    cards: (M, 7) int → (M,) int64 の強さ（大きいほど強い、同値は引き分け）
+    役の種類 × 16^5 + キッカーを 16 進で並べた値
+    """
+    cards = cards.astype(np.int64)
+    m = cards.shape[0]
+    ranks = cards // 4
+    suits = cards % 4
+    rows = np.arange(m)[:, None]
+
+    counts = np.zeros((m, 13), dtype=np.int64)
+    np.add.at(counts, (np.broadcast_to(rows, ranks.shape), ranks), 1)
+    bit = 1 << np.arange(13, dtype=np.int64)
+    present = (counts >= 1) @ bit
+    pairs = (counts >= 2) @ bit
+    trips = (counts >= 3) @ bit
+    quads = (counts >= 4) @ bit
+
+    suit_masks = np.zeros((m, 4), dtype=np.int64)
+    rank_bits = 1 << ranks
+    for s in range(4):
+        suit_masks[:, s] = np.where(suits == s, rank_bits, 0).sum(axis=1)
+    suit_counts = np.stack([(suits == s).sum(axis=1) for s in range(4)], axis=1)
+    flush_suit = suit_counts.argmax(axis=1)
+    has_flush = suit_counts.max(axis=1) >= 5
+    flush_mask = suit_masks[np.arange(m), flush_suit]
+
+    score = CAT_HIGH * CAT_SHIFT + TOPK[5][present]
+
+    p1 = HIGHEST[pairs]
+    p1_bit = np.where(p1 >= 0, 1 << np.maximum(p1, 0), 0)
+    rest = present & ~p1_bit
+    score = np.where(p1 >= 0, CAT_PAIR * CAT_SHIFT + p1 * 16 ** 3 + TOPK[3][rest], score)
+
+    p2 = HIGHEST[pairs & ~p1_bit]
+    p2_bit = np.where(p2 >= 0, 1 << np.maximum(p2, 0), 0)
+    two_pair = CAT_TWO_PAIR * CAT_SHIFT + p1 * 256 + p2 * 16 + HIGHEST[present & ~p1_bit & ~p2_bit]
+    score = np.where(p2 >= 0, two_pair, score)
+
+    t = HIGHEST[trips]
+    t_bit = np.where(t >= 0, 1 << np.maximum(t, 0), 0)
+    score = np.where(t >= 0, CAT_TRIPS * CAT_SHIFT + t * 256 + TOPK[2][present & ~t_bit], score)
+
+    st = STRAIGHT[present]
+    score = np.where(st > 0, CAT_STRAIGHT * CAT_SHIFT + st, score)
+
+    score = np.where(has_flush, CAT_FLUSH * CAT_SHIFT + TOPK[5][flush_mask], score)
+
+    fh_pair = HIGHEST[pairs & ~t_bit]
+    score = np.where((t >= 0) & (fh_pair >= 0), CAT_FULL_HOUSE * CAT_SHIFT + t * 16 + fh_pair, score)
+
+    q = HIGHEST[quads]
+    q_bit = np.where(q >= 0, 1 << np.maximum(q, 0), 0)
+    score = np.where(q >= 0, CAT_QUADS * CAT_SHIFT + q * 16 + HIGHEST[present & ~q_bit], score)
+
+    sf = np.where(has_flush, STRAIGHT[flush_mask], 0)
+    score = np.where(sf > 0, CAT_STRAIGHT_FLUSH * CAT_SHIFT + sf, score)
+    return score
+
+
+# ---- スート同型で 1326 × 1326 を圧縮 ----
+
+def canonical_matchups() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    カードを共有しない全 (hero, villain) コンボ対を、スートの置換と hero/villain の入れ替えで
+    同一視したクラスにまとめる
+    戻り値: (hero_idx, villain_idx, class_of_pair, flipped, reps[K,4])
+    flipped=True の対は代表の villain 側から見た値（1 - equity）を使う
+    """
+    hero_idx, villain_idx = np.nonzero(np.triu(DISJOINT, k=1))
+    a = COMBOS[hero_idx].astype(np.int64)
+    b = COMBOS[villain_idx].astype(np.int64)
+
+    def encode(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        x1, x2 = np.minimum(x[:, 0], x[:, 1]), np.maximum(x[:, 0], x[:, 1])
+        y1, y2 = np.minimum(y[:, 0], y[:, 1]), np.maximum(y[:, 0], y[:, 1])
+        return ((x1 * 52 + x2) * 52 + y1) * 52 + y2
+
+    best = np.full(len(hero_idx), np.iinfo(np.int64).max, dtype=np.int64)
+    flipped = np.zeros(len(hero_idx), dtype=bool)
+    for perm in itertools.permutations(range(4)):
+        p = np.asarray(perm, dtype=np.int64)
+        pa = (a // 4) * 4 + p[a % 4]
+        pb = (b // 4) * 4 + p[b % 4]
+        for key, flip in ((encode(pa, pb), False), (encode(pb, pa), True)):
+            better = key < best
+            best = np.where(better, key, best)
+            flipped = np.where(better, flip, flipped)
+
+    keys, class_of_pair = np.unique(best, return_inverse=True)
+    reps = np.stack([keys // 52 ** 3, keys // 52 ** 2 % 52, keys // 52 % 52, keys % 52], axis=1)
+    return hero_idx, villain_idx, class_of_pair, flipped, reps
+
+
+def simulate_matchups(args: Tuple[np.ndarray, int, np.random.SeedSequence]) -> np.ndarray:
+    """
+    reps: (B, 4) の各代表について samples 枚ずつランダムボードを配り hero の equity を返す
+    """
+    reps, samples, seed = args
+    rng = np.random.default_rng(seed)
+    out = np.zeros(len(reps), dtype=np.float64)
+    per = max(1, EVAL_CHUNK // samples)
+    for lo in range(0, len(reps), per):
+        block = reps[lo : lo + per]
+        n = len(block) * samples
+        used = np.repeat(block, samples, axis=0)
+        keys = rng.random((n, 52))
+        keys[np.arange(n)[:, None], used] = np.inf
+        board = np.argpartition(keys, 5, axis=1)[:, :5]
+        hero = evaluate7(np.concatenate([used[:, :2], board], axis=1))
+        villain = evaluate7(np.concatenate([used[:, 2:], board], axis=1))
+        eq = (hero > villain) + 0.5 * (hero == villain)
+        out[lo : lo + len(block)] = eq.reshape(len(block), samples).mean(axis=1)
+    return out
+
+
+def build_equity_matrices(samples: int, workers: Optional[int], seed: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    1326 × 1326（カード共有は 0）と、それをコンボ数で平均した 169 × 169 を作る
+    """
+    hero_idx, villain_idx, class_of_pair, flipped, reps = canonical_matchups()
+
+    n_chunks = max(1, min(256, len(reps) // 64))
+    parts = np.array_split(np.arange(len(reps)), n_chunks)
+    seeds = np.random.SeedSequence(seed).spawn(len(parts))
+    class_eq = np.zeros(len(reps), dtype=np.float64)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(simulate_matchups, [(reps[p], samples, s) for p, s in zip(parts, seeds)])
+        for p, eq in zip(parts, results):
+            class_eq[p] = eq
+
+    pair_eq = np.where(flipped, 1.0 - class_eq[class_of_pair], class_eq[class_of_pair])
+    eq1326 = np.zeros((N_COMBOS, N_COMBOS), dtype=np.float32)
+    eq1326[hero_idx, villain_idx] = pair_eq
+    eq1326[villain_idx, hero_idx] = 1.0 - pair_eq
+
+    eq169 = class_matrix(eq1326)
+    return eq1326, eq169, len(reps)
+
+
+def class_matrix(eq1326: np.ndarray) -> np.ndarray:
+    onehot = np.zeros((N_COMBOS, N_HANDS), dtype=np.float64)
+    onehot[np.arange(N_COMBOS), COMBO_CLASS] = 1.0
+    num = onehot.T @ eq1326.astype(np.float64) @ onehot
+    den = onehot.T @ DISJOINT.astype(np.float64) @ onehot
+    return np.where(den > 0, num / np.maximum(den, 1.0), np.nan)
+
+
+def load_equity_cache(path: Path = EQUITY_CACHE_PATH) -> Tuple[np.ndarray, np.ndarray]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `preflop_equity.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path} (rerun `preflop_equity.py build`)")
+        return z["eq1326"], z["eq169"]
+
+
+def expand_range(range169: np.ndarray) -> np.ndarray:
+    """
+    169 クラスの range（0..1 の頻度）を 1326 コンボの重みにする
+    """
+    return np.asarray(range169, dtype=np.float64)[COMBO_CLASS]
+
+
+def range_vs_range(eq1326: np.ndarray, hero169: np.ndarray, villain169: np.ndarray) -> float:
+    """
+    カードリムーバル込みの all-in equity: Σ h_i v_j E_ij / Σ h_i v_j [i,j がカードを共有しない]
+    """
+    h = expand_range(hero169)
+    v = expand_range(villain169)
+    den = float(h @ DISJOINT @ v)
+    if den <= 0.0:
+        return float("nan")
+    return float(h @ eq1326.astype(np.float64) @ v) / den
+
+
+def cmd_build(args: argparse.Namespace) -> None:
+    t0 = time.perf_counter()
+    eq1326, eq169, n_classes = build_equity_matrices(args.samples, args.workers, args.seed)
+    EQUITY_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = EQUITY_CACHE_PATH.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp, eq1326=eq1326, eq169=eq169, hands=np.array(HAND_LABELS), samples=args.samples)
+    tmp.replace(EQUITY_CACHE_PATH)
+
+    print("done.")
+    print(f"matchup_classes={n_classes} samples_per_class={args.samples} elapsed={time.perf_counter() - t0:.1f}s")
+    for a, b in (("AA", "KK"), ("AKs", "QQ"), ("AKo", "22"), ("72o", "AA")):
+        print(f"  {a} vs {b}: {eq169[HAND_INDEX[a], HAND_INDEX[b]]:.4f}")
+    print(f"cache={EQUITY_CACHE_PATH.resolve()}")
+
+
+def cmd_flop(_: argparse.Namespace) -> None:
+    eq1326, _ = load_equity_cache()
+    situations = load_flop_situations(FLOP_SITUATIONS_PATH)
+
+    cache: Dict[str, Dict[str, Any]] = {}
+    written = 0
+    skipped = 0
+    multiway = 0
+    with FLOP_EQUITY_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["flop_situation", "position_a", "equity_a", "position_b", "equity_b", "combos_a", "combos_b"])
+        for s in situations:
+            players = flop_situation_ranges(s, cache)
+            if not players:
+                skipped += 1
+                continue
+            if len(players) != 2:
+                # all-in equity 表はヘッズアップのみ
+                multiway += 1
+                continue
+            (pa, ra), (pb, rb) = players.items()
+            eq = range_vs_range(eq1326, ra, rb)
+            combos_a = float(expand_range(ra).sum())
+            combos_b = float(expand_range(rb).sum())
+            w.writerow([s, pa, eq, pb, 1.0 - eq, combos_a, combos_b])
+            written += 1
+
+    print("done.")
+    print(f"flop_situations={len(situations)} rows_written={written} skipped={skipped} multiway={multiway}")
+    print(f"csv={FLOP_EQUITY_CSV_PATH.resolve()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="プリフロップ all-in equity 表と range vs range equity")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"1326×1326 / 169×169 の equity 表を作って {EQUITY_CACHE_PATH} に保存")
+    p_build.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    p_build.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU 数）")
+    p_build.add_argument("--seed", type=int, default=0)
+    p_build.set_defaults(func=cmd_build)
+
+    p_flop = sub.add_parser("flop", help=f"{FLOP_SITUATIONS_PATH} の各シチュエーションの equity を出す")
+    p_flop.set_defaults(func=cmd_flop)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,22 @@
 from __future__ import annotations
 
+import argparse
+import fcntl
+import hashlib
+import heapq
 import json
+import os
 import re
+import subprocess
+import sys
+import threading
 import time
-from collections import deque
-from dataclasses import dataclass
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import requests
 
@@ -24,13 +34,39 @@ SPOT_SOLUTION_URL = "https://api.gtowizard.com/v4/solutions/spot-solution"
 
 FREQ_EPS = 1e-9
 
+# "bfs": 従来どおり全枝を幅優先 / "reach": 到達確率の高いノードから取得
+CRAWL_MODE = "bfs"
+# reach モード: 到達確率の合計がこの割合まで確定したら止める
+COVERAGE_TARGET = 0.999
+# reach モード: API リクエスト数の上限（None で無制限）
+REQUEST_BUDGET: Optional[int] = None
+
 OUT_DIR = Path("out2")
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # ここは「探索完了済み（子展開まで済んだ）」のログにする
 EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"
+# reach モードで打ち切った時点の未取得ノード（reach 付き）
+FRONTIER_PATH = OUT_DIR / "uncrawled_frontier.txt"
+# reach モードで 404 だったノード（"preflop_actions<TAB>記録時刻"）。次回はリクエストせず、予算も使わない
+MISSING_LIST_PATH = OUT_DIR / "missing_actions.txt"
 ROOT_MARKER = "ROOT"
 
+# API レスポンスのキャッシュ（(gametype, depth, preflop_actions) 単位）
+# ディスク側は既定で無効（None = メモリだけ）。取得結果は OUT_DIR にも保存されるので、二重に持つのは
+# 複数プロセス / 複数ツールで API 呼び出しを共有したいときだけにする（--cache-dir で指定。例: cache/spot_solutions）
+CACHE_DIR: Optional[Path] = None
+CACHE_MEMORY_BYTES = 256 * 1024 * 1024
+# 404 の記録（.missing）を信じる期間。過ぎたら取り直す（後からソルブされることがあるため）。None なら無期限
+MISSING_TTL_SEC: Optional[float] = 7 * 24 * 3600
+
+# シャード分割: 先頭 SHARD_PREFIX_DEPTH 個のアクションのハッシュで担当シャードを決める（部分木ごと同じシャード）
+# それより浅い「上の方」のノードはシャード 0 の担当。ほかのシャードも担当の部分木に辿り着くために自分で取る
+# 深くするほど部分木が細かくなって偏りが減るが、各シャードが重複して取る上の方のノードが増える（--shard-depth）
+SHARD_PREFIX_DEPTH = 3
+SHARDS_DIR = OUT_DIR / "shards"
+SHARD_MERGE_REPORT_PATH = OUT_DIR / "shard_merge_report.json"
+
 
 def sanitize_filename(name: str) -> str:
     if not name:
@@ -85,40 +121,351 @@ def append_explored_line(path: Path, preflop_actions: str) -> None:
             f.write(preflop_actions + "\n")
 
 
+def load_missing_list(path: Path) -> Dict[str, float]:
+    """
+    preflop_actions -> 最後に 404 を記録した時刻
+    """
+    out: Dict[str, float] = {}
+    if not path.exists():
+        return out
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            name, _, recorded_at = line.rstrip("\n").partition("\t")
+            node = parse_actions_line(name)
+            if node is None:
+                continue
+            try:
+                out[node] = max(out.get(node, 0.0), float(recorded_at))
+            except ValueError:
+                continue
+    return out
+
+
+def append_missing_line(path: Path, preflop_actions: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(f"{preflop_actions or ROOT_MARKER}\t{time.time()}\n")
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """
+    index 番目 / count 個のシャード
+    ノードの担当は「先頭 prefix_depth 個のアクション」のハッシュで決まる（同じ部分木は必ず同じシャード）
+    それより浅いノードはシャード 0 の担当。ほかのシャードも担当の子孫に辿り着くために読む（explored には書かない）
+    シャード同士は何も共有しないので、別マシンでも走らせられる
+    """
+
+    index: int
+    count: int
+    prefix_depth: int = SHARD_PREFIX_DEPTH
+
+    @property
+    def out_dir(self) -> Path:
+        return shard_dir(self.index, self.count)
+
+    def owns(self, node: str) -> bool:
+        return shard_of(node, self.count, self.prefix_depth) == self.index
+
+    def must_traverse(self, node: str) -> bool:
+        return node_depth(node) < self.prefix_depth
+
+
+def node_depth(preflop_actions: str) -> int:
+    return 0 if preflop_actions == "" else preflop_actions.count("-") + 1
+
+
+def shard_of(preflop_actions: str, count: int, prefix_depth: int = SHARD_PREFIX_DEPTH) -> int:
+    if node_depth(preflop_actions) < prefix_depth:
+        return 0
+    prefix = "-".join(preflop_actions.split("-")[:prefix_depth])
+    digest = hashlib.blake2b(prefix.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count
+
+
+def shard_dir(index: int, count: int) -> Path:
+    return SHARDS_DIR / f"{index:02d}of{count:02d}"
+
+
 @dataclass(frozen=True)
 class ActionEdge:
     code: str
     next_street: bool
     is_hand_end: bool
+    total_frequency: float = 0.0
+
+
+CacheKey = Tuple[str, int, str]
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    # 別スレッドが取得中だったので、その結果を待って使った
+    coalesced: int = 0
+    # ロック待ちの間に別プロセスがディスクに書いた（= そのプロセスの取得を共有した）
+    lock_waits: int = 0
+    # 実際に API を叩いた回数（404 も含む）
+    misses: int = 0
+    not_found: int = 0
+    evictions: int = 0
+    memory_bytes: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits + self.coalesced + self.lock_waits
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return " ".join(f"{k}={v}" for k, v in asdict(self).items()) + f" hit_rate={self.hit_rate:.2%}"
+
+
+class SolutionCache:
+    """
+    spot solution のキャッシュ
+    - メモリ: JSON バイト列の LRU（CACHE_MEMORY_BYTES まで）
+    - ディスク: disk_dir/<gametype>/<depth>/<node>.json を複数プロセスで共有。404 は .missing で覚える
+      .missing は更新時刻から missing_ttl_sec か、refresh_missing_since より前のものは無視して取り直す
+    - 同じキーの同時取得はまとめる（スレッド間は Future、プロセス間はキーごとの flock。.lock は使い終わったら消す）
+    """
+
+    def __init__(
+        self,
+        disk_dir: Optional[Path] = CACHE_DIR,
+        memory_bytes: int = CACHE_MEMORY_BYTES,
+        missing_ttl_sec: Optional[float] = MISSING_TTL_SEC,
+        refresh_missing_since: Optional[float] = None,
+    ) -> None:
+        self.disk_dir = disk_dir
+        self.memory_bytes = memory_bytes
+        self.missing_ttl_sec = missing_ttl_sec
+        self.refresh_missing_since = refresh_missing_since
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._inflight: Dict[CacheKey, "Future[bytes]"] = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, key: CacheKey) -> Tuple[Path, Path, Path]:
+        assert self.disk_dir is not None
+        gametype, depth, preflop_actions = key
+        base = self.disk_dir / sanitize_filename(gametype) / str(depth)
+        name = sanitize_filename(preflop_actions)
+        return base / f"{name}.json", base / f"{name}.missing", base / f"{name}.lock"
+
+    def _memory_get(self, key: CacheKey) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+            return data
+
+    def _memory_put(self, key: CacheKey, data: bytes) -> None:
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self.stats.memory_bytes -= len(old)
+            self._memory[key] = data
+            self.stats.memory_bytes += len(data)
+            while self.stats.memory_bytes > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self.stats.memory_bytes -= len(evicted)
+                self.stats.evictions += 1
+
+    def _disk_get(self, key: CacheKey) -> Optional[bytes]:
+        """
+        あれば中身、404 記録があれば FileNotFoundError、無ければ None
+        """
+        if self.disk_dir is None:
+            return None
+        data_path, missing_path, _ = self._paths(key)
+        if data_path.exists():
+            return data_path.read_bytes()
+        try:
+            recorded_at = missing_path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if self.missing_is_fresh(recorded_at):
+            raise FileNotFoundError(f"spot not found for preflop_actions='{key[2]}' (cached)")
+        return None
+
+    def missing_is_fresh(self, recorded_at: float) -> bool:
+        """
+        recorded_at（unix time）に記録した 404 をまだ信じてよいか
+        """
+        if self.missing_ttl_sec is not None and time.time() - recorded_at > self.missing_ttl_sec:
+            return False
+        return self.refresh_missing_since is None or recorded_at >= self.refresh_missing_since
+
+    def _disk_put(self, path: Path, data: bytes) -> None:
+        tmp = path.with_suffix(path.suffix + f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+
+    def _bump(self, field: str) -> None:
+        with self._lock:
+            setattr(self.stats, field, getattr(self.stats, field) + 1)
+
+    def _disk_lookup(self, key: CacheKey, field: str) -> Optional[bytes]:
+        try:
+            data = self._disk_get(key)
+        except FileNotFoundError:
+            self._bump(field)
+            raise
+        if data is not None:
+            self._bump(field)
+        return data
+
+    def _load_or_fetch(self, key: CacheKey, fetch: Callable[[], Dict[str, Any]]) -> bytes:
+        data = self._disk_lookup(key, "disk_hits")
+        if data is not None:
+            return data
+        if self.disk_dir is None:
+            return self._fetch(key, fetch, None)
+
+        data_path, missing_path, lock_path = self._paths(key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._key_lock(lock_path):
+            # ロックを待っている間に別プロセスが取ってきたかもしれない
+            data = self._disk_lookup(key, "lock_waits")
+            if data is not None:
+                return data
+            return self._fetch(key, fetch, (data_path, missing_path))
+
+    @staticmethod
+    @contextmanager
+    def _key_lock(lock_path: Path) -> Iterator[None]:
+        """
+        キーごとの flock。抜けるときに .lock を消す
+        消された後のファイルでロックを取った場合（待っている間に前の持ち主が消した）は開き直す
+        """
+        while True:
+            with lock_path.open("a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    try:
+                        current = os.stat(lock_path)
+                    except FileNotFoundError:
+                        continue
+                    if current.st_ino != os.fstat(lock_file.fileno()).st_ino:
+                        continue
+                    try:
+                        yield
+                    finally:
+                        lock_path.unlink(missing_ok=True)
+                    return
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _fetch(self, key: CacheKey, fetch: Callable[[], Dict[str, Any]], paths: Optional[Tuple[Path, Path]]) -> bytes:
+        self._bump("misses")
+        try:
+            spot = fetch()
+        except FileNotFoundError:
+            self._bump("not_found")
+            if paths is not None:
+                self._disk_put(paths[1], b"")
+            raise
+        data = json.dumps(spot, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if paths is not None:
+            self._disk_put(paths[0], data)
+            paths[1].unlink(missing_ok=True)  # 期限切れの 404 記録
+        return data
+
+    def peek(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        """
+        取得はせず、メモリかディスクにあれば返す（無ければ None、404 記録があれば FileNotFoundError）
+        """
+        data = self._memory_get(key)
+        if data is None:
+            data = self._disk_lookup(key, "disk_hits")
+            if data is None:
+                return None
+            self._memory_put(key, data)
+        return json.loads(data)
+
+    def get(self, key: CacheKey, fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        data = self._memory_get(key)
+        if data is not None:
+            return json.loads(data)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            data = future.result()
+            self._bump("coalesced")
+            return json.loads(data)
+
+        try:
+            data = self._load_or_fetch(key, fetch)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        self._memory_put(key, data)
+        return json.loads(data)
 
 
 class GtoWizardClient:
-    def __init__(self, refresh_token: str) -> None:
+    def __init__(self, refresh_token: str, cache: Optional[SolutionCache] = None) -> None:
         self.refresh_token = refresh_token
         self.access_token: Optional[str] = None
         self.session = requests.Session()
+        self.cache = cache if cache is not None else SolutionCache()
+        self._token_lock = threading.Lock()
 
     def refresh_access_token(self) -> str:
-        res = self.session.post(
-            TOKEN_REFRESH_URL,
-            json={"refresh": self.refresh_token},
-            timeout=30,
+        with self._token_lock:
+            res = self.session.post(
+                TOKEN_REFRESH_URL,
+                json={"refresh": self.refresh_token},
+                timeout=30,
+            )
+            res.raise_for_status()
+            payload = res.json()
+            access = payload.get("access")
+            if not isinstance(access, str) or not access:
+                raise RuntimeError(f"token refresh response has no 'access': {payload}")
+            self.access_token = access
+            return access
+
+    def get_spot_solution(self, preflop_actions: str, gametype: str = GAMETYPE, depth: int = DEPTH) -> Dict[str, Any]:
+        """
+        キャッシュ経由。同じ (gametype, depth, preflop_actions) は 1 回しか API を叩かない（--cache-dir があればプロセス間でも）
+        """
+        return self.cache.get(
+            (gametype, int(depth), preflop_actions),
+            lambda: self.fetch_spot_solution(preflop_actions, gametype, depth),
         )
-        res.raise_for_status()
-        payload = res.json()
-        access = payload.get("access")
-        if not isinstance(access, str) or not access:
-            raise RuntimeError(f"token refresh response has no 'access': {payload}")
-        self.access_token = access
-        return access
-
-    def get_spot_solution(self, preflop_actions: str) -> Dict[str, Any]:
+
+    def peek_spot_solution(self, preflop_actions: str, gametype: str = GAMETYPE, depth: int = DEPTH) -> Optional[Dict[str, Any]]:
+        """
+        キャッシュにあるときだけ返す（API は叩かない）
+        """
+        return self.cache.peek((gametype, int(depth), preflop_actions))
+
+    def fetch_spot_solution(self, preflop_actions: str, gametype: str = GAMETYPE, depth: int = DEPTH) -> Dict[str, Any]:
         if not self.access_token:
             self.refresh_access_token()
 
         params = {
-            "gametype": GAMETYPE,
-            "depth": str(DEPTH),
+            "gametype": gametype,
+            "depth": str(depth),
             "preflop_actions": preflop_actions,
         }
 
@@ -191,6 +538,7 @@ def extract_edges(spot_json: Dict[str, Any]) -> List[ActionEdge]:
                 code=code,
                 next_street=bool(action.get("next_street", False)),
                 is_hand_end=bool(action.get("is_hand_end", False)),
+                total_frequency=tf_val,
             )
         )
 
@@ -210,12 +558,16 @@ def append_action(preflop_actions: str, code: str) -> str:
     return code if not preflop_actions else f"{preflop_actions}-{code}"
 
 
-def main() -> None:
+def crawl_bfs(client: GtoWizardClient, shard: Optional[ShardSpec] = None) -> None:
     root = ""
-    client = GtoWizardClient(refresh_token=REFRESH_TOKEN)
+    out_dir = OUT_DIR if shard is None else shard.out_dir
+    out_dir.mkdir(parents=True, exist_ok=True)
+    explored_list_path = out_dir / EXPLORED_LIST_PATH.name
 
     # ★ここが重要：txtは「探索完了済み（子展開済み）」として扱う
-    explored: Set[str] = load_explored_list(EXPLORED_LIST_PATH)
+    explored: Set[str] = load_explored_list(explored_list_path)
+    # シャード: 担当外だが子孫へ辿るために展開した浅いノード（explored には書かない）
+    traversed: Set[str] = set()
 
     queue: deque[str] = deque([root])
 
@@ -232,10 +584,14 @@ def main() -> None:
         node = queue.popleft()
 
         # 既に探索完了（子展開済み）なら完全スキップ
-        if node in explored:
+        if node in explored or node in traversed:
             continue
 
-        out_path = OUT_DIR / (sanitize_filename(node) + ".json")
+        owned = shard is None or shard.owns(node)
+        if not owned and not shard.must_traverse(node):  # type: ignore[union-attr]
+            continue
+
+        out_path = out_dir / (sanitize_filename(node) + ".json")
 
         # ★API前に out/ を確認。あればそのjsonを参照して子展開を続ける
         spot: Optional[Dict[str, Any]] = None
@@ -253,10 +609,13 @@ def main() -> None:
                 spot = client.get_spot_solution(node)
             except FileNotFoundError:
                 missing_count += 1
+                if not owned:
+                    traversed.add(node)
+                    continue
                 # 存在しないノードはこれ以上やることが無いので explored 扱いにしてよい
                 explored.add(node)
                 if node not in explored_written:
-                    append_explored_line(EXPLORED_LIST_PATH, node)
+                    append_explored_line(explored_list_path, node)
                     explored_written.add(node)
                     appended_count += 1
                 continue
@@ -275,10 +634,14 @@ def main() -> None:
                 if child not in explored:
                     queue.append(child)
 
+        if not owned:
+            traversed.add(node)
+            continue
+
         # ★ここで「このノードの処理（子展開）」が終わったので explored として記録
         explored.add(node)
         if node not in explored_written:
-            append_explored_line(EXPLORED_LIST_PATH, node)
+            append_explored_line(explored_list_path, node)
             explored_written.add(node)
             appended_count += 1
 
@@ -291,12 +654,329 @@ def main() -> None:
             )
 
     print("done.")
+    if shard is not None:
+        print(f"shard={shard.index}/{shard.count} prefix_depth={shard.prefix_depth} traversed_not_owned={len(traversed)}")
     print(
         f"processed={processed_count} loaded={loaded_count} fetched={fetched_count} "
         f"appended={appended_count} explored={len(explored)} missing={missing_count}"
     )
+    print(f"cache: {client.cache.stats.summary()}")
+    print(f"explored_list={explored_list_path.resolve()}")
+    print(f"out_dir={out_dir.resolve()}")
+
+
+def crawl_by_reach(client: GtoWizardClient) -> None:
+    """
+    reach（root からの到達確率）が大きい順に取得する best-first クロール
+    - 到達確率の合計のうち COVERAGE_TARGET が確定（フロップ/ハンド終了まで辿れた）したら止める
+    - REQUEST_BUDGET 回 API を叩いたら止める（キャッシュから返ったものは数えない）
+    取得済み json があるノードはリクエストせずに読み込んで展開する（reach を伝播させるため）
+    前回までに 404 だったノード（MISSING_LIST_PATH）はリクエストせずに missing として扱う
+    """
+    explored: Set[str] = load_explored_list(EXPLORED_LIST_PATH)
+    explored_written: Set[str] = set(explored)
+    known_missing = {n for n, t in load_missing_list(MISSING_LIST_PATH).items() if client.cache.missing_is_fresh(t)}
+
+    # (-reach, 連番, node)。連番は同じ reach のとき挿入順にするため
+    heap: List[Tuple[float, int, str]] = [(-1.0, 0, "")]
+    seq = 1
+    expanded: Set[str] = set()
+
+    frontier_mass = 1.0  # heap に残っている reach の合計
+    terminal_mass = 0.0  # next_street / is_hand_end まで辿れた reach
+    dropped_mass = 0.0  # total_frequency <= FREQ_EPS で切り捨てた reach
+    missing_mass = 0.0  # 404 だったノードの reach
+
+    requests_made = 0
+    loaded_count = 0
+    missing_count = 0
+    known_missing_count = 0
+    stop_reason = "tree exhausted"
+
+    def mark_explored(node: str) -> None:
+        explored.add(node)
+        if node not in explored_written:
+            append_explored_line(EXPLORED_LIST_PATH, node)
+            explored_written.add(node)
+
+    while heap:
+        if terminal_mass >= COVERAGE_TARGET:
+            stop_reason = f"coverage target {COVERAGE_TARGET} reached"
+            break
+
+        neg_reach, _, node = heap[0]
+        reach = -neg_reach
+        out_path = OUT_DIR / (sanitize_filename(node) + ".json")
+
+        spot: Optional[Dict[str, Any]] = None
+        if out_path.exists():
+            try:
+                spot = load_json(out_path)
+            except Exception as e:
+                print(f"[warn] failed to load existing file, refetch: {out_path} ({e})")
+                spot = None
+            else:
+                loaded_count += 1
+
+        if spot is None and node in known_missing:
+            heapq.heappop(heap)
+            frontier_mass -= reach
+            missing_mass += reach
+            missing_count += 1
+            known_missing_count += 1
+            mark_explored(node)
+            continue
+
+        if spot is None:
+            # 予算はキャッシュに無い（実際に API を叩く）ものだけに使う
+            budget_left = REQUEST_BUDGET is None or requests_made < REQUEST_BUDGET
+            misses_before = client.cache.stats.misses
+            try:
+                if budget_left:
+                    spot = client.get_spot_solution(node)
+                else:
+                    spot = client.peek_spot_solution(node)
+            except FileNotFoundError:
+                requests_made += client.cache.stats.misses - misses_before
+                heapq.heappop(heap)
+                frontier_mass -= reach
+                missing_mass += reach
+                missing_count += 1
+                append_missing_line(MISSING_LIST_PATH, node)
+                mark_explored(node)
+                continue
+            requests_made += client.cache.stats.misses - misses_before
+            if spot is None:
+                stop_reason = f"request budget {REQUEST_BUDGET} reached"
+                break
+            save_json(out_path, spot)
+
+        heapq.heappop(heap)
+        frontier_mass -= reach
+        if node in expanded:
+            continue
+        expanded.add(node)
+
+        edges = extract_edges(spot)
+        kept = 0.0
+        for e in edges:
+            kept += e.total_frequency
+            p_child = reach * e.total_frequency
+            if e.next_street or e.is_hand_end:
+                terminal_mass += p_child
+                continue
+            heapq.heappush(heap, (-p_child, seq, append_action(node, e.code)))
+            seq += 1
+            frontier_mass += p_child
+        dropped_mass += reach * max(0.0, 1.0 - kept)
+
+        mark_explored(node)
+
+        if len(expanded) % 50 == 0:
+            print(
+                f"[progress] expanded={len(expanded)} requests={requests_made} loaded={loaded_count} "
+                f"covered={terminal_mass:.6f} frontier={frontier_mass:.6f} queue={len(heap)}"
+            )
+
+    # 打ち切った時点のフロンティアを reach 降順で残す（次回の再開や確認用）
+    frontier = sorted(((-nr, n) for nr, _, n in heap), reverse=True)
+    with FRONTIER_PATH.open("w", encoding="utf-8") as f:
+        for r, n in frontier:
+            f.write(f"{ROOT_MARKER if n == '' else n}\t{r}\n")
+    frontier_mass = sum(r for r, _ in frontier)
+
+    print("done.")
+    print(f"stop_reason={stop_reason}")
+    print(
+        f"expanded={len(expanded)} requests={requests_made} loaded={loaded_count} "
+        f"missing={missing_count} (known={known_missing_count}) frontier_nodes={len(frontier)}"
+    )
+    print(f"covered_mass={terminal_mass:.9f}")
+    print(f"uncrawled_mass={frontier_mass:.9f}")
+    print(f"missing_mass={missing_mass:.9f} dropped_mass(freq<=eps)={dropped_mass:.9f}")
+    print(f"cache: {client.cache.stats.summary()}")
     print(f"explored_list={EXPLORED_LIST_PATH.resolve()}")
-    print(f"out_dir={OUT_DIR.resolve()}")
+    print(f"frontier={FRONTIER_PATH.resolve()}")
+    print(f"missing_list={MISSING_LIST_PATH.resolve()}")
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def merge_shards(count: int, prefix_depth: int = SHARD_PREFIX_DEPTH) -> bool:
+    """
+    shards/*of{count} を OUT_DIR に統合する
+    - 重複: 2つ以上のシャードの explored にあるノード（中身が違えば conflict）
+    - 担当違い: 担当でないシャードの explored にあるノード
+    - 欠け: 統合後、展開済みノードの子（next_street / hand_end 以外）が explored に無い
+    戻り値: 問題（conflict / 欠け / シャード欠落）が無ければ True
+    """
+    dirs = [shard_dir(i, count) for i in range(count)]
+    missing_shards = [str(d) for d in dirs if not (d / EXPLORED_LIST_PATH.name).exists()]
+
+    merged = load_explored_list(EXPLORED_LIST_PATH)
+    before = len(merged)
+    owner_of: Dict[str, int] = {}
+    duplicates: List[str] = []
+    conflicts: List[str] = []
+    wrong_owner: List[str] = []
+    copied = 0
+
+    for i, d in enumerate(dirs):
+        for node in sorted(load_explored_list(d / EXPLORED_LIST_PATH.name), key=lambda n: (node_depth(n), n)):
+            label = ROOT_MARKER if node == "" else node
+            owner = shard_of(node, count, prefix_depth)
+            if owner != i:
+                wrong_owner.append(f"{label} (in shard {i}, owner {owner})")
+            src = d / (sanitize_filename(node) + ".json")
+            dst = OUT_DIR / (sanitize_filename(node) + ".json")
+            if node in owner_of:
+                duplicates.append(f"{label} (shards {owner_of[node]} and {i})")
+            owner_of.setdefault(node, i)
+            if src.exists():
+                if dst.exists():
+                    if file_digest(src) != file_digest(dst):
+                        conflicts.append(f"{label} (shard {i} differs from {dst})")
+                        continue
+                else:
+                    tmp = dst.with_suffix(dst.suffix + ".tmp")
+                    tmp.write_bytes(src.read_bytes())
+                    tmp.replace(dst)
+                    copied += 1
+            merged.add(node)
+
+    gaps: List[str] = []
+    for node in merged:
+        path = OUT_DIR / (sanitize_filename(node) + ".json")
+        if not path.exists():
+            continue
+        edges = extract_edges(load_json(path))
+        if is_node_terminal(edges):
+            continue
+        for e in edges:
+            if e.next_street or e.is_hand_end:
+                continue
+            child = append_action(node, e.code)
+            if child not in merged:
+                gaps.append(f"{child} (owner shard {shard_of(child, count, prefix_depth)})")
+
+    # explored は浅い順に並べ直して丸ごと書き直す
+    tmp = EXPLORED_LIST_PATH.with_suffix(".txt.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        for node in sorted(merged, key=lambda n: (node_depth(n), n)):
+            f.write((ROOT_MARKER if node == "" else node) + "\n")
+    tmp.replace(EXPLORED_LIST_PATH)
+
+    report = {
+        "shards": count,
+        "missing_shards": missing_shards,
+        "explored_before": before,
+        "explored_after": len(merged),
+        "json_copied": copied,
+        "duplicates": sorted(duplicates),
+        "conflicts": sorted(conflicts),
+        "wrong_owner": sorted(wrong_owner),
+        "gaps": sorted(gaps),
+    }
+    save_json(SHARD_MERGE_REPORT_PATH, report)
+
+    print("done.")
+    print(f"shards={count} explored={before}->{len(merged)} json_copied={copied}")
+    print(f"duplicates={len(duplicates)} conflicts={len(conflicts)} wrong_owner={len(wrong_owner)} gaps={len(gaps)}")
+    if missing_shards:
+        print(f"[warn] missing shard logs: {', '.join(missing_shards)}")
+    print(f"report={SHARD_MERGE_REPORT_PATH.resolve()}")
+    return not (conflicts or gaps or missing_shards)
+
+
+def spawn_shards(
+    count: int,
+    prefix_depth: int = SHARD_PREFIX_DEPTH,
+    refresh_missing_since: Optional[float] = None,
+    cache_dir: Optional[Path] = CACHE_DIR,
+) -> None:
+    """
+    ローカルで count 個のシャードを別プロセスで並列に走らせ、全部終わったら統合する
+    cache_dir を指定したら全シャードで共有する（上の方のノードを取るのは 1 回で済む）
+    --refresh-missing は全シャードで同じ時刻を使う（他シャードが今回書いた .missing を無視しないように）
+    """
+    extra = [f"--shard-depth={prefix_depth}"]
+    if cache_dir is not None:
+        extra.append(f"--cache-dir={cache_dir.resolve()}")
+    if refresh_missing_since is not None:
+        extra.append(f"--refresh-missing={refresh_missing_since}")
+    procs = [
+        subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "--shard", f"{i}/{count}", *extra])
+        for i in range(count)
+    ]
+    failed = [i for i, p in enumerate(procs) if p.wait() != 0]
+    if failed:
+        raise RuntimeError(f"shard processes failed: {failed}")
+    if not merge_shards(count, prefix_depth):
+        sys.exit(1)
+
+
+def parse_shard_arg(value: str) -> ShardSpec:
+    m = re.fullmatch(r"(\d+)/(\d+)", value)
+    if m is None or not 0 <= int(m.group(1)) < int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT with 0 <= INDEX < COUNT, got '{value}'")
+    return ShardSpec(int(m.group(1)), int(m.group(2)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="GTO Wizard のプリフロップツリーをダウンロードする")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--shard", type=parse_shard_arg, default=None, metavar="I/N", help=f"I 番目のシャードだけを {SHARDS_DIR}/ 以下にクロール（bfs のみ）")
+    group.add_argument("--merge", type=int, default=None, metavar="N", help=f"N 個のシャードを {OUT_DIR} に統合")
+    group.add_argument("--spawn", type=int, default=None, metavar="N", help="N 個のシャードをローカルの別プロセスで走らせてから統合")
+    parser.add_argument(
+        "--shard-depth",
+        type=int,
+        default=SHARD_PREFIX_DEPTH,
+        metavar="D",
+        help="先頭 D 個のアクションでシャードに分ける（--shard / --merge / --spawn で同じ値にする）",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=CACHE_DIR,
+        metavar="PATH",
+        help="API レスポンスをこのディレクトリにも保存し、複数プロセス / 複数回の実行で共有する（省略時はメモリだけ）",
+    )
+    parser.add_argument(
+        "--refresh-missing",
+        type=float,
+        nargs="?",
+        const=time.time(),
+        default=None,
+        metavar="UNIX_TIME",
+        help=f"この時刻（省略時は今）より前の 404 記録（--cache-dir の .missing と {MISSING_LIST_PATH.name}）を無視して取り直す（期限は通常 {MISSING_TTL_SEC} 秒）",
+    )
+    args = parser.parse_args()
+    if args.shard_depth < 1:
+        parser.error("--shard-depth must be >= 1")
+
+    if args.merge is not None:
+        if not merge_shards(args.merge, args.shard_depth):
+            sys.exit(1)
+        return
+    if args.spawn is not None:
+        spawn_shards(args.spawn, args.shard_depth, args.refresh_missing, args.cache_dir)
+        return
+
+    cache = SolutionCache(disk_dir=args.cache_dir, refresh_missing_since=args.refresh_missing)
+    client = GtoWizardClient(refresh_token=REFRESH_TOKEN, cache=cache)
+    if args.shard is not None:
+        if CRAWL_MODE != "bfs":
+            raise ValueError("sharded crawl supports CRAWL_MODE='bfs' only")
+        crawl_bfs(client, shard=replace(args.shard, prefix_depth=args.shard_depth))
+    elif CRAWL_MODE == "reach":
+        crawl_by_reach(client)
+    elif CRAWL_MODE == "bfs":
+        crawl_bfs(client)
+    else:
+        raise ValueError(f"unknown CRAWL_MODE: {CRAWL_MODE}")
 
 
 if __name__ == "__main__":
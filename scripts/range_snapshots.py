@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_INDEX, HAND_LABELS
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+RANGE_SNAPSHOTS_PATH = OUT_DIR / "range_snapshots.npz"
+
+# POSITIONS = ["UTG", "UTG+1", "UTG+2", "LJ", "HJ", "CO", "BTN", "SB", "BB"]
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.append(v)
+    return out
+
+
+def iter_player_ranges(spot: Dict[str, Any]) -> List[Tuple[str, List[float]]]:
+    """
+    players_info から (position, range[169]) を返す
+    range が 169 要素でないものは捨てる
+    """
+    infos = spot.get("players_info")
+    if not isinstance(infos, list):
+        return []
+    out: List[Tuple[str, List[float]]] = []
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        player = info.get("player")
+        if not isinstance(player, dict):
+            continue
+        pos = player.get("position")
+        rng = info.get("range")
+        if not isinstance(pos, str) or not isinstance(rng, list) or len(rng) != len(HAND_LABELS):
+            continue
+        out.append((pos, rng))
+    return out
+
+
+COMPARE_OPS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+}
+
+
+@dataclass
+class RangeSnapshots:
+    """
+    nodes × positions × 169 のレンジ配列
+    present[n, p] が False の所は ranges が NaN（そのノードの players_info に居ない）
+    """
+
+    nodes: List[str]
+    positions: List[str]
+    ranges: np.ndarray  # (N, P, 169) float32
+    present: np.ndarray  # (N, P) bool
+
+    def __post_init__(self) -> None:
+        self.node_index = {n: i for i, n in enumerate(self.nodes)}
+        self.position_index = {p: i for i, p in enumerate(self.positions)}
+
+    def get_range(self, node: str, position: str) -> Optional[np.ndarray]:
+        n = self.node_index.get(node)
+        p = self.position_index.get(position)
+        if n is None or p is None or not self.present[n, p]:
+            return None
+        return self.ranges[n, p]
+
+    def nodes_where(self, position: str, hand: str, op: str, threshold: float) -> List[Tuple[str, float]]:
+        """
+        例: nodes_where("BTN", "A5s", ">", 0.5)
+        条件を満たす (node, weight) を weight 降順で返す
+        """
+        if op not in COMPARE_OPS:
+            raise ValueError(f"unknown op: {op} (expected one of {sorted(COMPARE_OPS)})")
+        p = self.position_index.get(position)
+        h = HAND_INDEX.get(hand)
+        if p is None:
+            raise KeyError(f"unknown position: {position}")
+        if h is None:
+            raise KeyError(f"unknown hand: {hand}")
+
+        col = self.ranges[:, p, h]
+        mask = self.present[:, p] & COMPARE_OPS[op](col, threshold)
+        idx = np.flatnonzero(mask)
+        idx = idx[np.argsort(-col[idx], kind="stable")]
+        return [(self.nodes[i], float(col[i])) for i in idx]
+
+    def top_overlap(
+        self, target: np.ndarray, k: int = 10, position: Optional[str] = None
+    ) -> List[Tuple[str, str, float]]:
+        """
+        target（169）とのレンジ重なり上位 k 件を (node, position, overlap) で返す
+        overlap = Σ min(range, target)·combos / Σ target·combos（target のうち何割がそのレンジにも入っているか）
+        """
+        target = np.asarray(target, dtype=np.float64)
+        if target.shape != (len(HAND_LABELS),):
+            raise ValueError(f"target range must have {len(HAND_LABELS)} entries")
+        denom = float(target @ HAND_COMBOS)
+        if denom <= 0.0:
+            raise ValueError("target range is empty")
+
+        rng = np.nan_to_num(self.ranges.astype(np.float64), nan=0.0)
+        overlap = (np.minimum(rng, target) @ HAND_COMBOS) / denom  # (N, P)
+        overlap = np.where(self.present, overlap, -np.inf)
+        if position is not None:
+            p = self.position_index.get(position)
+            if p is None:
+                raise KeyError(f"unknown position: {position}")
+            keep = np.zeros(len(self.positions), dtype=bool)
+            keep[p] = True
+            overlap = np.where(keep[None, :], overlap, -np.inf)
+
+        flat = overlap.ravel()
+        k = min(k, int(np.isfinite(flat).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-flat, k - 1)[:k]
+        top = top[np.argsort(-flat[top], kind="stable")]
+        n_pos = len(self.positions)
+        return [(self.nodes[i // n_pos], self.positions[i % n_pos], float(flat[i])) for i in top]
+
+
+def build_range_snapshots(nodes: List[str]) -> Tuple[RangeSnapshots, int]:
+    """
+    ノードごとの json を一度だけ読み、players_info の range を配列に詰める
+    戻り値: (snapshots, missing_json)
+    """
+    positions = list(POSITIONS)
+    per_node: List[List[Tuple[str, List[float]]]] = []
+    kept: List[str] = []
+    missing_json = 0
+
+    for node in nodes:
+        path = get_node_path(node)
+        if not path.exists():
+            missing_json += 1
+            continue
+        entries = iter_player_ranges(load_json(path))
+        for pos, _ in entries:
+            if pos not in positions:
+                positions.append(pos)
+        kept.append(node)
+        per_node.append(entries)
+
+    pos_index = {p: i for i, p in enumerate(positions)}
+    ranges = np.full((len(kept), len(positions), len(HAND_LABELS)), np.nan, dtype=np.float32)
+    present = np.zeros((len(kept), len(positions)), dtype=bool)
+    for n, entries in enumerate(per_node):
+        for pos, rng in entries:
+            p = pos_index[pos]
+            ranges[n, p] = np.asarray(rng, dtype=np.float32)
+            present[n, p] = True
+
+    return RangeSnapshots(kept, positions, ranges, present), missing_json
+
+
+def save_range_snapshots(path: Path, snaps: RangeSnapshots) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        nodes=np.array([ROOT_MARKER if n == "" else n for n in snaps.nodes], dtype=str),
+        positions=np.array(snaps.positions, dtype=str),
+        hands=np.array(HAND_LABELS, dtype=str),
+        ranges=snaps.ranges,
+        present=snaps.present,
+    )
+    tmp.replace(path)
+
+
+def load_range_snapshots(path: Path = RANGE_SNAPSHOTS_PATH) -> RangeSnapshots:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `range_snapshots.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        nodes = ["" if n == ROOT_MARKER else str(n) for n in z["nodes"]]
+        return RangeSnapshots(nodes, [str(p) for p in z["positions"]], z["ranges"], z["present"])
+
+
+def parse_node_arg(value: str) -> str:
+    return "" if value == ROOT_MARKER else value
+
+
+def cmd_build(_: argparse.Namespace) -> None:
+    nodes = load_explored_list(EXPLORED_LIST_PATH)
+    snaps, missing_json = build_range_snapshots(nodes)
+    save_range_snapshots(RANGE_SNAPSHOTS_PATH, snaps)
+
+    print("done.")
+    print(f"nodes={len(snaps.nodes)} positions={len(snaps.positions)} filled={int(snaps.present.sum())}")
+    if missing_json:
+        print(f"[warn] missing json files for {missing_json} nodes (skipped)")
+    print(f"snapshots={RANGE_SNAPSHOTS_PATH.resolve()}")
+
+
+def cmd_where(args: argparse.Namespace) -> None:
+    snaps = load_range_snapshots()
+    for node, weight in snaps.nodes_where(args.position, args.hand, args.op, args.threshold):
+        print(f"{ROOT_MARKER if node == '' else node}\t{weight:.4f}")
+
+
+def cmd_overlap(args: argparse.Namespace) -> None:
+    snaps = load_range_snapshots()
+    target = snaps.get_range(parse_node_arg(args.node), args.of)
+    if target is None:
+        raise KeyError(f"no range for position={args.of} at node='{args.node}'")
+    for node, pos, score in snaps.top_overlap(target, k=args.k, position=args.position):
+        print(f"{ROOT_MARKER if node == '' else node}\t{pos}\t{score:.4f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="players_info[].range のスナップショット作成と検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} の全ノードから {RANGE_SNAPSHOTS_PATH} を作る")
+    p_build.set_defaults(func=cmd_build)
+
+    p_where = sub.add_parser("where", help="例: where BTN A5s '>' 0.5")
+    p_where.add_argument("position")
+    p_where.add_argument("hand")
+    p_where.add_argument("op", choices=sorted(COMPARE_OPS))
+    p_where.add_argument("threshold", type=float)
+    p_where.set_defaults(func=cmd_where)
+
+    p_overlap = sub.add_parser("overlap", help="指定ノード・ポジションのレンジと重なりが大きい順")
+    p_overlap.add_argument("node", help=f"基準ノード（root は {ROOT_MARKER}）")
+    p_overlap.add_argument("of", help="基準ノードのどのポジションのレンジを使うか")
+    p_overlap.add_argument("--position", default=None, help="検索対象のポジションを絞る")
+    p_overlap.add_argument("-k", type=int, default=10)
+    p_overlap.set_defaults(func=cmd_overlap)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_INDEX, HAND_LABELS, RANKS
+from pot_types import pot_type, pot_type_order
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+ROLLUP_CUBE_PATH = OUT_DIR / "rollup_cube.npz"
+
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+ACTION_CLASSES = ["F", "X", "C", "R", "AI", "OTHER"]
+FACING_CLASSES = ["NONE", "C", "R", "AI", "OTHER"]
+
+# 軸の並び（cube.mass / cube.ev の次元）
+DIMS = ["position", "pot_type", "facing", "action", "hand"]
+
+
+def hand_group(label: str) -> str:
+    if len(label) == 2:
+        return "PAIRS"
+    hi, lo = RANKS.index(label[0]), RANKS.index(label[1])
+    suited = label.endswith("s")
+    if lo >= RANKS.index("T"):
+        return "SUITED_BROADWAYS" if suited else "OFFSUIT_BROADWAYS"
+    if label[0] == "A":
+        return "SUITED_ACES" if suited else "OFFSUIT_ACES"
+    if suited and hi - lo == 1:
+        return "SUITED_CONNECTORS"
+    if suited and hi - lo == 2:
+        return "SUITED_GAPPERS"
+    return "SUITED_OTHER" if suited else "OFFSUIT_OTHER"
+
+
+HAND_GROUPS = [
+    "PAIRS",
+    "SUITED_BROADWAYS",
+    "OFFSUIT_BROADWAYS",
+    "SUITED_ACES",
+    "OFFSUIT_ACES",
+    "SUITED_CONNECTORS",
+    "SUITED_GAPPERS",
+    "SUITED_OTHER",
+    "OFFSUIT_OTHER",
+]
+# (169, G) の所属行列（hand 軸をグループに畳むのに使う）
+HAND_GROUP_MATRIX = np.zeros((len(HAND_LABELS), len(HAND_GROUPS)), dtype=np.float64)
+for _h, _label in enumerate(HAND_LABELS):
+    HAND_GROUP_MATRIX[_h, HAND_GROUPS.index(hand_group(_label))] = 1.0
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def action_class(code: str) -> str:
+    """
+    code_kind に、チェック（X）と RAI（レイズオールイン）の区別を足したもの
+    """
+    u = code.upper()
+    if u == "X":
+        return "X"
+    if u == "RAI":
+        return "AI"
+    return code_kind(code)
+
+
+def facing_class(preflop_actions: str) -> str:
+    """
+    直前の（フォールド以外の）アクションの種類。誰も参加していなければ NONE
+    """
+    for code in reversed(preflop_actions.split("-") if preflop_actions else []):
+        k = action_class(code)
+        if k != "F":
+            return k if k in FACING_CLASSES else "OTHER"
+    return "NONE"
+
+
+def get_active_position(spot: Dict[str, Any]) -> str:
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list) or not sols:
+        return "UNKNOWN"
+    first = sols[0]
+    if not isinstance(first, dict):
+        return "UNKNOWN"
+    act = first.get("action")
+    if not isinstance(act, dict):
+        return "UNKNOWN"
+    pos = act.get("position")
+    return pos if isinstance(pos, str) else "UNKNOWN"
+
+
+def get_player_range(spot: Dict[str, Any], position: str) -> Optional[List[float]]:
+    infos = spot.get("players_info")
+    if not isinstance(infos, list):
+        return None
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        player = info.get("player")
+        if not isinstance(player, dict) or player.get("position") != position:
+            continue
+        rng = info.get("range")
+        if isinstance(rng, list) and len(rng) == len(HAND_LABELS):
+            return rng
+    return None
+
+
+def iter_action_arrays(spot: Dict[str, Any]) -> List[Tuple[str, float, bool, bool, List[float], List[float]]]:
+    """
+    (code, total_frequency, next_street, is_hand_end, strategy[169], evs[169]) を返す
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, float, bool, bool, List[float], List[float]]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        try:
+            tf = float(sol.get("total_frequency", 0.0))
+        except Exception:
+            tf = 0.0
+        act = sol.get("action", {})
+        if not isinstance(act, dict):
+            continue
+        code = act.get("code")
+        if not isinstance(code, str) or not code:
+            continue
+        strategy = sol.get("strategy")
+        evs = sol.get("evs")
+        if not isinstance(strategy, list) or len(strategy) != len(HAND_LABELS):
+            continue
+        if not isinstance(evs, list) or len(evs) != len(HAND_LABELS):
+            continue
+        out.append((code, tf, bool(act.get("next_street", False)), bool(act.get("is_hand_end", False)), strategy, evs))
+    return out
+
+
+@dataclass
+class TreeArrays:
+    nodes: List[str]
+    positions: List[str]
+    codes: List[List[str]]
+    reach: np.ndarray  # (N,)
+    ranges: np.ndarray  # (N, 169)
+    strategy: np.ndarray  # (N, A, 169)
+    evs: np.ndarray  # (N, A, 169)
+    action_mask: np.ndarray  # (N, A)
+
+
+def load_tree_arrays(explored_nodes: Set[str]) -> TreeArrays:
+    """
+    reach を伝播しつつ、到達ノードを (N, A_max, 169) のパディング配列に詰める
+    """
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    reach: Dict[str, float] = {"": 1.0}
+    rows: List[Tuple[str, str, float, List[float], List[str], List[List[float]], List[List[float]]]] = []
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+
+        p_node = reach.get(node)
+        if p_node is None:
+            continue
+
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+
+        actions = iter_action_arrays(spot)
+        pos = get_active_position(spot)
+        rng = get_player_range(spot, pos)
+        if actions and rng is not None:
+            rows.append((node, pos, p_node, rng, [a[0] for a in actions], [a[4] for a in actions], [a[5] for a in actions]))
+
+        for code, tf, next_street, is_hand_end, _, _ in actions:
+            if tf <= FREQ_EPS or next_street or is_hand_end:
+                continue
+            child = append_action(node, code)
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + (p_node * tf)
+            q.append(child)
+
+    n_nodes = len(rows)
+    a_max = max((len(r[4]) for r in rows), default=0)
+    strategy = np.zeros((n_nodes, a_max, len(HAND_LABELS)), dtype=np.float64)
+    evs = np.zeros((n_nodes, a_max, len(HAND_LABELS)), dtype=np.float64)
+    action_mask = np.zeros((n_nodes, a_max), dtype=bool)
+    for n, (_, _, _, _, codes, strat, ev) in enumerate(rows):
+        strategy[n, : len(strat)] = strat
+        evs[n, : len(ev)] = ev
+        action_mask[n, : len(codes)] = True
+
+    return TreeArrays(
+        nodes=[r[0] for r in rows],
+        positions=[r[1] for r in rows],
+        codes=[r[4] for r in rows],
+        reach=np.asarray([r[2] for r in rows], dtype=np.float64),
+        ranges=np.asarray([r[3] for r in rows], dtype=np.float64).reshape(n_nodes, len(HAND_LABELS)),
+        strategy=strategy,
+        evs=evs,
+        action_mask=action_mask,
+    )
+
+
+@dataclass
+class RollupCube:
+    """
+    position × pot_type × facing × action × hand(169) の集計キューブ
+    - mass: その (手番, 状況, アクション, ハンド) に到達する確率（1 ハンドあたりの期待回数）
+      全セルの合計 = 1 ハンドあたりのプリフロップ意思決定回数の期待値
+    - ev_mass: mass × evs（bb）。ev_mass / mass が平均 EV
+    """
+
+    labels: Dict[str, List[str]]
+    mass: np.ndarray  # (P, T, F, A, 169)
+    ev_mass: np.ndarray  # (P, T, F, A, 169)
+
+    @property
+    def total(self) -> float:
+        return float(self.mass.sum())
+
+    def _axis_index(self, dim: str, values: List[str]) -> np.ndarray:
+        if dim == "hand":
+            mask = np.zeros(len(HAND_LABELS), dtype=bool)
+            for v in values:
+                if v in HAND_INDEX:
+                    mask[HAND_INDEX[v]] = True
+                elif v in HAND_GROUPS:
+                    mask |= HAND_GROUP_MATRIX[:, HAND_GROUPS.index(v)] > 0
+                else:
+                    raise KeyError(f"unknown hand or hand group: {v}")
+            return np.flatnonzero(mask)
+        labels = self.labels[dim]
+        missing = [v for v in values if v not in labels]
+        if missing:
+            raise KeyError(f"unknown {dim}: {', '.join(missing)} (expected one of {labels})")
+        return np.asarray([labels.index(v) for v in values], dtype=np.int64)
+
+    def query(
+        self, filters: Dict[str, List[str]], group_by: List[str]
+    ) -> List[Tuple[Tuple[str, ...], float, float]]:
+        """
+        filters: 軸 -> 残す値（hand はハンド名かグループ名）
+        group_by: DIMS または "hand_group"
+        戻り値: (key, mass, ev_mass) を mass 降順
+        """
+        for g in group_by:
+            if g not in DIMS and g != "hand_group":
+                raise KeyError(f"unknown dimension: {g} (expected one of {DIMS + ['hand_group']})")
+        idx = []
+        for d in DIMS:
+            n = self.mass.shape[DIMS.index(d)]
+            idx.append(self._axis_index(d, filters[d]) if filters.get(d) else np.arange(n))
+        mesh = np.ix_(*idx)
+        mass = self.mass[mesh]
+        ev_mass = self.ev_mass[mesh]
+
+        axis_labels: List[List[str]] = [
+            [self.labels[d][i] if d != "hand" else HAND_LABELS[i] for i in ix.tolist()] for d, ix in zip(DIMS, idx)
+        ]
+        if "hand_group" in group_by:
+            # hand 軸をグループに畳む
+            groups = HAND_GROUP_MATRIX[idx[-1]]
+            mass = mass @ groups
+            ev_mass = ev_mass @ groups
+            axis_labels[-1] = list(HAND_GROUPS)
+        keep_names = ["hand_group" if (d == "hand" and "hand_group" in group_by) else d for d in DIMS]
+        keep = [i for i, name in enumerate(keep_names) if name in group_by]
+        drop = tuple(i for i in range(len(DIMS)) if i not in keep)
+        mass = mass.sum(axis=drop)
+        ev_mass = ev_mass.sum(axis=drop)
+
+        # group_by の並びに軸を合わせる
+        order = [keep[[keep_names[k] for k in keep].index(g)] for g in group_by]
+        perm = [keep.index(k) for k in order]
+        mass = np.transpose(mass, perm) if perm else mass
+        ev_mass = np.transpose(ev_mass, perm) if perm else ev_mass
+
+        flat_mass = np.atleast_1d(mass).ravel()
+        flat_ev = np.atleast_1d(ev_mass).ravel()
+        cells = np.flatnonzero(flat_mass > FREQ_EPS)
+        cells = cells[np.argsort(-flat_mass[cells], kind="stable")]
+        shape = [len(axis_labels[k]) for k in order]
+        out: List[Tuple[Tuple[str, ...], float, float]] = []
+        for c in cells.tolist():
+            coord = np.unravel_index(c, shape) if shape else ()
+            key = tuple(axis_labels[k][int(i)] for k, i in zip(order, coord))
+            out.append((key, float(flat_mass[c]), float(flat_ev[c])))
+        return out
+
+
+def build_rollup_cube(tree: TreeArrays) -> RollupCube:
+    """
+    全ノードを 1 回の np.add.at でキューブに落とす
+    mass[n, a, h] = reach[n] × (range·combos の正規化)[n, h] × strategy[n, a, h]
+    """
+    pot_types = sorted({pot_type(n) for n in tree.nodes}, key=pot_type_order)
+    positions = list(POSITIONS) + sorted({p for p in tree.positions if p not in POSITIONS})
+    labels = {
+        "position": positions,
+        "pot_type": pot_types,
+        "facing": list(FACING_CLASSES),
+        "action": list(ACTION_CLASSES),
+    }
+
+    pos_i = np.asarray([positions.index(p) for p in tree.positions], dtype=np.int64)
+    pot_i = np.asarray([pot_types.index(pot_type(n)) for n in tree.nodes], dtype=np.int64)
+    fac_i = np.asarray([FACING_CLASSES.index(facing_class(n)) for n in tree.nodes], dtype=np.int64)
+    a_max = tree.action_mask.shape[1]
+    act_i = np.zeros((len(tree.nodes), a_max), dtype=np.int64)
+    for n, codes in enumerate(tree.codes):
+        act_i[n, : len(codes)] = [ACTION_CLASSES.index(action_class(c)) for c in codes]
+
+    hand_w = tree.ranges * HAND_COMBOS[None, :]
+    hand_w = hand_w / np.maximum(hand_w.sum(axis=1, keepdims=True), FREQ_EPS)
+    mass = tree.reach[:, None, None] * hand_w[:, None, :] * tree.strategy
+    mass = np.where(tree.action_mask[:, :, None], mass, 0.0)
+    ev_mass = mass * tree.evs
+
+    shape = (len(positions), len(pot_types), len(FACING_CLASSES), len(ACTION_CLASSES), len(HAND_LABELS))
+    cube_mass = np.zeros(shape, dtype=np.float64)
+    cube_ev = np.zeros(shape, dtype=np.float64)
+    index = (pos_i[:, None], pot_i[:, None], fac_i[:, None], act_i)
+    np.add.at(cube_mass, index, mass)
+    np.add.at(cube_ev, index, ev_mass)
+    return RollupCube(labels, cube_mass, cube_ev)
+
+
+def save_rollup_cube(path: Path, cube: RollupCube) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        mass=cube.mass,
+        ev_mass=cube.ev_mass,
+        **{f"labels_{d}": np.array(v, dtype=str) for d, v in cube.labels.items()},
+    )
+    tmp.replace(path)
+
+
+def load_rollup_cube(path: Path = ROLLUP_CUBE_PATH) -> RollupCube:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `rollup_cube.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path}")
+        labels = {d: [str(v) for v in z[f"labels_{d}"]] for d in DIMS if d != "hand"}
+        return RollupCube(labels, z["mass"], z["ev_mass"])
+
+
+def cmd_build(_: argparse.Namespace) -> None:
+    tree = load_tree_arrays(load_explored_list(EXPLORED_LIST_PATH))
+    cube = build_rollup_cube(tree)
+    save_rollup_cube(ROLLUP_CUBE_PATH, cube)
+    print("done.")
+    print(f"nodes={len(tree.nodes)} cells={cube.mass.size} nonzero={int((cube.mass > FREQ_EPS).sum())}")
+    print(f"decisions_per_hand={cube.total:.6f} (sum of reach over decision nodes)")
+    print(f"cube={ROLLUP_CUBE_PATH.resolve()}")
+
+
+def cmd_query(args: argparse.Namespace) -> None:
+    t0 = time.perf_counter()
+    cube = load_rollup_cube()
+    filters = {
+        "position": args.position or [],
+        "pot_type": args.pot_type or [],
+        "facing": args.facing or [],
+        "action": args.action or [],
+        "hand": args.hand or [],
+    }
+    group_by = [g.strip() for g in args.by.split(",") if g.strip()] if args.by else []
+    rows = cube.query(filters, group_by)
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+    total = cube.total
+    print("\t".join(group_by + ["mass", "share", "ev_mean"]))
+    for key, mass, ev_mass in rows[: args.limit]:
+        print("\t".join(list(key) + [f"{mass:.6f}", f"{mass / total:.4%}", f"{ev_mass / mass:+.4f}"]))
+    print(f"# rows={len(rows)} elapsed={elapsed_ms:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="reach mass / EV の集計キューブ")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{EXPLORED_LIST_PATH} から {ROLLUP_CUBE_PATH} を作る")
+    p_build.set_defaults(func=cmd_build)
+
+    p_query = sub.add_parser("query", help="例: query --position BB --facing R --by action")
+    p_query.add_argument("--position", nargs="+")
+    p_query.add_argument("--pot-type", nargs="+")
+    p_query.add_argument("--facing", nargs="+", help=f"{FACING_CLASSES}")
+    p_query.add_argument("--action", nargs="+", help=f"{ACTION_CLASSES}")
+    p_query.add_argument("--hand", nargs="+", help=f"ハンド名 or {HAND_GROUPS}")
+    p_query.add_argument("--by", default="", help=f"カンマ区切りの軸: {DIMS + ['hand_group']}")
+    p_query.add_argument("--limit", type=int, default=50)
+    p_query.set_defaults(func=cmd_query)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import csv
+import json
+import re
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_LABELS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+# copy_json.py が solutions/<gametype>/ にコピーし、トレーナー（preflop-training/actions.ts）が読む
+QUESTION_WEIGHTS_PATH = OUT_DIR / "question_weights.csv"
+
+# EV 差がこの程度（bb）だと「ほぼ同じ価値」とみなして難しい扱いにする
+EV_GAP_SCALE = 0.1
+# これ未満の頻度のアクションは実際には選ばれないものとして EV 差の比較から外す
+MIN_PLAYED_FREQ = 0.01
+# 純粋フォールドなど簡単な問題も、ゼロにはせず少しだけ出す
+DIFFICULTY_FLOOR = 0.05
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def get_active_position(spot: Dict[str, Any]) -> str:
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list) or not sols:
+        return "UNKNOWN"
+    first = sols[0]
+    if not isinstance(first, dict):
+        return "UNKNOWN"
+    act = first.get("action")
+    if not isinstance(act, dict):
+        return "UNKNOWN"
+    pos = act.get("position")
+    return pos if isinstance(pos, str) else "UNKNOWN"
+
+
+def get_player_range(spot: Dict[str, Any], position: str) -> Optional[List[float]]:
+    infos = spot.get("players_info")
+    if not isinstance(infos, list):
+        return None
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        player = info.get("player")
+        if not isinstance(player, dict) or player.get("position") != position:
+            continue
+        rng = info.get("range")
+        if isinstance(rng, list) and len(rng) == len(HAND_LABELS):
+            return rng
+    return None
+
+
+def iter_action_arrays(spot: Dict[str, Any]) -> List[Tuple[str, float, bool, bool, List[float], List[float]]]:
+    """
+    (code, total_frequency, next_street, is_hand_end, strategy[169], evs[169]) を返す
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, float, bool, bool, List[float], List[float]]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        try:
+            tf = float(sol.get("total_frequency", 0.0))
+        except Exception:
+            tf = 0.0
+        act = sol.get("action", {})
+        if not isinstance(act, dict):
+            continue
+        code = act.get("code")
+        if not isinstance(code, str) or not code:
+            continue
+        strategy = sol.get("strategy")
+        evs = sol.get("evs")
+        if not isinstance(strategy, list) or len(strategy) != len(HAND_LABELS):
+            continue
+        if not isinstance(evs, list) or len(evs) != len(HAND_LABELS):
+            continue
+        out.append(
+            (
+                code,
+                tf,
+                bool(act.get("next_street", False)),
+                bool(act.get("is_hand_end", False)),
+                strategy,
+                evs,
+            )
+        )
+    return out
+
+
+def load_tree_arrays(
+    explored_nodes: Set[str],
+) -> Tuple[List[str], List[str], np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    reach を伝播しつつ、到達ノードを (N, A_max, 169) のパディング配列に詰める
+    戻り値: (nodes, positions, reach[N], range[N,169], strategy[N,A,169], evs[N,A,169], action_mask[N,A])
+    """
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    reach: Dict[str, float] = {"": 1.0}
+    rows: List[Tuple[str, str, float, List[float], List[List[float]], List[List[float]]]] = []
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+
+        p_node = reach.get(node)
+        if p_node is None:
+            continue
+
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+
+        actions = iter_action_arrays(spot)
+        pos = get_active_position(spot)
+        rng = get_player_range(spot, pos)
+        if actions and rng is not None:
+            rows.append((node, pos, p_node, rng, [a[4] for a in actions], [a[5] for a in actions]))
+
+        for code, tf, next_street, is_hand_end, _, _ in actions:
+            if tf <= FREQ_EPS or next_street or is_hand_end:
+                continue
+            child = append_action(node, code)
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + (p_node * tf)
+            q.append(child)
+
+    n_nodes = len(rows)
+    a_max = max((len(r[4]) for r in rows), default=0)
+    strategy = np.zeros((n_nodes, a_max, len(HAND_LABELS)), dtype=np.float64)
+    evs = np.zeros((n_nodes, a_max, len(HAND_LABELS)), dtype=np.float64)
+    action_mask = np.zeros((n_nodes, a_max), dtype=bool)
+    for n, (_, _, _, _, strat, ev) in enumerate(rows):
+        strategy[n, : len(strat)] = strat
+        evs[n, : len(ev)] = ev
+        action_mask[n, : len(strat)] = True
+
+    return (
+        [r[0] for r in rows],
+        [r[1] for r in rows],
+        np.asarray([r[2] for r in rows], dtype=np.float64),
+        np.asarray([r[3] for r in rows], dtype=np.float64).reshape(n_nodes, len(HAND_LABELS)),
+        strategy,
+        evs,
+        action_mask,
+    )
+
+
+def score_difficulty(
+    reach: np.ndarray,
+    ranges: np.ndarray,
+    strategy: np.ndarray,
+    evs: np.ndarray,
+    action_mask: np.ndarray,
+) -> Dict[str, np.ndarray]:
+    """
+    全 (node, hand) をまとめて採点する（すべて (N, 169)）
+    - entropy: 混合度。アクション数で正規化して 0..1
+    - ev_gap: 実際に選ばれる（頻度 >= MIN_PLAYED_FREQ）アクションのうち上位2つの EV 差（bb）
+              選ばれるアクションが1つだけなら inf（純粋戦略で迷う余地がない）
+    - importance: reach × range × combos（出題時の自然な出現重み）
+    - weight: importance × (DIFFICULTY_FLOOR + max(entropy, exp(-ev_gap / EV_GAP_SCALE)))
+    """
+    n_actions = action_mask.sum(axis=1)  # (N,)
+    p = np.clip(strategy, 0.0, 1.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plogp = np.where(p > FREQ_EPS, p * np.log(p), 0.0)
+    entropy = 0.0 - plogp.sum(axis=1)
+    norm = np.log(np.maximum(n_actions, 2)).astype(np.float64)
+    entropy = np.where(n_actions[:, None] > 1, entropy / norm[:, None], 0.0)
+
+    played = action_mask[:, :, None] & (strategy >= MIN_PLAYED_FREQ)
+    masked_evs = np.where(played, evs, -np.inf)
+    if masked_evs.shape[1] >= 2:
+        top2 = -np.partition(-masked_evs, 1, axis=1)[:, :2, :]
+        with np.errstate(invalid="ignore"):
+            ev_gap = top2[:, 0, :] - top2[:, 1, :]
+        ev_gap = np.where(np.isfinite(ev_gap), ev_gap, np.inf)
+    else:
+        ev_gap = np.full(ranges.shape, np.inf)
+
+    importance = reach[:, None] * ranges * HAND_COMBOS[None, :]
+    closeness = np.exp(-ev_gap / EV_GAP_SCALE)
+    difficulty = np.maximum(entropy, closeness)
+    weight = importance * (DIFFICULTY_FLOOR + difficulty)
+
+    return {
+        "entropy": entropy,
+        "ev_gap": ev_gap,
+        "importance": importance,
+        "difficulty": difficulty,
+        "weight": weight,
+    }
+
+
+def main() -> None:
+    explored_nodes = load_explored_list(EXPLORED_LIST_PATH)
+    nodes, positions, reach, ranges, strategy, evs, action_mask = load_tree_arrays(explored_nodes)
+    scores = score_difficulty(reach, ranges, strategy, evs, action_mask)
+
+    weight = scores["weight"]
+    node_idx, hand_idx = np.nonzero(weight > FREQ_EPS)
+    order = np.argsort(-weight[node_idx, hand_idx], kind="stable")
+    node_idx = node_idx[order]
+    hand_idx = hand_idx[order]
+
+    tmp = QUESTION_WEIGHTS_PATH.with_suffix(".csv.tmp")
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["position", "preflop_actions", "hand", "weight", "entropy", "ev_gap", "importance"])
+        for n, h in zip(node_idx.tolist(), hand_idx.tolist()):
+            gap = scores["ev_gap"][n, h]
+            w.writerow(
+                [
+                    positions[n],
+                    ROOT_MARKER if nodes[n] == "" else nodes[n],
+                    HAND_LABELS[h],
+                    f"{weight[n, h]:.9g}",
+                    f"{scores['entropy'][n, h]:.6g}",
+                    f"{gap:.6g}" if np.isfinite(gap) else "",
+                    f"{scores['importance'][n, h]:.9g}",
+                ]
+            )
+    tmp.replace(QUESTION_WEIGHTS_PATH)
+
+    in_range = scores["importance"] > FREQ_EPS
+    hard = in_range & (scores["difficulty"] >= 0.5)
+
+    print("done.")
+    print(f"nodes={len(nodes)} rows_written={len(node_idx)}")
+    print(f"hard_pairs={int(hard.sum())} / in_range_pairs={int(in_range.sum())}")
+    print(f"csv={QUESTION_WEIGHTS_PATH.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
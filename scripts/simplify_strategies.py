@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import copy
+import csv
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_LABELS, check_spot_hand_order
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+SIMPLIFIED_DIR = OUT_DIR / "simplified"
+SIMPLIFICATION_COSTS_CSV_PATH = OUT_DIR / "simplification_costs.csv"
+SIMPLIFICATION_NODES_CSV_PATH = OUT_DIR / "simplification_nodes.csv"
+
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+TOTAL_COMBOS = 1326.0
+
+# emit したノードの range と simple_hand_counters（total_frequency / total_combos）のずれの許容値（丸め分）
+EMIT_COUNTER_TOL = 1e-3
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def save_json(out_path: Path, data: Any) -> None:
+    tmp = out_path.with_suffix(out_path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    tmp.replace(out_path)
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def to_float(v: Any) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class SimplifyTree:
+    """
+    ツリー全体を (N, A_max, 169) のパディング配列に詰めたもの
+    parent / own_parent は行番号（-1 = なし）。行は BFS 順なので親は必ず子より前
+    """
+
+    nodes: List[str]
+    actor: np.ndarray  # (N,) POSITIONS の index
+    codes: List[List[str]]
+    depth: np.ndarray  # (N,)
+    parent: np.ndarray  # (N,)
+    parent_action: np.ndarray  # (N,)
+    own_parent: np.ndarray  # (N,) 同じ手番が最後に決定したノード
+    own_parent_action: np.ndarray  # (N,)
+    opp_reach: np.ndarray  # (N,) 経路上の相手アクションの total_frequency の積
+    tf: np.ndarray  # (N, A)
+    betsize: np.ndarray  # (N, A) レイズ額（サイズ以外は nan）
+    is_size: np.ndarray  # (N, A) オールイン以外のレイズ
+    strategy: np.ndarray  # (N, A, 169)
+    evs: np.ndarray  # (N, A, 169)
+    action_mask: np.ndarray  # (N, A)
+
+    def ancestors(self, n: int) -> List[Tuple[int, int]]:
+        """
+        (祖先ノード, そこで選んだアクション) を ROOT 側から
+        """
+        out: List[Tuple[int, int]] = []
+        while self.parent[n] >= 0:
+            out.append((int(self.parent[n]), int(self.parent_action[n])))
+            n = int(self.parent[n])
+        return out[::-1]
+
+
+def load_simplify_tree(explored_nodes: Set[str]) -> SimplifyTree:
+    """
+    ROOT から BFS。total_frequency が 0 の枝も辿る（簡略化で頻度が付くことがあるため）
+    """
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    rows: List[Dict[str, Any]] = []
+    index: Dict[str, int] = {}
+    q: deque[Tuple[str, int, int]] = deque([("", -1, -1)])
+
+    while q:
+        node, parent, parent_action = q.popleft()
+        if node in index:
+            continue
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+        try:
+            check_spot_hand_order(spot)
+        except ValueError as e:
+            raise ValueError(f"{e}: {path}") from None
+        sols = spot.get("action_solutions")
+        pos = (spot.get("game") or {}).get("active_position")
+        if not isinstance(sols, list) or pos not in POSITIONS:
+            continue
+
+        codes: List[str] = []
+        tfs: List[float] = []
+        sizes: List[float] = []
+        size_flags: List[bool] = []
+        strat: List[List[float]] = []
+        evs: List[List[float]] = []
+        children: List[Tuple[str, int]] = []
+        for sol in sols:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+                continue
+            s, e = sol.get("strategy"), sol.get("evs")
+            if not isinstance(s, list) or len(s) != len(HAND_LABELS):
+                continue
+            if not isinstance(e, list) or len(e) != len(HAND_LABELS):
+                continue
+            code = act["code"]
+            is_size = code_kind(code) == "R" and code.upper() != "RAI" and not act.get("allin", False)
+            size = to_float(act.get("betsize")) if is_size else None
+            codes.append(code)
+            tfs.append(to_float(sol.get("total_frequency")) or 0.0)
+            sizes.append(size if size is not None else float("nan"))
+            size_flags.append(is_size and size is not None)
+            strat.append(s)
+            evs.append(e)
+            if not act.get("next_street", False) and not act.get("is_hand_end", False):
+                children.append((append_action(node, code), len(codes) - 1))
+        if not codes:
+            continue
+
+        index[node] = len(rows)
+        rows.append(
+            {
+                "node": node,
+                "actor": POSITIONS.index(pos),
+                "parent": parent,
+                "parent_action": parent_action,
+                "codes": codes,
+                "tf": tfs,
+                "sizes": sizes,
+                "size_flags": size_flags,
+                "strategy": strat,
+                "evs": evs,
+            }
+        )
+        for child, a in children:
+            if child in explored_nodes and child not in index:
+                q.append((child, index[node], a))
+
+    n_nodes = len(rows)
+    a_max = max((len(r["codes"]) for r in rows), default=0)
+    shape2 = (n_nodes, a_max)
+    shape3 = (n_nodes, a_max, len(HAND_LABELS))
+    tree = SimplifyTree(
+        nodes=[r["node"] for r in rows],
+        actor=np.asarray([r["actor"] for r in rows], dtype=np.int64),
+        codes=[r["codes"] for r in rows],
+        depth=np.zeros(n_nodes, dtype=np.int64),
+        parent=np.asarray([r["parent"] for r in rows], dtype=np.int64),
+        parent_action=np.asarray([r["parent_action"] for r in rows], dtype=np.int64),
+        own_parent=np.full(n_nodes, -1, dtype=np.int64),
+        own_parent_action=np.full(n_nodes, -1, dtype=np.int64),
+        opp_reach=np.ones(n_nodes, dtype=np.float64),
+        tf=np.zeros(shape2, dtype=np.float64),
+        betsize=np.full(shape2, np.nan, dtype=np.float64),
+        is_size=np.zeros(shape2, dtype=bool),
+        strategy=np.zeros(shape3, dtype=np.float64),
+        evs=np.zeros(shape3, dtype=np.float64),
+        action_mask=np.zeros(shape2, dtype=bool),
+    )
+    for n, r in enumerate(rows):
+        k = len(r["codes"])
+        tree.tf[n, :k] = r["tf"]
+        tree.betsize[n, :k] = r["sizes"]
+        tree.is_size[n, :k] = r["size_flags"]
+        tree.strategy[n, :k] = r["strategy"]
+        tree.evs[n, :k] = r["evs"]
+        tree.action_mask[n, :k] = True
+
+    # 祖先を辿って depth / own_parent / opp_reach を埋める
+    for n in range(n_nodes):
+        anc = tree.ancestors(n)
+        tree.depth[n] = len(anc)
+        for m, a in anc:
+            if tree.actor[m] == tree.actor[n]:
+                tree.own_parent[n], tree.own_parent_action[n] = m, a
+            else:
+                tree.opp_reach[n] *= tree.tf[m, a]
+    return tree
+
+
+@dataclass(frozen=True)
+class SimplifyRules:
+    """
+    max_sizes: ノードごとに残すレイズサイズ数（total_frequency 上位。オールインは数えない）
+               消したサイズの頻度はハンドごとに一番近い残りサイズへ移す
+    min_freq:  これ未満の頻度を 0 にして正規化し直す
+    round_step: 頻度を step 刻みに丸める（最大剰余法で合計 1 を保つ。1 なら純戦略）
+    適用順は max_sizes → min_freq → round_step
+    """
+
+    label: str
+    max_sizes: Optional[int] = None
+    min_freq: float = 0.0
+    round_step: Optional[float] = None
+
+
+def parse_rules(spec: str) -> SimplifyRules:
+    """
+    例: "pure" / "max_sizes=2" / "max_sizes=2,round=0.25" / "min_freq=0.1,round=0.5"
+    """
+    max_sizes: Optional[int] = None
+    min_freq = 0.0
+    round_step: Optional[float] = None
+    for part in [p.strip() for p in spec.split(",") if p.strip()]:
+        key, _, value = part.partition("=")
+        key = key.strip().lower()
+        try:
+            if key == "pure" and not value:
+                round_step = 1.0
+            elif key == "max_sizes":
+                max_sizes = int(value)
+                if max_sizes < 1:
+                    raise ValueError
+            elif key == "min_freq":
+                min_freq = float(value)
+                if not 0.0 <= min_freq <= 1.0:
+                    raise ValueError
+            elif key == "round":
+                round_step = float(value)
+                units = round(1.0 / round_step)
+                if round_step <= 0.0 or abs(units * round_step - 1.0) > 1e-9:
+                    raise ValueError
+            else:
+                raise KeyError(key)
+        except KeyError:
+            raise ValueError(f"unknown rule '{part}' in '{spec}' (expected pure, max_sizes=K, min_freq=X, round=STEP)")
+        except (ValueError, ZeroDivisionError):
+            raise ValueError(f"invalid value in '{part}' (max_sizes>=1, 0<=min_freq<=1, round=1/k)")
+    if max_sizes is None and min_freq <= 0.0 and round_step is None:
+        raise ValueError(f"no rule in '{spec}'")
+    return SimplifyRules(spec, max_sizes, min_freq, round_step)
+
+
+def limit_sizes(tree: SimplifyTree, strategy: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    total_frequency 上位 k サイズを残し、残りの頻度を一番近い（betsize の差が最小の）残りサイズへ移す
+    移し先を (N, A, A) の行列にして einsum 1 回で済ませる
+    """
+    n_nodes, a_max = tree.action_mask.shape
+    score = np.where(tree.is_size, tree.tf, -np.inf)
+    order = np.argsort(-score, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(a_max)[None, :].repeat(n_nodes, axis=0), axis=1)
+    kept_size = tree.is_size & (rank < k)
+    removed = tree.is_size & ~kept_size
+
+    dist = np.abs(tree.betsize[:, :, None] - tree.betsize[:, None, :])
+    dist = np.where(kept_size[:, None, :], dist, np.inf)
+    target = np.argmin(np.nan_to_num(dist, nan=np.inf), axis=2)  # (N, A)
+
+    move = np.zeros((n_nodes, a_max, a_max), dtype=np.float64)
+    diag = np.arange(a_max)
+    move[:, diag, diag] = ~removed
+    nn, aa = np.nonzero(removed)
+    move[nn, aa, target[nn, aa]] = 1.0
+    return np.einsum("nab,nah->nbh", move, strategy), tree.action_mask & ~removed
+
+
+def drop_small(tree: SimplifyTree, strategy: np.ndarray, min_freq: float) -> np.ndarray:
+    """
+    min_freq 未満を 0 にして正規化し直す（全部消える場合は最大頻度のアクションだけ残す）
+    """
+    best = strategy.argmax(axis=1)[:, None, :] == np.arange(strategy.shape[1])[None, :, None]
+    keep = (strategy >= min_freq) | best
+    out = np.where(keep & tree.action_mask[:, :, None], strategy, 0.0)
+    total = out.sum(axis=1, keepdims=True)
+    return np.where(total > FREQ_EPS, out / np.maximum(total, FREQ_EPS), out)
+
+
+def round_frequencies(tree: SimplifyTree, strategy: np.ndarray, step: float) -> np.ndarray:
+    """
+    最大剰余法で step 刻みに丸める。剰余が同じなら EV の高いアクションを優先
+    """
+    units = int(round(1.0 / step))
+    scaled = strategy * units
+    floor = np.floor(scaled + 1e-9)
+    rem = np.where(tree.action_mask[:, :, None], scaled - floor, -1.0)
+    total = strategy.sum(axis=1)  # 元々頻度が無い（全部 0 の）ハンドは 0 のまま
+    missing = np.where(total > FREQ_EPS, units - floor.sum(axis=1), 0.0)  # (N, 169)
+
+    order = np.lexsort((-tree.evs, -np.round(rem, 9)), axis=1)
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(strategy.shape[1])[None, :, None], axis=1)
+    floor += rank < missing[:, None, :]
+    return floor / units
+
+
+def apply_rules(tree: SimplifyTree, rules: SimplifyRules) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    全ノードの strategy にルールを一括適用する
+    戻り値: (strategy (N, A, 169), 残ったアクション (N, A))
+    """
+    strategy = np.where(tree.action_mask[:, :, None], tree.strategy, 0.0)
+    kept = tree.action_mask.copy()
+    if rules.max_sizes is not None:
+        strategy, kept = limit_sizes(tree, strategy, rules.max_sizes)
+    if rules.min_freq > 0.0:
+        strategy = drop_small(tree, strategy, rules.min_freq)
+    if rules.round_step is not None:
+        strategy = round_frequencies(tree, strategy, rules.round_step)
+    return strategy, kept
+
+
+def own_reach(tree: SimplifyTree, strategy: np.ndarray) -> np.ndarray:
+    """
+    手番プレイヤーがハンド h でノードに来る確率（自分のアクションの積）。depth 順に一括で伝播
+    """
+    reach = np.ones((len(tree.nodes), len(HAND_LABELS)), dtype=np.float64)
+    for d in range(1, int(tree.depth.max(initial=0)) + 1):
+        rows = np.flatnonzero((tree.depth == d) & (tree.own_parent >= 0))
+        if rows.size == 0:
+            continue
+        op, opa = tree.own_parent[rows], tree.own_parent_action[rows]
+        reach[rows] = reach[op] * strategy[op, opa]
+    return reach
+
+
+@dataclass
+class SimplifyResult:
+    """
+    ev_loss: 相手の戦略を固定したときの、そのノードでの逸脱による EV 損失（bb / 配られたハンド）
+    performance difference の形で、到達確率は簡略化後の自分の戦略で取るので、
+    同じ経路上の複数ノードの損失を足しても二重計上にならない（ノードの合計 = 戦略全体の損失）
+    """
+
+    rules: SimplifyRules
+    strategy: np.ndarray
+    kept: np.ndarray
+    reach: np.ndarray  # (N,) 簡略化後の到達確率
+    ev_loss: np.ndarray  # (N,)
+    changed: np.ndarray  # (N,) 頻度の最大変化量
+    pure_share: float  # 意思決定（reach 重み）のうち純戦略になっている割合
+
+    @property
+    def total_loss(self) -> float:
+        return float(self.ev_loss.sum())
+
+    def loss_by_position(self, tree: SimplifyTree) -> np.ndarray:
+        return np.bincount(tree.actor, weights=self.ev_loss, minlength=len(POSITIONS))
+
+
+def evaluate(tree: SimplifyTree, rules: SimplifyRules) -> SimplifyResult:
+    strategy, kept = apply_rules(tree, rules)
+    hand_reach = own_reach(tree, strategy) * (HAND_COMBOS / TOTAL_COMBOS)[None, :] * tree.opp_reach[:, None]
+    delta = np.einsum("nah,nah->nh", tree.strategy - strategy, tree.evs)
+    diff = np.abs(np.where(tree.action_mask[:, :, None], tree.strategy - strategy, 0.0))
+
+    in_range = strategy.sum(axis=1) > FREQ_EPS
+    pure = in_range & (strategy.max(axis=1) >= 1.0 - 1e-6)
+    weight = hand_reach * in_range
+    return SimplifyResult(
+        rules=rules,
+        strategy=strategy,
+        kept=kept,
+        reach=hand_reach.sum(axis=1),
+        ev_loss=(hand_reach * delta).sum(axis=1),
+        changed=diff.max(axis=(1, 2), initial=0.0),
+        pure_share=float((weight * pure).sum() / max(weight.sum(), FREQ_EPS)),
+    )
+
+
+def write_costs_csv(path: Path, tree: SimplifyTree, results: List[SimplifyResult]) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["rules", "position", "ev_loss_bb_per_hand", "ev_loss_bb100", "nodes_changed", "pure_share"])
+        for r in results:
+            by_pos = r.loss_by_position(tree)
+            changed = r.changed > 1e-6
+            for p, pos in enumerate(POSITIONS):
+                n_changed = int((changed & (tree.actor == p)).sum())
+                w.writerow([r.rules.label, pos, f"{by_pos[p]:.8f}", f"{by_pos[p] * 100:.4f}", n_changed, ""])
+            w.writerow(
+                [r.rules.label, "ALL", f"{r.total_loss:.8f}", f"{r.total_loss * 100:.4f}", int(changed.sum()), f"{r.pure_share:.6f}"]
+            )
+
+
+def write_nodes_csv(path: Path, tree: SimplifyTree, results: List[SimplifyResult]) -> None:
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["rules", "preflop_actions", "position", "reach", "ev_loss_bb_per_hand", "max_freq_change", "removed_actions"])
+        for r in results:
+            rows = np.flatnonzero(r.changed > 1e-6)
+            rows = rows[np.argsort(-r.ev_loss[rows], kind="stable")]
+            for n in rows.tolist():
+                removed = [c for a, c in enumerate(tree.codes[n]) if not r.kept[n, a]]
+                w.writerow(
+                    [
+                        r.rules.label,
+                        tree.nodes[n] or ROOT_MARKER,
+                        POSITIONS[tree.actor[n]],
+                        f"{r.reach[n]:.8f}",
+                        f"{r.ev_loss[n]:.8f}",
+                        f"{r.changed[n]:.4f}",
+                        " ".join(removed),
+                    ]
+                )
+
+
+def simplified_spot(tree: SimplifyTree, result: SimplifyResult, n: int, spot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    元の JSON を簡略化後の値で書き換える（トレーナーが読む strategy / simple_hand_counters / range など）
+    total_combos / total_ev は元の値（カードリムーバル込み）を、簡略化前後の比・差で補正する
+    """
+    out = copy.deepcopy(spot)
+    anc = tree.ancestors(n)
+    actor = POSITIONS[tree.actor[n]]
+    strategy = result.strategy[n]
+
+    sols = [s for s in out["action_solutions"] if isinstance(s, dict) and isinstance(s.get("action"), dict)]
+    row_of = {c: a for a, c in enumerate(tree.codes[n])}
+    kept_sols = []
+    for sol in sols:
+        a = row_of.get(sol["action"].get("code"))
+        if a is None or result.kept[n, a]:
+            kept_sols.append(sol)
+    out["action_solutions"] = kept_sols
+
+    for info in out.get("players_info", []):
+        if not isinstance(info, dict) or not isinstance(info.get("player"), dict):
+            continue
+        pos = info["player"].get("position")
+        if pos not in POSITIONS:
+            continue
+        p = POSITIONS.index(pos)
+        rng = np.ones(len(HAND_LABELS), dtype=np.float64)
+        for m, a in anc:
+            if tree.actor[m] == p:
+                rng = rng * result.strategy[m, a]
+        old_rng = np.asarray(info.get("range") or rng, dtype=np.float64)
+        info["range"] = [round(float(v), 6) for v in rng]
+        old_combos = float((old_rng * HAND_COMBOS).sum())
+        new_combos = float((rng * HAND_COMBOS).sum())
+        if isinstance(info.get("total_combos"), (int, float)) and old_combos > FREQ_EPS:
+            info["total_combos"] = round(info["total_combos"] * new_combos / old_combos, 3)
+
+        is_actor = pos == actor
+        hand_ev = (strategy * tree.evs[n]).sum(axis=0)
+        if is_actor:
+            old_ev = (tree.strategy[n] * tree.evs[n]).sum(axis=0)
+            if isinstance(info.get("hand_evs"), list) and len(info["hand_evs"]) == len(HAND_LABELS):
+                info["hand_evs"] = [round(float(v), 6) for v in hand_ev]
+            if isinstance(info.get("total_ev"), (int, float)) and new_combos > FREQ_EPS and old_combos > FREQ_EPS:
+                shift = (rng * HAND_COMBOS * hand_ev).sum() / new_combos - (old_rng * HAND_COMBOS * old_ev).sum() / old_combos
+                info["total_ev"] = round(info["total_ev"] + float(shift), 8)
+
+        counters = info.get("simple_hand_counters")
+        if not isinstance(counters, dict):
+            continue
+        for h, label in enumerate(HAND_LABELS):
+            c = counters.get(label)
+            if not isinstance(c, dict):
+                continue
+            c["total_combos"] = round(float(rng[h] * HAND_COMBOS[h]), 3)
+            c["total_frequency"] = round(float(rng[h]), 6)
+            if is_actor and c.get("actions_total_frequencies"):
+                freqs = {code: round(float(strategy[a, h]), 6) for code, a in row_of.items() if result.kept[n, a]}
+                c["actions_total_frequencies"] = freqs
+                c["actions_total_combos"] = {code: round(v * c["total_combos"], 3) for code, v in freqs.items()}
+                c["hand_ev"] = round(float(hand_ev[h]), 6)
+
+    # アクション単位の集計（total_ev はノード全体の EV が入っているので手番の total_ev と揃える）
+    actor_info = next(
+        (i for i in out.get("players_info", []) if isinstance(i, dict) and (i.get("player") or {}).get("position") == actor),
+        None,
+    )
+    rng = np.asarray(actor_info["range"], dtype=np.float64) if actor_info else np.ones(len(HAND_LABELS))
+    new_mass = (strategy * (rng * HAND_COMBOS)[None, :]).sum(axis=1)
+    old_mass = (tree.strategy[n] * (rng * HAND_COMBOS)[None, :]).sum(axis=1)
+    combos = {}
+    for sol in kept_sols:
+        a = row_of.get(sol["action"].get("code"))
+        if a is None:
+            continue
+        sol["strategy"] = [round(float(v), 6) for v in strategy[a]]
+        old = to_float(sol.get("total_combos"))
+        combos[a] = old * new_mass[a] / old_mass[a] if old is not None and old_mass[a] > FREQ_EPS else new_mass[a]
+        if actor_info and isinstance(actor_info.get("total_ev"), (int, float)):
+            sol["total_ev"] = actor_info["total_ev"]
+    total = sum(combos.values())
+    for sol in kept_sols:
+        a = row_of.get(sol["action"].get("code"))
+        if a is None:
+            continue
+        sol["total_combos"] = round(float(combos[a]), 3)
+        sol["total_frequency"] = round(float(combos[a] / total), 8) if total > FREQ_EPS else 0.0
+    return out
+
+
+def check_emitted_counters(node: str, spot: Dict[str, Any]) -> None:
+    """
+    書き出す JSON の range と simple_hand_counters の total_frequency / total_combos が同じハンドを指しているか
+    （ハンドの並びがずれていると別のハンドの値が入るので、ずれていたら ValueError）
+    """
+    for info in spot.get("players_info", []):
+        if not isinstance(info, dict) or not isinstance(info.get("range"), list):
+            continue
+        counters = info.get("simple_hand_counters")
+        if not isinstance(counters, dict):
+            continue
+        rng = np.asarray(info["range"], dtype=np.float64)
+        freq = np.asarray([(counters.get(h) or {}).get("total_frequency", np.nan) for h in HAND_LABELS], dtype=np.float64)
+        combos = np.asarray([(counters.get(h) or {}).get("total_combos", np.nan) for h in HAND_LABELS], dtype=np.float64)
+        err = max(
+            float(np.nanmax(np.abs(freq - rng), initial=0.0)),
+            float(np.nanmax(np.abs(combos - rng * HAND_COMBOS) / HAND_COMBOS, initial=0.0)),
+        )
+        if err > EMIT_COUNTER_TOL:
+            pos = (info.get("player") or {}).get("position")
+            raise ValueError(f"range and simple_hand_counters disagree for {pos} at '{node or ROOT_MARKER}' (max err {err:.3g})")
+
+
+def emit_tree(tree: SimplifyTree, result: SimplifyResult, out_dir: Path) -> int:
+    """
+    消したアクションの先の部分木は出さない。preflop_actions.txt も一緒に書く
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    emitted = np.zeros(len(tree.nodes), dtype=bool)
+    written: List[str] = []
+    for n, node in enumerate(tree.nodes):
+        p = tree.parent[n]
+        if p >= 0 and not (emitted[p] and result.kept[p, tree.parent_action[n]]):
+            continue
+        emitted[n] = True
+        spot = simplified_spot(tree, result, n, load_json(get_node_path(node)))
+        check_emitted_counters(node, spot)
+        save_json(out_dir / (sanitize_filename(node) + ".json"), spot)
+        written.append(node)
+
+    tmp = out_dir / "preflop_actions.txt.tmp"
+    with tmp.open("w", encoding="utf-8") as f:
+        for node in written:
+            f.write((node or ROOT_MARKER) + "\n")
+    tmp.replace(out_dir / "preflop_actions.txt")
+    return len(written)
+
+
+def load_rule_specs(args: argparse.Namespace) -> List[SimplifyRules]:
+    specs: List[str] = list(args.rules or [])
+    if args.rules_file:
+        with Path(args.rules_file).open("r", encoding="utf-8") as f:
+            specs += [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+    if not specs:
+        raise SystemExit("no rule set (use --rules SPEC or --rules-file FILE)")
+    return [parse_rules(s) for s in specs]
+
+
+def cmd_evaluate(args: argparse.Namespace) -> None:
+    rule_sets = load_rule_specs(args)
+    t0 = time.perf_counter()
+    tree = load_simplify_tree(load_explored_list(EXPLORED_LIST_PATH))
+    t1 = time.perf_counter()
+    results = [evaluate(tree, r) for r in rule_sets]
+    t2 = time.perf_counter()
+
+    write_costs_csv(SIMPLIFICATION_COSTS_CSV_PATH, tree, results)
+    write_nodes_csv(SIMPLIFICATION_NODES_CSV_PATH, tree, results)
+
+    print("\t".join(["rules", "ev_loss_bb100"] + POSITIONS + ["nodes_changed", "pure_share"]))
+    for r in results:
+        by_pos = r.loss_by_position(tree) * 100
+        print(
+            "\t".join(
+                [r.rules.label, f"{r.total_loss * 100:.4f}"]
+                + [f"{v:.4f}" for v in by_pos]
+                + [str(int((r.changed > 1e-6).sum())), f"{r.pure_share:.2%}"]
+            )
+        )
+    print("done.")
+    print(f"nodes={len(tree.nodes)} rule_sets={len(results)} load={t1 - t0:.2f}s evaluate={(t2 - t1) * 1000:.1f}ms")
+    print(f"csv={SIMPLIFICATION_COSTS_CSV_PATH.resolve()}")
+    print(f"csv={SIMPLIFICATION_NODES_CSV_PATH.resolve()}")
+
+
+def cmd_emit(args: argparse.Namespace) -> None:
+    rules = parse_rules(args.rules)
+    tree = load_simplify_tree(load_explored_list(EXPLORED_LIST_PATH))
+    result = evaluate(tree, rules)
+    out_dir = Path(args.out) if args.out else SIMPLIFIED_DIR / sanitize_filename(rules.label)
+    n_written = emit_tree(tree, result, out_dir)
+    print("done.")
+    print(f"rules={rules.label} ev_loss_bb100={result.total_loss * 100:.4f} nodes={n_written}/{len(tree.nodes)}")
+    print(f"out_dir={out_dir.resolve()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="戦略の簡略化ルールを全ノードに適用し、EV 損失を測る")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rules_help = "例: pure / max_sizes=2 / min_freq=0.1,round=0.25"
+    p_eval = sub.add_parser("evaluate", help="ルールセットごとの EV 損失を一覧する")
+    p_eval.add_argument("--rules", action="append", help=f"複数指定可。{rules_help}")
+    p_eval.add_argument("--rules-file", help="1 行 1 ルールセット（# はコメント）")
+    p_eval.set_defaults(func=cmd_evaluate)
+
+    p_emit = sub.add_parser("emit", help=f"簡略化したツリーを同じ形式で {SIMPLIFIED_DIR}/<rules>/ に書き出す")
+    p_emit.add_argument("rules", help=rules_help)
+    p_emit.add_argument("--out", help="出力先ディレクトリ")
+    p_emit.set_defaults(func=cmd_emit)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import math
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import CARD_CLASS, N_HANDS
+from pot_types import pot_type
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+SIM_NODES_CSV_PATH = OUT_DIR / "simulated_node_frequencies.csv"
+SIM_FLOP_CSV_PATH = OUT_DIR / "simulated_flop_situations.csv"
+
+# POSITIONS = ["UTG", "UTG+1", "UTG+2", "LJ", "HJ", "CO", "BTN", "SB", "BB"]
+POSITIONS = ["UTG", "HJ", "CO", "BTN", "SB", "BB"]
+
+DEFAULT_HANDS = 2_000_000
+DEFAULT_BATCH = 200_000
+MAX_STEPS = 64
+
+# 95% 信頼区間
+Z_95 = 1.959963984540054
+# root のアクション頻度の検算: 解析値からこれ以上（標準偏差単位）ずれたら失敗扱い
+# （2段目以降は他プレイヤーのカード除去で解析値とずれるのが正しいので検算しない）
+REACH_Z_MAX = 4.0
+
+# 結果の種類
+OUTCOME_CONTINUE = 0
+OUTCOME_FLOP = 1
+OUTCOME_HAND_END = 2
+OUTCOME_UNEXPLORED = 3
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def get_active_position(spot: Dict[str, Any]) -> str:
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list) or not sols:
+        return "UNKNOWN"
+    first = sols[0]
+    if not isinstance(first, dict):
+        return "UNKNOWN"
+    act = first.get("action")
+    if not isinstance(act, dict):
+        return "UNKNOWN"
+    pos = act.get("position")
+    return pos if isinstance(pos, str) else "UNKNOWN"
+
+
+def get_player_range(spot: Dict[str, Any], position: str) -> Optional[List[float]]:
+    infos = spot.get("players_info")
+    if not isinstance(infos, list):
+        return None
+    for info in infos:
+        if not isinstance(info, dict):
+            continue
+        player = info.get("player")
+        if not isinstance(player, dict) or player.get("position") != position:
+            continue
+        rng = info.get("range")
+        if isinstance(rng, list) and len(rng) == N_HANDS:
+            return rng
+    return None
+
+
+def iter_action_strategies(spot: Dict[str, Any]) -> List[Tuple[str, float, bool, bool, Optional[List[float]]]]:
+    """
+    (code, total_frequency, next_street, is_hand_end, strategy[169] or None) を返す
+    """
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list):
+        return []
+    out: List[Tuple[str, float, bool, bool, Optional[List[float]]]] = []
+    for sol in sols:
+        if not isinstance(sol, dict):
+            continue
+        try:
+            tf = float(sol.get("total_frequency", 0.0))
+        except Exception:
+            tf = 0.0
+        act = sol.get("action", {})
+        if not isinstance(act, dict):
+            continue
+        code = act.get("code")
+        if not isinstance(code, str) or not code:
+            continue
+        strategy = sol.get("strategy")
+        if not isinstance(strategy, list) or len(strategy) != N_HANDS:
+            strategy = None
+        out.append(
+            (
+                code,
+                tf,
+                bool(act.get("next_street", False)),
+                bool(act.get("is_hand_end", False)),
+                strategy,
+            )
+        )
+    return out
+
+
+@dataclass
+class SimTree:
+    nodes: List[str]
+    reach: np.ndarray  # (N,) total_frequency から計算した解析値
+    actor: np.ndarray  # (N,) int8 POSITIONS のインデックス
+    outcome: np.ndarray  # (N, A) int8 OUTCOME_*
+    child: np.ndarray  # (N, A) int32（-1 は子なし）
+    flop_id: np.ndarray  # (N, A) int32（-1 はフロップに行かない）
+    flop_situations: List[str]
+    flop_reach: np.ndarray  # (F,) 解析値
+    alias_prob: np.ndarray  # (N, 169, A) float64
+    alias_idx: np.ndarray  # (N, 169, A) int8
+    fallback_cells: int  # strategy が和0 で total_frequency を使った (node, hand) 数（レンジ外のハンドのみ）
+
+
+def build_alias_tables(p: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    p: (R, K) の確率（行和1）から Vose のエイリアス表を全行まとめて作る
+    各反復で「未確定のうち最小」と「最大」を組にして1列ずつ確定させる
+    """
+    rows, k = p.shape
+    q = p * k
+    prob = np.ones((rows, k), dtype=np.float64)
+    alias = np.tile(np.arange(k, dtype=np.int8), (rows, 1))
+    done = np.zeros((rows, k), dtype=bool)
+    r = np.arange(rows)
+
+    for _ in range(k - 1):
+        small = np.argmin(np.where(done, np.inf, q), axis=1)
+        large = np.argmax(np.where(done, -np.inf, q), axis=1)
+        qs = q[r, small]
+        prob[r, small] = qs
+        alias[r, small] = large
+        done[r, small] = True
+        q[r, large] -= 1.0 - qs
+
+    return np.clip(prob, 0.0, 1.0), alias
+
+
+def load_sim_tree(explored_nodes: Set[str]) -> SimTree:
+    if "" not in explored_nodes:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    reach: Dict[str, float] = {"": 1.0}
+    spots: Dict[str, List[Tuple[str, float, bool, bool, Optional[List[float]]]]] = {}
+    actors: Dict[str, str] = {}
+    ranges: Dict[str, Optional[List[float]]] = {}
+    order: List[str] = []
+    q: deque[str] = deque([""])
+    visited: Set[str] = set()
+
+    while q:
+        node = q.popleft()
+        if node in visited:
+            continue
+        visited.add(node)
+
+        p_node = reach.get(node)
+        if p_node is None:
+            continue
+
+        path = get_node_path(node)
+        if not path.exists():
+            continue
+        spot = load_json(path)
+        actions = iter_action_strategies(spot)
+        if not actions:
+            continue
+
+        order.append(node)
+        spots[node] = actions
+        actors[node] = get_active_position(spot)
+        ranges[node] = get_player_range(spot, actors[node])
+
+        for code, tf, next_street, is_hand_end, _ in actions:
+            if tf <= FREQ_EPS or next_street or is_hand_end:
+                continue
+            child = append_action(node, code)
+            if child not in explored_nodes:
+                continue
+            reach[child] = reach.get(child, 0.0) + (p_node * tf)
+            q.append(child)
+
+    node_index = {n: i for i, n in enumerate(order)}
+    n_nodes = len(order)
+    a_max = max(len(spots[n]) for n in order)
+
+    actor = np.zeros(n_nodes, dtype=np.int8)
+    outcome = np.full((n_nodes, a_max), OUTCOME_UNEXPLORED, dtype=np.int8)
+    child_idx = np.full((n_nodes, a_max), -1, dtype=np.int32)
+    flop_id = np.full((n_nodes, a_max), -1, dtype=np.int32)
+    strategy = np.zeros((n_nodes, N_HANDS, a_max), dtype=np.float64)
+    flop_situations: List[str] = []
+    flop_reach: List[float] = []
+    fallback_cells = 0
+
+    for n, node in enumerate(order):
+        pos = actors[node]
+        if pos not in POSITIONS:
+            raise RuntimeError(f"unknown actor position '{pos}' at node='{node}'")
+        actor[n] = POSITIONS.index(pos)
+
+        tfs = np.zeros(a_max, dtype=np.float64)
+        for a, (code, tf, next_street, is_hand_end, strat) in enumerate(spots[node]):
+            tfs[a] = max(tf, 0.0)
+            if strat is not None:
+                strategy[n, :, a] = np.clip(np.asarray(strat, dtype=np.float64), 0.0, None)
+            if is_hand_end:
+                outcome[n, a] = OUTCOME_HAND_END
+            elif next_street:
+                outcome[n, a] = OUTCOME_FLOP
+                flop_id[n, a] = len(flop_situations)
+                flop_situations.append(append_action(node, code))
+                flop_reach.append(reach.get(node, 0.0) * tf)
+            else:
+                c = node_index.get(append_action(node, code))
+                if c is not None:
+                    outcome[n, a] = OUTCOME_CONTINUE
+                    child_idx[n, a] = c
+
+        # レンジ外のハンド（そもそも来ない）は strategy が空なので total_frequency で埋める
+        # レンジ内で strategy が空なのはデータかハンド順の不整合なので止める
+        sums = strategy[n].sum(axis=1)
+        bad = sums <= FREQ_EPS
+        rng = ranges[node]
+        if rng is None:
+            raise RuntimeError(f"range of '{pos}' not found at node='{node}'")
+        in_range_bad = bad & (np.asarray(rng, dtype=np.float64) > FREQ_EPS)
+        if in_range_bad.any():
+            raise RuntimeError(
+                f"empty strategy for {int(in_range_bad.sum())} in-range hands at node='{node}' "
+                f"(first hand index {int(np.flatnonzero(in_range_bad)[0])})"
+            )
+        if bad.any() and tfs.sum() > 0:
+            strategy[n, bad] = tfs / tfs.sum()
+            fallback_cells += int(bad.sum())
+
+    flat = strategy.reshape(-1, a_max)
+    sums = flat.sum(axis=1, keepdims=True)
+    flat = np.where(sums > FREQ_EPS, flat / np.maximum(sums, FREQ_EPS), 1.0 / a_max)
+    prob, alias = build_alias_tables(flat)
+
+    return SimTree(
+        nodes=order,
+        reach=np.asarray([reach.get(n, 0.0) for n in order], dtype=np.float64),
+        actor=actor,
+        outcome=outcome,
+        child=child_idx,
+        flop_id=flop_id,
+        flop_situations=flop_situations,
+        flop_reach=np.asarray(flop_reach, dtype=np.float64),
+        alias_prob=prob.reshape(n_nodes, N_HANDS, a_max),
+        alias_idx=alias.reshape(n_nodes, N_HANDS, a_max),
+        fallback_cells=fallback_cells,
+    )
+
+
+def deal_hand_classes(rng: np.random.Generator, batch: int) -> np.ndarray:
+    """
+    52枚から各ポジションに2枚ずつ重複なしで配り、169 クラスの番号（HAND_LABELS 順）を返す: (batch, P)
+    card = rank * 4 + suit（rank 0 が 2, 12 が A）
+    """
+    n_cards = 2 * len(POSITIONS)
+    cards = np.argpartition(rng.random((batch, 52)), n_cards, axis=1)[:, :n_cards]
+    return CARD_CLASS[cards[:, 0::2], cards[:, 1::2]].astype(np.int16)
+
+
+_SIM_TREE: Optional[SimTree] = None
+
+
+def _init_worker(tree: SimTree) -> None:
+    global _SIM_TREE
+    _SIM_TREE = tree
+
+
+def simulate_batch(args: Tuple[int, np.random.SeedSequence]) -> Dict[str, np.ndarray]:
+    """
+    batch 本のハンドをまとめてツリー上で進める
+    戻り値は集計用のカウンタ（node 訪問、フロップ到達、終了種別×ポットタイプ）
+    """
+    batch, seed = args
+    tree = _SIM_TREE
+    assert tree is not None
+    rng = np.random.default_rng(seed)
+
+    n_nodes, a_max = tree.outcome.shape
+    classes = deal_hand_classes(rng, batch)
+
+    node_visits = np.zeros(n_nodes, dtype=np.int64)
+    flop_hits = np.zeros(len(tree.flop_situations), dtype=np.int64)
+    end_hits = np.zeros((n_nodes, a_max), dtype=np.int64)
+    unexplored_hits = np.zeros((n_nodes, a_max), dtype=np.int64)
+
+    idx = np.arange(batch)
+    cur = np.zeros(batch, dtype=np.int32)
+    for _ in range(MAX_STEPS):
+        if idx.size == 0:
+            break
+        node_visits += np.bincount(cur, minlength=n_nodes)
+
+        h = classes[idx, tree.actor[cur]]
+        k = rng.integers(a_max, size=idx.size)
+        take = rng.random(idx.size) < tree.alias_prob[cur, h, k]
+        a = np.where(take, k, tree.alias_idx[cur, h, k])
+
+        kind = tree.outcome[cur, a]
+        is_flop = kind == OUTCOME_FLOP
+        flop_hits += np.bincount(tree.flop_id[cur[is_flop], a[is_flop]], minlength=len(flop_hits))
+        for mask, counter in ((kind == OUTCOME_HAND_END, end_hits), (kind == OUTCOME_UNEXPLORED, unexplored_hits)):
+            if mask.any():
+                np.add.at(counter, (cur[mask], a[mask]), 1)
+
+        alive = kind == OUTCOME_CONTINUE
+        idx = idx[alive]
+        cur = tree.child[cur[alive], a[alive]]
+
+    return {
+        "hands": np.array([batch], dtype=np.int64),
+        "node_visits": node_visits,
+        "flop_hits": flop_hits,
+        "end_hits": end_hits,
+        "unexplored_hits": unexplored_hits,
+        "truncated": np.array([idx.size], dtype=np.int64),
+    }
+
+
+def wilson_interval(hits: np.ndarray, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    p = hits / n
+    z2 = Z_95 * Z_95
+    denom = 1.0 + z2 / n
+    center = (p + z2 / (2 * n)) / denom
+    half = Z_95 * np.sqrt(p * (1.0 - p) / n + z2 / (4 * n * n)) / denom
+    return center - half, center + half
+
+
+def run_simulation(tree: SimTree, hands: int, batch: int, workers: int, seed: int) -> Dict[str, np.ndarray]:
+    sizes = [batch] * (hands // batch)
+    if hands % batch:
+        sizes.append(hands % batch)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    total: Dict[str, np.ndarray] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(tree,)) as pool:
+        for part in pool.map(simulate_batch, zip(sizes, seeds)):
+            for key, value in part.items():
+                total[key] = total[key] + value if key in total else value
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="解いたプリフロップツリー上でハンドをモンテカルロ再生する")
+    parser.add_argument("--hands", type=int, default=DEFAULT_HANDS)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH)
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU 数）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    explored_nodes = load_explored_list(EXPLORED_LIST_PATH)
+    tree = load_sim_tree(explored_nodes)
+
+    t0 = time.perf_counter()
+    total = run_simulation(tree, args.hands, args.batch, args.workers, args.seed)
+    elapsed = time.perf_counter() - t0
+    n = int(total["hands"][0])
+
+    # 1) ノード到達頻度（解析値 reach_prob と比較）
+    lo, hi = wilson_interval(total["node_visits"], n)
+    reach_emp = total["node_visits"] / n
+    reach_z = (reach_emp - tree.reach) / np.sqrt(np.maximum(tree.reach * (1.0 - tree.reach), FREQ_EPS) / n)
+    with SIM_NODES_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["preflop_actions", "reach_prob", "empirical", "ci95_low", "ci95_high", "z"])
+        for i in np.argsort(-tree.reach, kind="stable"):
+            node = tree.nodes[i]
+            w.writerow([ROOT_MARKER if node == "" else node, tree.reach[i], reach_emp[i], lo[i], hi[i], reach_z[i]])
+
+    # 2) フロップシチュエーション（無条件確率）
+    lo, hi = wilson_interval(total["flop_hits"], n)
+    emp = total["flop_hits"] / n
+    with SIM_FLOP_CSV_PATH.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["flop_situation", "pot_type", "prob_unconditional", "empirical", "ci95_low", "ci95_high"])
+        for i in np.argsort(-tree.flop_reach, kind="stable"):
+            s = tree.flop_situations[i]
+            w.writerow([s, pot_type(s), tree.flop_reach[i], emp[i], lo[i], hi[i]])
+
+    # 3) どこでハンドが終わったか（ポットタイプ別）
+    ended: Dict[Tuple[str, str], int] = {}
+    for f_id, s in enumerate(tree.flop_situations):
+        key = ("flop", pot_type(s))
+        ended[key] = ended.get(key, 0) + int(total["flop_hits"][f_id])
+    for label, counter in (("preflop_end", total["end_hits"]), ("unexplored", total["unexplored_hits"])):
+        per_node = counter.sum(axis=1)
+        for node_i in np.flatnonzero(per_node):
+            key = (label, pot_type(tree.nodes[node_i]))
+            ended[key] = ended.get(key, 0) + int(per_node[node_i])
+
+    print("done.")
+    print(f"hands={n} elapsed={elapsed:.2f}s ({n / max(elapsed, 1e-9):,.0f} hands/s)")
+    print(f"nodes={len(tree.nodes)} flop_situations={len(tree.flop_situations)} fallback_cells={tree.fallback_cells}")
+    for (label, pt), count in sorted(ended.items()):
+        p = count / n
+        half = Z_95 * math.sqrt(p * (1.0 - p) / n)
+        print(f"  {label:<12} {pt:<5} {p:.6f} ± {half:.6f}")
+    if int(total["truncated"][0]):
+        print(f"[warn] {int(total['truncated'][0])} hands hit MAX_STEPS={MAX_STEPS}")
+    print(f"csv={SIM_NODES_CSV_PATH.resolve()}")
+    print(f"csv={SIM_FLOP_CSV_PATH.resolve()}")
+
+    # root のアクションは誰のカードにも条件付かないので、解析値と標本誤差の範囲で一致するはず
+    # 配ったハンドのクラスと strategy の並びがずれているとここが合わなくなる
+    first = np.asarray([node != "" and "-" not in node for node in tree.nodes], dtype=bool)
+    for i in np.flatnonzero(first):
+        print(f"  root {tree.nodes[i]:<6} reach={tree.reach[i]:.6f} empirical={reach_emp[i]:.6f} z={reach_z[i]:+.2f}")
+    off = np.flatnonzero(first & (np.abs(reach_z) > REACH_Z_MAX))
+    if off.size:
+        raise SystemExit(f"[error] root action frequencies deviate from reach_prob beyond |z|={REACH_Z_MAX}")
+
+
+if __name__ == "__main__":
+    main()
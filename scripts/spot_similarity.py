@@ -0,0 +1,532 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_LABELS, N_HANDS, RANKS
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_NAME = "preflop_actions.txt"  # 各ソリューションディレクトリ内（ROOT含む前提）
+ROOT_MARKER = "ROOT"
+
+SPOT_SIMILARITY_PATH = OUT_DIR / "spot_similarity.npz"
+# preflop_equity.py build の出力。あればハンドの強さ順のタイブレーク（ランダムハンド相手の equity）に使う
+PREFLOP_EQUITY_PATH = OUT_DIR / "preflop_equity.npz"
+
+ACTION_CLASSES = ["F", "X", "C", "R", "AI"]
+
+# cosine 用ベクトルのブロックの重み（各ブロックを単位ベクトルにしてから掛ける）
+STRATEGY_WEIGHT = 0.6
+RANGE_WEIGHT = 0.25
+OPP_RANGE_WEIGHT = 0.15
+
+# 近似モード（IVF）: リスト数 = sqrt(N) 程度。ノード数がこの倍率を超えて増えたら作り直す
+IVF_RETRAIN_GROWTH = 2.0
+IVF_ITERATIONS = 20
+
+N_CLASSES = len(ACTION_CLASSES)
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> Set[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: Set[str] = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.add(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def code_kind(code: str) -> str:
+    u = code.upper()
+    if u == "F" or u.startswith("F"):
+        return "F"
+    if u == "C" or u.startswith("C"):
+        return "C"
+    # ALL IN 系を広めに吸収
+    if u in {"AI", "ALLIN", "ALL_IN"} or u.startswith("AI") or "ALLIN" in u or "ALL_IN" in u:
+        return "AI"
+    if u.startswith("R"):
+        return "R"
+    return "OTHER"
+
+
+def action_class(code: str, allin: bool = False) -> Optional[str]:
+    """
+    レイズはサイズを問わず R にまとめる（アクション数の違うスポット同士を比べるため）
+    """
+    u = code.upper()
+    if u == "X":
+        return "X"
+    if u == "RAI" or allin:
+        return "AI"
+    k = code_kind(code)
+    return k if k in ACTION_CLASSES else None
+
+
+def unit(v: np.ndarray) -> np.ndarray:
+    n = float(np.linalg.norm(v))
+    return v / n if n > FREQ_EPS else v
+
+
+@dataclass
+class SpotFeatures:
+    position: str
+    vec: np.ndarray  # (D,) cosine 用（単位ベクトル）
+    mass: np.ndarray  # (C, 169) レンジ重み付きのアクション別質量（合計 1）
+
+
+def spot_features(spot: Dict[str, Any]) -> Optional[SpotFeatures]:
+    """
+    戦略ブロック: ハンド × アクション種類ごとの「レンジ × 頻度」
+    レンジブロック: 手番のレンジ / 相手（players_info の手番以外）のレンジ（コンボ数で重み付け）
+    """
+    actor = (spot.get("game") or {}).get("active_position")
+    sols = spot.get("action_solutions")
+    if not isinstance(actor, str) or not isinstance(sols, list):
+        return None
+
+    actor_range: Optional[np.ndarray] = None
+    opp_range = np.zeros(N_HANDS, dtype=np.float64)
+    for info in spot.get("players_info") or []:
+        if not isinstance(info, dict) or not isinstance(info.get("range"), list) or len(info["range"]) != N_HANDS:
+            continue
+        rng = np.asarray(info["range"], dtype=np.float64) * HAND_COMBOS
+        if (info.get("player") or {}).get("position") == actor:
+            actor_range = rng
+        else:
+            opp_range = opp_range + rng
+    if actor_range is None:
+        actor_range = HAND_COMBOS.copy()
+    total = actor_range.sum()
+    if total <= FREQ_EPS:
+        return None
+
+    by_class = np.zeros((N_CLASSES, N_HANDS), dtype=np.float64)
+    for sol in sols:
+        act = sol.get("action") if isinstance(sol, dict) else None
+        strategy = sol.get("strategy") if isinstance(sol, dict) else None
+        if not isinstance(act, dict) or not isinstance(act.get("code"), str):
+            continue
+        if not isinstance(strategy, list) or len(strategy) != N_HANDS:
+            continue
+        c = action_class(act["code"], bool(act.get("allin", False)))
+        if c is not None:
+            by_class[ACTION_CLASSES.index(c)] += np.asarray(strategy, dtype=np.float64)
+    if not by_class.any():
+        return None
+
+    mass = by_class * (actor_range / total)[None, :]
+    vec = np.concatenate(
+        [
+            np.sqrt(STRATEGY_WEIGHT) * unit(mass.ravel()),
+            np.sqrt(RANGE_WEIGHT) * unit(actor_range),
+            np.sqrt(OPP_RANGE_WEIGHT) * unit(opp_range),
+        ]
+    )
+    return SpotFeatures(actor, unit(vec), mass)
+
+
+def actor_best_evs(spot: Dict[str, Any]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    手番の各ハンドの最大 EV と、手番のレンジに入っているか（range > 0）
+    """
+    actor = (spot.get("game") or {}).get("active_position")
+    in_range: Optional[np.ndarray] = None
+    for info in spot.get("players_info") or []:
+        if isinstance(info, dict) and (info.get("player") or {}).get("position") == actor:
+            if isinstance(info.get("range"), list) and len(info["range"]) == N_HANDS:
+                in_range = np.asarray(info["range"], dtype=np.float64) > FREQ_EPS
+    best = np.full(N_HANDS, -np.inf)
+    for sol in spot.get("action_solutions") or []:
+        evs = sol.get("evs") if isinstance(sol, dict) else None
+        if isinstance(evs, list) and len(evs) == N_HANDS:
+            best = np.maximum(best, np.asarray(evs, dtype=np.float64))
+    if in_range is None or not np.isfinite(best).all():
+        return None
+    return best, in_range
+
+
+def equity_vs_random(path: Path = PREFLOP_EQUITY_PATH) -> Optional[np.ndarray]:
+    """
+    各ハンドのランダムハンド相手の all-in equity（preflop_equity.py の eq169 をコンボ数で平均）。キャッシュが無ければ None
+    """
+    if not path.exists():
+        return None
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path} (rerun `preflop_equity.py build`)")
+        eq169 = z["eq169"].astype(np.float64)
+    valid = np.isfinite(eq169)
+    weights = np.where(valid, HAND_COMBOS[None, :], 0.0)
+    return (np.where(valid, eq169, 0.0) * weights).sum(axis=1) / weights.sum(axis=1)
+
+
+def hand_strength_order(ev_sum: np.ndarray, ev_count: np.ndarray, equity: Optional[np.ndarray]) -> np.ndarray:
+    """
+    EMD の軸にするハンドの強さ順（弱い順）
+    1. 手番のレンジに入っているノードでの最大 EV の平均（ROOT だけだとオープンしないハンドが EV 0 で並ぶ）
+    2. ランダムハンド相手の equity（PREFLOP_EQUITY_PATH があれば）
+    3. ランク（ペア > 高いカード > キッカー > スーテッド）。最後はラベルで一意に決まる
+    """
+    avg_ev = np.where(ev_count > 0, ev_sum / np.maximum(ev_count, 1), 0.0)
+    eq = equity if equity is not None else np.zeros(N_HANDS)
+    pair = np.asarray([len(h) == 2 for h in HAND_LABELS], dtype=np.int64)
+    hi = np.asarray([RANKS.index(h[0]) for h in HAND_LABELS], dtype=np.int64)
+    lo = np.asarray([RANKS.index(h[1]) for h in HAND_LABELS], dtype=np.int64)
+    suited = np.asarray([h.endswith("s") for h in HAND_LABELS], dtype=np.int64)
+    # lexsort は最後のキーが第 1 キー
+    return np.lexsort((suited, lo, hi, pair, eq, np.round(avg_ev, 9)))
+
+
+def file_signature(path: Path) -> Tuple[int, int]:
+    st = path.stat()
+    return (int(st.st_mtime_ns), int(st.st_size))
+
+
+@dataclass
+class SpotIndex:
+    """
+    ids は "source|preflop_actions"（source = ソリューションディレクトリ）
+    cdf: EMD 用。アクション種類ごとの質量を強さ順に累積したもの (N, C * 169)
+    centroids / assign: 近似モード用の IVF（cosine の球面 k-means）
+    """
+
+    sources: List[str]
+    nodes: List[str]
+    positions: List[str]
+    signatures: np.ndarray  # (N, 2) mtime_ns, size
+    vec: np.ndarray  # (N, D) float32
+    cdf: np.ndarray  # (N, C * 169) float32
+    strength_order: np.ndarray  # (169,)
+    centroids: np.ndarray  # (L, D) float32
+    assign: np.ndarray  # (N,)
+    trained_n: int
+
+    def find(self, source: str, node: str) -> int:
+        for i, (s, n) in enumerate(zip(self.sources, self.nodes)):
+            if s == source and n == node:
+                return i
+        raise KeyError(f"node not in index: {source}|{node or ROOT_MARKER}")
+
+    def candidates(self, query_vec: np.ndarray, nprobe: int) -> np.ndarray:
+        if len(self.centroids) == 0:
+            return np.arange(len(self.nodes))
+        sims = self.centroids @ query_vec
+        lists = np.argsort(-sims)[: max(1, nprobe)]
+        return np.flatnonzero(np.isin(self.assign, lists))
+
+    def distances(self, q: int, rows: np.ndarray, metric: str) -> np.ndarray:
+        """
+        小さいほど似ている。cosine は 1 − cos、emd は強さ軸の 1 次元 EMD（CDF の L1）のアクション種類合計
+        """
+        if metric == "cosine":
+            return 1.0 - self.vec[rows] @ self.vec[q]
+        return np.abs(self.cdf[rows] - self.cdf[q]).sum(axis=1) / N_HANDS
+
+    def query(
+        self, queries: List[int], k: int, metric: str, approx: bool, nprobe: int, position: Optional[str]
+    ) -> List[List[Tuple[int, float]]]:
+        allowed = np.ones(len(self.nodes), dtype=bool)
+        if position is not None:
+            allowed = np.asarray([p == position for p in self.positions], dtype=bool)
+        out: List[List[Tuple[int, float]]] = []
+        for q in queries:
+            rows = self.candidates(self.vec[q], nprobe) if approx else np.arange(len(self.nodes))
+            rows = rows[allowed[rows] & (rows != q)]
+            if rows.size == 0:
+                out.append([])
+                continue
+            dist = self.distances(q, rows, metric)
+            top = np.argpartition(dist, min(k, rows.size) - 1)[:k] if rows.size > k else np.arange(rows.size)
+            top = top[np.argsort(dist[top], kind="stable")]
+            out.append([(int(rows[i]), float(dist[i])) for i in top])
+        return out
+
+
+def spherical_kmeans(vec: np.ndarray, n_lists: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    centroids = vec[rng.choice(len(vec), size=n_lists, replace=False)].astype(np.float64)
+    assign = np.zeros(len(vec), dtype=np.int64)
+    for _ in range(IVF_ITERATIONS):
+        assign = np.argmax(vec @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vec)
+        empty = ~sums.any(axis=1)
+        sums[empty] = centroids[empty]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), FREQ_EPS)
+    return centroids.astype(np.float32), np.argmax(vec @ centroids.T, axis=1)
+
+
+def iter_solution_nodes(source: Path) -> List[str]:
+    """
+    ROOT から BFS で辿れる、JSON のあるノード
+    """
+    explored = load_explored_list(source / EXPLORED_LIST_NAME)
+    out: List[str] = []
+    seen: Set[str] = set()
+    q: deque[str] = deque([""])
+    while q:
+        node = q.popleft()
+        if node in seen or node not in explored:
+            continue
+        seen.add(node)
+        path = source / (sanitize_filename(node) + ".json")
+        if not path.exists():
+            continue
+        out.append(node)
+        for sol in load_json(path).get("action_solutions") or []:
+            act = sol.get("action") if isinstance(sol, dict) else None
+            if isinstance(act, dict) and isinstance(act.get("code"), str):
+                if not act.get("next_street", False) and not act.get("is_hand_end", False):
+                    q.append(append_action(node, act["code"]))
+    return out
+
+
+def build_index(sources: List[Path], previous: Optional[SpotIndex], retrain: bool) -> Tuple[SpotIndex, Dict[str, int]]:
+    """
+    previous があれば、ファイルの (mtime, size) が変わっていないノードはその行を使い回す
+    IVF は、ノード数が学習時の IVF_RETRAIN_GROWTH 倍を超えたとき（か retrain）だけ学習し直す
+    """
+    reuse: Dict[Tuple[str, str], int] = {}
+    if previous is not None:
+        reuse = {(s, n): i for i, (s, n) in enumerate(zip(previous.sources, previous.nodes))}
+
+    # 強さ順は最初の build で決めて使い回す（変えると既存行の CDF と比べられなくなる）
+    strength_order = previous.strength_order if previous is not None else None
+    ev_sum = np.zeros(N_HANDS, dtype=np.float64)
+    ev_count = np.zeros(N_HANDS, dtype=np.float64)
+    counts = {"reused": 0, "computed": 0, "skipped": 0}
+    src_list: List[str] = []
+    nodes: List[str] = []
+    positions: List[str] = []
+    sigs: List[Tuple[int, int]] = []
+    vecs: List[np.ndarray] = []
+    masses: List[Optional[np.ndarray]] = []
+    cdf_rows: List[Optional[np.ndarray]] = []
+
+    for source in sources:
+        src = str(source)
+        for node in iter_solution_nodes(source):
+            path = source / (sanitize_filename(node) + ".json")
+            sig = file_signature(path)
+            old = reuse.get((src, node))
+            if previous is not None and old is not None and tuple(previous.signatures[old]) == sig:
+                src_list.append(src)
+                nodes.append(node)
+                positions.append(previous.positions[old])
+                sigs.append(sig)
+                vecs.append(previous.vec[old])
+                masses.append(None)
+                cdf_rows.append(previous.cdf[old])
+                counts["reused"] += 1
+                continue
+            spot = load_json(path)
+            if strength_order is None:
+                best = actor_best_evs(spot)
+                if best is not None:
+                    ev_sum += np.where(best[1], best[0], 0.0)
+                    ev_count += best[1]
+            feats = spot_features(spot)
+            if feats is None:
+                counts["skipped"] += 1
+                continue
+            src_list.append(src)
+            nodes.append(node)
+            positions.append(feats.position)
+            sigs.append(sig)
+            vecs.append(feats.vec)
+            masses.append(feats.mass)
+            cdf_rows.append(None)
+            counts["computed"] += 1
+
+    if strength_order is None:
+        strength_order = hand_strength_order(ev_sum, ev_count, equity_vs_random())
+    # 新しく計算した行の CDF は強さ順が決まってからまとめて作る
+    new_rows = [i for i, m in enumerate(masses) if m is not None]
+    if new_rows:
+        stacked = np.stack([masses[i] for i in new_rows])[:, :, strength_order]  # type: ignore[misc]
+        new_cdf = np.cumsum(stacked, axis=2).reshape(len(new_rows), -1)
+        for j, i in enumerate(new_rows):
+            cdf_rows[i] = new_cdf[j]
+
+    n_rows = len(nodes)
+    dim = N_CLASSES * N_HANDS + 2 * N_HANDS
+    vec = np.stack(vecs).astype(np.float32) if vecs else np.zeros((0, dim), dtype=np.float32)
+    cdf = np.stack(cdf_rows).astype(np.float32) if cdf_rows else np.zeros((0, N_CLASSES * N_HANDS), dtype=np.float32)
+
+    n_lists = int(np.sqrt(n_rows))
+    trained_n = previous.trained_n if previous is not None else 0
+    need_train = retrain or previous is None or len(previous.centroids) == 0 or n_rows > trained_n * IVF_RETRAIN_GROWTH
+    if n_lists < 2:
+        centroids, assign, trained_n = np.zeros((0, vec.shape[1]), dtype=np.float32), np.zeros(n_rows, dtype=np.int64), n_rows
+    elif need_train:
+        centroids, assign = spherical_kmeans(vec, n_lists)
+        trained_n = n_rows
+        counts["ivf_trained"] = 1
+    else:
+        centroids = previous.centroids  # type: ignore[union-attr]
+        assign = np.argmax(vec @ centroids.T, axis=1)
+
+    index = SpotIndex(
+        sources=src_list,
+        nodes=nodes,
+        positions=positions,
+        signatures=np.asarray(sigs, dtype=np.int64).reshape(n_rows, 2),
+        vec=vec,
+        cdf=cdf,
+        strength_order=np.asarray(strength_order, dtype=np.int64),
+        centroids=centroids,
+        assign=np.asarray(assign, dtype=np.int64),
+        trained_n=trained_n,
+    )
+    return index, counts
+
+
+def save_index(path: Path, index: SpotIndex) -> None:
+    tmp = path.with_suffix(".tmp.npz")
+    np.savez_compressed(
+        tmp,
+        hands=np.array(HAND_LABELS, dtype=str),
+        sources=np.array(index.sources, dtype=str),
+        nodes=np.array([n or ROOT_MARKER for n in index.nodes], dtype=str),
+        positions=np.array(index.positions, dtype=str),
+        signatures=index.signatures,
+        vec=index.vec,
+        cdf=index.cdf,
+        strength_order=index.strength_order,
+        centroids=index.centroids,
+        assign=index.assign,
+        trained_n=np.int64(index.trained_n),
+    )
+    tmp.replace(path)
+
+
+def load_index(path: Path = SPOT_SIMILARITY_PATH) -> SpotIndex:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path} (run `spot_similarity.py build` first)")
+    with np.load(path) as z:
+        if list(z["hands"]) != HAND_LABELS:
+            raise ValueError(f"hand order mismatch in {path} (rerun `spot_similarity.py build --full`)")
+        return SpotIndex(
+            sources=[str(s) for s in z["sources"]],
+            nodes=["" if n == ROOT_MARKER else str(n) for n in z["nodes"]],
+            positions=[str(p) for p in z["positions"]],
+            signatures=z["signatures"],
+            vec=z["vec"],
+            cdf=z["cdf"],
+            strength_order=z["strength_order"],
+            centroids=z["centroids"],
+            assign=z["assign"],
+            trained_n=int(z["trained_n"]),
+        )
+
+
+def cmd_build(args: argparse.Namespace) -> None:
+    previous = None if args.full or not SPOT_SIMILARITY_PATH.exists() else load_index()
+    # 省略時は前回と同じディレクトリ（初回は OUT_DIR）
+    default_sources = list(dict.fromkeys(previous.sources)) if previous is not None and previous.sources else [str(OUT_DIR)]
+    sources = [Path(s) for s in (args.sources or default_sources)]
+    t0 = time.perf_counter()
+    index, counts = build_index(sources, previous, args.retrain)
+    save_index(SPOT_SIMILARITY_PATH, index)
+    print("done.")
+    print(
+        f"nodes={len(index.nodes)} reused={counts['reused']} computed={counts['computed']} skipped={counts['skipped']} "
+        f"ivf_lists={len(index.centroids)}{' (retrained)' if counts.get('ivf_trained') else ''} "
+        f"elapsed={time.perf_counter() - t0:.2f}s"
+    )
+    print(f"index={SPOT_SIMILARITY_PATH.resolve()}")
+
+
+def cmd_query(args: argparse.Namespace) -> None:
+    index = load_index()
+    source = args.source or (index.sources[0] if index.sources else str(OUT_DIR))
+    try:
+        queries = [index.find(source, parse_actions_line(n) or "") for n in args.nodes]
+    except KeyError as e:
+        raise SystemExit(str(e.args[0]))
+    t0 = time.perf_counter()
+    results = index.query(queries, args.k, args.metric, args.approx, args.nprobe, args.position)
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+    multi_source = len(set(index.sources)) > 1
+    for q, rows in zip(queries, results):
+        print(f"[{index.nodes[q] or ROOT_MARKER}] position={index.positions[q]} metric={args.metric}")
+        for i, dist in rows:
+            label = index.nodes[i] or ROOT_MARKER
+            if multi_source:
+                label = f"{index.sources[i]}|{label}"
+            print(f"  {dist:.4f}\t{index.positions[i]}\t{label}")
+    mode = f"approx(nprobe={args.nprobe})" if args.approx else "exact"
+    print(f"# queries={len(queries)} nodes={len(index.nodes)} mode={mode} elapsed={elapsed_ms:.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="戦略ベクトルによる似たスポットの検索")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help=f"{SPOT_SIMILARITY_PATH} を作る（既にあれば変わったノードだけ更新）")
+    p_build.add_argument("sources", nargs="*", help=f"ソリューションディレクトリ（省略時は前回と同じ / 初回は {OUT_DIR}）。深さ違いなども並べられる")
+    p_build.add_argument("--full", action="store_true", help="既存インデックスを使わずに作り直す")
+    p_build.add_argument("--retrain", action="store_true", help="近似モードのクラスタを学習し直す")
+    p_build.set_defaults(func=cmd_build)
+
+    p_query = sub.add_parser("query", help="例: query F-F-R2.5-F-F -k 5 --position BB")
+    p_query.add_argument("nodes", nargs="+", help=f"preflop_actions（ROOT は {ROOT_MARKER}）。複数でまとめて検索")
+    p_query.add_argument("-k", type=int, default=10)
+    p_query.add_argument("--metric", choices=["cosine", "emd"], default="cosine")
+    p_query.add_argument("--approx", action="store_true", help="IVF で候補を絞ってから距離を計算する")
+    p_query.add_argument("--nprobe", type=int, default=4)
+    p_query.add_argument("--position", help="結果をこの手番のスポットに絞る")
+    p_query.add_argument("--source", help="クエリノードのソリューションディレクトリ（省略時は先頭）")
+    p_query.set_defaults(func=cmd_query)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
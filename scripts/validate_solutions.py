@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from hand_order import HAND_COMBOS, HAND_LABELS, N_HANDS, check_spot_hand_order
+
+FREQ_EPS = 1e-9
+
+OUT_DIR = Path("out2")
+EXPLORED_LIST_PATH = OUT_DIR / "preflop_actions.txt"  # ROOT含む前提
+ROOT_MARKER = "ROOT"
+
+VALIDATION_REPORT_PATH = OUT_DIR / "validation_report.json"
+
+# 各ハンドの strategy 合計は 1（API の丸め込みで 1e-7 程度ずれる）
+STRATEGY_SUM_TOL = 1e-3
+# action 間の total_frequency 合計は 1
+TF_SUM_TOL = 1e-3
+# total_frequency は total_combos の比率と一致する
+TF_COMBOS_TOL = 2e-3
+# total_frequency は range×combos で重み付けした strategy と一致する（実測の最大誤差は 4e-4 程度）
+# ずれが大きいのはハンドの並びの取り違えかデータ破損
+TF_RANGE_TOL = 1e-3
+
+
+def sanitize_filename(name: str) -> str:
+    if not name:
+        return "root"
+    safe = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_")
+    return safe or "node"
+
+
+def get_node_path(preflop_actions: str) -> Path:
+    return OUT_DIR / (sanitize_filename(preflop_actions) + ".json")
+
+
+def load_json(path: Path) -> Dict[str, Any]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"invalid json root (expected object): {path}")
+    return data
+
+
+def parse_actions_line(line: str) -> Optional[str]:
+    s = line.strip()
+    if not s:
+        return None
+    if s == ROOT_MARKER:
+        return ""
+    return s
+
+
+def load_explored_list(path: Path) -> List[str]:
+    if not path.exists():
+        raise FileNotFoundError(f"not found: {path}")
+    out: List[str] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            v = parse_actions_line(line)
+            if v is None:
+                continue
+            out.append(v)
+    return out
+
+
+def append_action(parent: str, code: str) -> str:
+    return code if parent == "" else f"{parent}-{code}"
+
+
+def as_float_array(value: Any) -> Optional[np.ndarray]:
+    if not isinstance(value, list) or len(value) != N_HANDS:
+        return None
+    try:
+        arr = np.asarray(value, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    return arr
+
+
+def issue(node: str, code: str, severity: str, detail: str) -> Dict[str, Any]:
+    return {
+        "node": ROOT_MARKER if node == "" else node,
+        "code": code,
+        "severity": severity,
+        "detail": detail,
+    }
+
+
+def validate_node(node: str) -> Tuple[str, List[Dict[str, Any]], List[str], Dict[str, float]]:
+    """
+    1ノード分の検査（ワーカープロセスで実行）
+    戻り値: (node, issues, 子ノード候補, 指標)
+    """
+    path = get_node_path(node)
+    issues: List[Dict[str, Any]] = []
+    metrics: Dict[str, float] = {}
+
+    if not path.exists():
+        # 404 だったノードも explored に記録されるので警告扱い
+        return node, [issue(node, "MISSING_JSON", "warn", f"{path.name} not found")], [], metrics
+
+    try:
+        spot = load_json(path)
+    except Exception as e:
+        return node, [issue(node, "PARSE_ERROR", "error", f"{path.name}: {e}")], [], metrics
+
+    sols = spot.get("action_solutions")
+    if not isinstance(sols, list) or not sols:
+        return node, [issue(node, "NO_ACTIONS", "error", "action_solutions is missing or empty")], [], metrics
+
+    try:
+        check_spot_hand_order(spot)
+    except ValueError as e:
+        issues.append(issue(node, "HAND_ORDER", "error", str(e)))
+
+    codes: List[str] = []
+    tfs: List[float] = []
+    combos: List[float] = []
+    strategies: List[np.ndarray] = []
+    children: List[str] = []
+    actor: Optional[str] = None
+
+    for i, sol in enumerate(sols):
+        act = sol.get("action") if isinstance(sol, dict) else None
+        if not isinstance(act, dict) or not isinstance(act.get("code"), str) or not act.get("code"):
+            issues.append(issue(node, "BAD_ACTION", "error", f"action_solutions[{i}] has no action.code"))
+            continue
+        code = act["code"]
+        if actor is None and isinstance(act.get("position"), str):
+            actor = act["position"]
+
+        try:
+            tf = float(sol.get("total_frequency"))
+        except (TypeError, ValueError):
+            issues.append(issue(node, "BAD_TOTAL_FREQUENCY", "error", f"{code}: total_frequency={sol.get('total_frequency')!r}"))
+            continue
+        strategy = as_float_array(sol.get("strategy"))
+        evs = as_float_array(sol.get("evs"))
+        if strategy is None:
+            issues.append(issue(node, "BAD_STRATEGY", "error", f"{code}: strategy is not a {N_HANDS}-float list"))
+            continue
+        if evs is None:
+            issues.append(issue(node, "BAD_EVS", "error", f"{code}: evs is not a {N_HANDS}-float list"))
+        elif not np.isfinite(evs).all():
+            issues.append(issue(node, "NONFINITE_EVS", "error", f"{code}: evs has NaN/inf"))
+        if not np.isfinite(strategy).all() or (strategy < -FREQ_EPS).any() or (strategy > 1.0 + FREQ_EPS).any():
+            issues.append(issue(node, "STRATEGY_OUT_OF_RANGE", "error", f"{code}: strategy outside [0, 1]"))
+
+        try:
+            tc = float(sol.get("total_combos"))
+        except (TypeError, ValueError):
+            tc = math.nan
+
+        codes.append(code)
+        tfs.append(tf)
+        combos.append(tc)
+        strategies.append(strategy)
+
+        if tf > FREQ_EPS and not bool(act.get("next_street", False)) and not bool(act.get("is_hand_end", False)):
+            children.append(append_action(node, code))
+
+    if not strategies:
+        return node, issues, children, metrics
+
+    tf_arr = np.asarray(tfs)
+    strat = np.vstack(strategies)  # (A, 169)
+
+    tf_sum_err = abs(float(tf_arr.sum()) - 1.0)
+    metrics["tf_sum_err"] = tf_sum_err
+    if tf_sum_err > TF_SUM_TOL:
+        issues.append(issue(node, "TF_SUM", "error", f"sum(total_frequency)={tf_arr.sum():.6f}"))
+
+    combos_arr = np.asarray(combos)
+    if np.isfinite(combos_arr).all() and combos_arr.sum() > 0:
+        err = np.abs(combos_arr / combos_arr.sum() - tf_arr)
+        metrics["tf_combos_err"] = float(err.max())
+        if err.max() > TF_COMBOS_TOL:
+            a = int(err.argmax())
+            issues.append(issue(node, "TF_COMBOS", "error", f"{codes[a]}: total_frequency={tf_arr[a]:.6f} vs total_combos share={combos_arr[a] / combos_arr.sum():.6f}"))
+
+    rng = None
+    infos = spot.get("players_info")
+    if isinstance(infos, list):
+        for info in infos:
+            if isinstance(info, dict) and isinstance(info.get("player"), dict) and info["player"].get("position") == actor:
+                rng = as_float_array(info.get("range"))
+                break
+    if rng is None:
+        issues.append(issue(node, "NO_ACTOR_RANGE", "error", f"players_info has no {N_HANDS}-range for actor={actor}"))
+        return node, issues, children, metrics
+
+    in_range = rng > FREQ_EPS
+    col_err = np.abs(strat.sum(axis=0) - 1.0)
+    col_err = np.where(in_range, col_err, 0.0)
+    metrics["strategy_sum_err"] = float(col_err.max())
+    if col_err.max() > STRATEGY_SUM_TOL:
+        bad = np.flatnonzero(col_err > STRATEGY_SUM_TOL)
+        sample = ", ".join(f"{HAND_LABELS[h]}={strat[:, h].sum():.4f}" for h in bad[:5])
+        issues.append(issue(node, "STRATEGY_SUM", "error", f"{len(bad)} hands: {sample}"))
+
+    w = rng * HAND_COMBOS
+    if w.sum() > 0:
+        implied = strat @ w / w.sum()
+        err = np.abs(implied - tf_arr)
+        metrics["tf_range_err"] = float(err.max())
+        if err.max() > TF_RANGE_TOL:
+            a = int(err.argmax())
+            issues.append(issue(node, "TF_RANGE", "error", f"{codes[a]}: total_frequency={tf_arr[a]:.6f} vs range-weighted strategy={implied[a]:.6f}"))
+
+    return node, issues, children, metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ダウンロード済みソリューションツリーの整合性チェック")
+    parser.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU 数）")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    nodes = load_explored_list(EXPLORED_LIST_PATH)
+    explored: Set[str] = set(nodes)
+    if "" not in explored:
+        raise RuntimeError("ROOT node ('') not found in preflop_actions.txt")
+
+    issues: List[Dict[str, Any]] = []
+    worst: Dict[str, float] = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(validate_node, nodes, chunksize=max(1, len(nodes) // 256)))
+
+    for node, node_issues, children, metrics in results:
+        issues.extend(node_issues)
+        for key, value in metrics.items():
+            worst[key] = max(worst.get(key, 0.0), value)
+        for child in children:
+            if child in explored:
+                continue
+            if get_node_path(child).exists():
+                issues.append(issue(node, "CHILD_NOT_EXPANDED", "error", f"{child} fetched but not in {EXPLORED_LIST_PATH.name}"))
+            else:
+                issues.append(issue(node, "CHILD_NOT_FETCHED", "error", f"{child} was never fetched"))
+
+    n_errors = sum(1 for i in issues if i["severity"] == "error")
+    n_warns = len(issues) - n_errors
+    by_code: Dict[str, int] = {}
+    for i in issues:
+        by_code[i["code"]] = by_code.get(i["code"], 0) + 1
+    elapsed = time.perf_counter() - t0
+
+    report = {
+        "summary": {
+            "nodes": len(nodes),
+            "errors": n_errors,
+            "warnings": n_warns,
+            "by_code": dict(sorted(by_code.items())),
+            "worst": worst,
+            "elapsed_sec": elapsed,
+        },
+        "issues": issues,
+    }
+    tmp = VALIDATION_REPORT_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    tmp.replace(VALIDATION_REPORT_PATH)
+
+    print("done.")
+    print(f"nodes={len(nodes)} errors={n_errors} warnings={n_warns} elapsed={elapsed:.2f}s")
+    for code, count in sorted(by_code.items()):
+        print(f"  {code}={count}")
+    print(f"report={VALIDATION_REPORT_PATH.resolve()}")
+
+    # クロール後のゲートとして使えるよう、エラーがあれば非0で終わる
+    if n_errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
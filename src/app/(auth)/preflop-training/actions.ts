@@ -11,6 +11,13 @@ type SpotRow = {
   jpActions: string | null;
 };
 
+type QuestionWeightRow = {
+  position: string;
+  preflopActions: string;
+  hand: string;
+  weight: number;
+};
+
 type ActionFrequency = {
   label: string;
   frequency: number;
@@ -70,6 +77,48 @@ const parseCsvRows = (text: string) => {
   return rows;
 };
 
+const parseQuestionWeightRows = (text: string) => {
+  const lines = text.trim().split('\n');
+  const rows: QuestionWeightRow[] = [];
+  for (const line of lines.slice(1)) {
+    if (!line.trim()) continue;
+    const [position, preflopActions, hand, weight] = line.split(',');
+    if (!position || !preflopActions || !hand || !weight) continue;
+    rows.push({ position, preflopActions, hand, weight: Number(weight) });
+  }
+  return rows;
+};
+
+// scripts/score_question_difficulty.py が出力する出題重み
+const loadQuestionWeightRows = async () => {
+  const weightsPath = path.join(
+    process.cwd(),
+    'solutions',
+    'cash6m100bb',
+    'question_weights.csv',
+  );
+  return parseQuestionWeightRows(await fs.readFile(weightsPath, 'utf-8'));
+};
+
+// 約1万行あるので出題のたびに読み直さず、プロセス内で1回だけ読む
+// 読めなかったとき（無ければ従来の一様抽選）は覚えず、次の出題で読み直す
+let questionWeightRowsPromise: Promise<QuestionWeightRow[]> | null = null;
+
+const readQuestionWeightRows = async () => {
+  if (!questionWeightRowsPromise) {
+    questionWeightRowsPromise = loadQuestionWeightRows();
+  }
+  const promise = questionWeightRowsPromise;
+  try {
+    return await promise;
+  } catch {
+    if (questionWeightRowsPromise === promise) {
+      questionWeightRowsPromise = null;
+    }
+    return [];
+  }
+};
+
 const weightedPick = <T,>(items: T[], weight: (item: T) => number) => {
   const total = items.reduce((sum, item) => sum + weight(item), 0);
   const target = Math.random() * total;
@@ -140,7 +189,17 @@ export const getPreflopQuestion = async (): Promise<PreflopQuestion> => {
   const rows = parseCsvRows(csvText);
   const position = positions[Math.floor(Math.random() * positions.length)];
   const positionRows = rows.filter((row) => row.position === position);
-  const pickedRow = weightedPick(positionRows, (row) => row.reachProb);
+  const weightRows = (await readQuestionWeightRows()).filter(
+    (row) => row.position === position,
+  );
+  const pickedWeightRow =
+    weightRows.length > 0
+      ? weightedPick(weightRows, (row) => row.weight)
+      : null;
+  const pickedRow =
+    positionRows.find(
+      (row) => row.preflopActions === pickedWeightRow?.preflopActions,
+    ) ?? weightedPick(positionRows, (row) => row.reachProb);
   const jsonName =
     pickedRow.preflopActions === 'ROOT'
       ? 'root.json'
@@ -175,7 +234,13 @@ export const getPreflopQuestion = async (): Promise<PreflopQuestion> => {
   const availableHands = Object.entries(handCounters)
     .filter(([, counter]) => (counter?.total_frequency ?? 0) > 0)
     .map(([hand]) => hand);
+  const weightedHand =
+    pickedWeightRow?.preflopActions === pickedRow.preflopActions &&
+    handCounters[pickedWeightRow.hand]
+      ? pickedWeightRow.hand
+      : null;
   const handLabel =
+    weightedHand ??
     availableHands[Math.floor(Math.random() * availableHands.length)] ??
     handLabels[0] ??
     '??';